@@ -2,6 +2,7 @@ import os
 import shutil
 from datetime import datetime
 import logging
+from p010_lineage.stage_metrics import track_stage
 
 # Paths
 SOURCE_DIR = "p002_synthetic_data/output"
@@ -18,6 +19,7 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+@track_stage("ingest_interactions")
 def ingest():
     try:
         files = os.listdir(SOURCE_DIR)
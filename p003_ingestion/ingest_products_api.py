@@ -3,6 +3,7 @@ import json
 import logging
 import requests
 from datetime import datetime
+from p010_lineage.stage_metrics import track_stage
 
 # API endpoint
 API_URL = "http://127.0.0.1:8000/products"
@@ -22,6 +23,7 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+@track_stage("ingest_products")
 def ingest():
     print("\n=== PRODUCT API INGESTION STARTED ===")
     try:
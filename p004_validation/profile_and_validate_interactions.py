@@ -2,6 +2,8 @@ import os
 import pandas as pd
 from datetime import datetime
 import json
+from p010_lineage.log_lineage import log_pipeline_run
+from p010_lineage.stage_metrics import StageMetrics
 
 # Base path of raw interaction data
 BASE_PATH = "data_lake/raw/interactions/csv"
@@ -88,17 +90,28 @@ def save_report(file_used, issues, df):
         json.dump(report, f, indent=4)
 
     print(f"\nData Quality Report saved at: {report_file}")
+    return report_file
 
 
 if __name__ == "__main__":
-    latest_file = get_latest_file()
-    print(f"\nUsing latest raw file: {latest_file}")
+    with StageMetrics("validate_interactions") as metrics:
+        latest_file = get_latest_file()
+        print(f"\nUsing latest raw file: {latest_file}")
 
-    df = pd.read_csv(latest_file)
+        df = pd.read_csv(latest_file)
+        metrics.rows_in = len(df)
 
-    profile_data(df)
-    issues = validate_data(df)
+        profile_data(df)
+        issues = validate_data(df)
 
-    save_report(latest_file, issues, df)
+        report_file = save_report(latest_file, issues, df)
 
-    print("\nValidation completed and report generated.")
+        # Lineage logging
+        log_pipeline_run(
+            stage="validate_interactions",
+            input_files=[latest_file],
+            output_files=[report_file],
+            metrics=metrics
+        )
+
+        print("\nValidation completed and report generated.")
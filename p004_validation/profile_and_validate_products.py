@@ -1,6 +1,8 @@
 import os
 import json
 from datetime import datetime
+from p010_lineage.log_lineage import log_pipeline_run
+from p010_lineage.stage_metrics import StageMetrics
 
 # Base path of raw product data
 BASE_PATH = "data_lake/raw/products/api"
@@ -99,18 +101,29 @@ def save_report(file_used, issues, data):
         json.dump(report, f, indent=4)
 
     print(f"\nProduct Data Quality Report saved at: {report_file}")
+    return report_file
 
 
 if __name__ == "__main__":
-    latest_file = get_latest_file()
-    print(f"\nUsing latest raw product file: {latest_file}")
+    with StageMetrics("validate_products") as metrics:
+        latest_file = get_latest_file()
+        print(f"\nUsing latest raw product file: {latest_file}")
 
-    with open(latest_file, "r") as f:
-        data = json.load(f)
+        with open(latest_file, "r") as f:
+            data = json.load(f)
+        metrics.rows_in = len(data)
 
-    profile_data(data)
-    issues = validate_data(data)
+        profile_data(data)
+        issues = validate_data(data)
 
-    save_report(latest_file, issues, data)
+        report_file = save_report(latest_file, issues, data)
 
-    print("\nProduct validation completed and report generated.")
+        # Lineage logging
+        log_pipeline_run(
+            stage="validate_products",
+            input_files=[latest_file],
+            output_files=[report_file],
+            metrics=metrics
+        )
+
+        print("\nProduct validation completed and report generated.")
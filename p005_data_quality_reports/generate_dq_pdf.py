@@ -6,6 +6,8 @@ from reportlab.lib.styles import ParagraphStyle
 from datetime import datetime
 import json
 import os
+from p010_lineage.log_lineage import log_pipeline_run
+from p010_lineage.stage_metrics import StageMetrics
 
 # --------------------------------------------------
 # Paths
@@ -117,15 +119,24 @@ def build_pdf(interactions_report, products_report):
 # --------------------------------------------------
 
 if __name__ == "__main__":
-    print("Generating Data Quality PDF Report...")
+    with StageMetrics("generate_dq_pdf") as metrics:
+        print("Generating Data Quality PDF Report...")
 
-    latest_interactions_json = get_latest_file(INTERACTIONS_REPORT_DIR)
-    latest_products_json = get_latest_file(PRODUCTS_REPORT_DIR)
+        latest_interactions_json = get_latest_file(INTERACTIONS_REPORT_DIR)
+        latest_products_json = get_latest_file(PRODUCTS_REPORT_DIR)
 
-    interactions_report = load_json(latest_interactions_json)
-    products_report = load_json(latest_products_json)
+        interactions_report = load_json(latest_interactions_json)
+        products_report = load_json(latest_products_json)
 
-    build_pdf(interactions_report, products_report)
+        build_pdf(interactions_report, products_report)
 
-    print(f"Data Quality PDF generated successfully:")
-    print(OUTPUT_PDF)
+        # Lineage logging
+        log_pipeline_run(
+            stage="generate_dq_pdf",
+            input_files=[latest_interactions_json, latest_products_json],
+            output_files=[OUTPUT_PDF],
+            metrics=metrics
+        )
+
+        print(f"Data Quality PDF generated successfully:")
+        print(OUTPUT_PDF)
@@ -2,6 +2,7 @@ import os
 import pandas as pd
 from datetime import datetime
 from p010_lineage.log_lineage import log_pipeline_run
+from p010_lineage.stage_metrics import StageMetrics
 
 RAW_BASE_PATH = "data_lake/raw/interactions/csv"
 PREPARED_BASE_PATH = "data_lake/prepared/interactions"
@@ -75,29 +76,33 @@ def save_prepared_file(df, prepared_dir):
 
 
 if __name__ == "__main__":
-    print("\n=== INTERACTIONS DATA PREPARATION PIPELINE STARTED ===")
+    with StageMetrics("prepare_interactions") as metrics:
+        print("\n=== INTERACTIONS DATA PREPARATION PIPELINE STARTED ===")
 
-    # 1. Get latest raw file
-    raw_file = get_latest_raw_file()
-    print(f"Using raw file: {raw_file}")
+        # 1. Get latest raw file
+        raw_file = get_latest_raw_file()
+        print(f"Using raw file: {raw_file}")
 
-    # 2. Load data
-    df = pd.read_csv(raw_file)
+        # 2. Load data
+        df = pd.read_csv(raw_file)
+        metrics.rows_in = len(df)
 
-    # 3. Clean and prepare
-    prepared_df = clean_and_prepare(df)
+        # 3. Clean and prepare
+        prepared_df = clean_and_prepare(df)
+        metrics.rows_out = len(prepared_df)
 
-    # 4. Prepare directory
-    prepared_dir = prepare_directories()
+        # 4. Prepare directory
+        prepared_dir = prepare_directories()
 
-    # 5. Save prepared file
-    prepared_file_path = save_prepared_file(prepared_df, prepared_dir)
+        # 5. Save prepared file
+        prepared_file_path = save_prepared_file(prepared_df, prepared_dir)
 
-    # 6. Log lineage
-    log_pipeline_run(
-        stage="prepare_interactions",
-        input_files=[raw_file],
-        output_files=[prepared_file_path]
-    )
+        # 6. Log lineage
+        log_pipeline_run(
+            stage="prepare_interactions",
+            input_files=[raw_file],
+            output_files=[prepared_file_path],
+            metrics=metrics
+        )
 
-    print("\n=== INTERACTIONS DATA PREPARATION PIPELINE COMPLETED ===")
+        print("\n=== INTERACTIONS DATA PREPARATION PIPELINE COMPLETED ===")
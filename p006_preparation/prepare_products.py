@@ -2,6 +2,7 @@ import os
 import json
 from datetime import datetime
 from p010_lineage.log_lineage import log_pipeline_run
+from p010_lineage.stage_metrics import StageMetrics
 
 RAW_BASE_PATH = "data_lake/raw/products/api"
 PREPARED_BASE_PATH = "data_lake/prepared/products"
@@ -82,30 +83,34 @@ def save_prepared_data(cleaned_data, prepared_path):
 
 
 if __name__ == "__main__":
-    print("\n=== PRODUCTS DATA PREPARATION PIPELINE STARTED ===")
+    with StageMetrics("prepare_products") as metrics:
+        print("\n=== PRODUCTS DATA PREPARATION PIPELINE STARTED ===")
 
-    # 1. Get latest raw file
-    raw_file = get_latest_raw_file()
-    print(f"Using latest raw file: {raw_file}")
+        # 1. Get latest raw file
+        raw_file = get_latest_raw_file()
+        print(f"Using latest raw file: {raw_file}")
 
-    # 2. Load raw data
-    with open(raw_file, "r") as f:
-        data = json.load(f)
+        # 2. Load raw data
+        with open(raw_file, "r") as f:
+            data = json.load(f)
+        metrics.rows_in = len(data)
 
-    # 3. Clean data
-    cleaned_data = clean_products(data)
+        # 3. Clean data
+        cleaned_data = clean_products(data)
+        metrics.rows_out = len(cleaned_data)
 
-    # 4. Prepare output directory
-    prepared_dir = prepare_directories()
+        # 4. Prepare output directory
+        prepared_dir = prepare_directories()
 
-    # 5. Save prepared file and capture path
-    prepared_file_path = save_prepared_data(cleaned_data, prepared_dir)
+        # 5. Save prepared file and capture path
+        prepared_file_path = save_prepared_data(cleaned_data, prepared_dir)
 
-    # 6. Log lineage
-    log_pipeline_run(
-        stage="prepare_products",
-        input_files=[raw_file],
-        output_files=[prepared_file_path]
-    )
+        # 6. Log lineage
+        log_pipeline_run(
+            stage="prepare_products",
+            input_files=[raw_file],
+            output_files=[prepared_file_path],
+            metrics=metrics
+        )
 
-    print("\n=== PRODUCTS DATA PREPARATION PIPELINE COMPLETED ===")
+        print("\n=== PRODUCTS DATA PREPARATION PIPELINE COMPLETED ===")
@@ -2,12 +2,28 @@ import os
 import json
 import pandas as pd
 from datetime import datetime
-from sklearn.preprocessing import MinMaxScaler
 from p010_lineage.log_lineage import log_pipeline_run
+from p010_lineage.stage_metrics import StageMetrics
+from p009_feature_store.snapshot_io import write_parquet_snapshot, snapshot_version
+from p009_feature_store.snapshot_catalog import register_snapshot
+from p009_feature_store.mmap_snapshot import (
+    write_mmap_snapshot,
+    item_feature_columns,
+    USER_FEATURES
+)
+from p008_feature_engineering.feature_registry import compute_features
+from p008_feature_engineering.feature_transform import (
+    fit_transform_artifact,
+    save_transform_artifact,
+    load_transform_artifact,
+    transform
+)
 
 PREPARED_INTERACTIONS_PATH = "data_lake/prepared/interactions"
 PREPARED_PRODUCTS_PATH = "data_lake/prepared/products"
 FEATURE_STORE_PATH = "p009_feature_store/data"
+# "parquet" (default) or "csv" for the legacy uncompressed snapshots
+SNAPSHOT_FORMAT = os.getenv("FEATURE_SNAPSHOT_FORMAT", "parquet")
 os.makedirs(FEATURE_STORE_PATH, exist_ok=True)
 
 
@@ -38,109 +54,88 @@ def load_latest_products():
     return path, pd.DataFrame(data)
 
 
-def build_features(interactions_df, products_df):
+def build_features(interactions_df, products_df, previous_artifact=None, features=None):
     print("\n================ FEATURE ENGINEERING STARTED ================")
 
-    # Step 1: Join interactions with product metadata
-    print("Step 1: Joining interactions with product metadata (on item_id)")
-    df = interactions_df.merge(products_df, on="item_id", how="left")
-    print(f"Total records after join: {len(df)}")
-
-    # Step 2: User Activity Frequency
-    print("\nStep 2: Creating User Activity Frequency feature")
-    df["user_activity_frequency"] = df.groupby("user_id")["item_id"].transform("count")
-
-    # Step 3: Average Rating Per User
-    print("\nStep 3: Creating Average Rating Per User feature")
-    df["avg_rating_per_user"] = df.groupby("user_id")["rating"].transform("mean")
-
-    # Step 4: Average Rating Per Item
-    print("\nStep 4: Creating Average Rating Per Item feature")
-    df["avg_rating_per_item"] = df.groupby("item_id")["rating"].transform("mean")
-
-    # Step 5: Session Co-occurrence
-    print("\nStep 5: Creating Session Co-occurrence feature")
-    df["session_unique_items"] = df.groupby("session_id")["item_id"].transform("nunique")
-
-    # Step 6: Session Interaction Count
-    print("\nStep 6: Creating Session Interaction Count feature")
-    df["session_interaction_count"] = df.groupby("session_id")["item_id"].transform("count")
-
-    # Step 7: Price Bucket
-    print("\nStep 7: Creating Price Bucket feature")
-    df["price_bucket"] = pd.cut(
-        df["price"],
-        bins=[0, 500, 2000, 5000, 10000],
-        labels=["low", "medium", "high", "premium"]
-    )
-
-    # Step 8: Is Rating Event
-    print("\nStep 8: Creating Is-Rating-Event feature")
-    df["is_rating_event"] = (df["event_type"] == "rating").astype(int)
-
-    # Step 9: Popularity Score (already 0–1, keep copy)
-    print("\nStep 9: Creating Normalized Popularity Score feature")
-    df["popularity_score_norm"] = df["popularity_score"]
-
     # -------------------------------------------------
-    # Step 10: Encode categorical variables
+    # Step 1: Compute registered features
     # -------------------------------------------------
-    print("\nStep 10: Encoding categorical features")
-    categorical_cols = ["category", "brand", "price_bucket"]
-    df = pd.get_dummies(df, columns=categorical_cols, prefix=categorical_cols)
+    # The registry resolves the requested features and their prerequisites,
+    # joins products only if needed and shares one groupby per entity key.
+    # features=None builds every registered feature.
+    print("Step 1: Computing features from the feature registry")
+    df = compute_features(interactions_df, products_df, features)
 
     # -------------------------------------------------
-    # Step 11: Normalize numerical variables
+    # Step 2: Fit the transform artifact
     # -------------------------------------------------
-    print("\nStep 11: Normalizing numerical features")
-
-    numeric_cols = [
-        "price",
-        "popularity_score",
-        "user_activity_frequency",
-        "avg_rating_per_user",
-        "avg_rating_per_item",
-        "session_unique_items",
-        "session_interaction_count"
-    ]
+    # Scaler min/max and category/brand vocabularies are persisted so the
+    # exact same encoding can be replayed at serving time via transform().
+    print("\nStep 2: Fitting feature transform artifact (vocabularies + scaler)")
+    artifact = fit_transform_artifact(df, previous_artifact)
 
-    scaler = MinMaxScaler()
-    df[numeric_cols] = scaler.fit_transform(df[numeric_cols])
+    # -------------------------------------------------
+    # Step 3: Encode categorical and normalize numerical variables
+    # -------------------------------------------------
+    print("\nStep 3: Encoding categorical and normalizing numerical features")
+    df = transform(df, artifact)
 
     print("\n================ FEATURE ENGINEERING COMPLETED ================")
-    return df
+    return df, artifact
 
 
 def save_features(df):
-    df["feature_created_at"] = datetime.now()
+    created_at = datetime.now()
+    df["feature_created_at"] = created_at
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"features_{timestamp}.csv"
-    path = os.path.join(FEATURE_STORE_PATH, filename)
-
-    df.to_csv(path, index=False)
+    timestamp = created_at.strftime("%Y%m%d_%H%M%S")
+
+    if SNAPSHOT_FORMAT == "csv":
+        path = os.path.join(FEATURE_STORE_PATH, f"features_{timestamp}.csv")
+        df.to_csv(path, index=False)
+    else:
+        path = os.path.join(FEATURE_STORE_PATH, f"features_{timestamp}.parquet")
+        write_parquet_snapshot(df, path)
     print(f"\nFeature store dataset saved at: {path}")
+
+    # Readers resolve latest / as-of versions through the catalog
+    register_snapshot(path, timestamp, created_at, df.columns, n_rows=len(df))
     return path
 
 
 if __name__ == "__main__":
-    print("\n=== FEATURE ENGINEERING PIPELINE STARTED ===")
-
-    # Load prepared data
-    latest_interactions_file, interactions = load_latest_interactions()
-    latest_products_file, products = load_latest_products()
-
-    # Build features
-    features_df = build_features(interactions, products)
-
-    # Save feature store CSV
-    feature_csv_path = save_features(features_df)
-
-    # Log lineage
-    log_pipeline_run(
-        stage="build_features",
-        input_files=[latest_interactions_file, latest_products_file],
-        output_files=[feature_csv_path]
-    )
-
-    print("\n=== FEATURE ENGINEERING PIPELINE COMPLETED ===")
+    with StageMetrics("build_features") as metrics:
+        print("\n=== FEATURE ENGINEERING PIPELINE STARTED ===")
+
+        # Load prepared data
+        latest_interactions_file, interactions = load_latest_interactions()
+        latest_products_file, products = load_latest_products()
+        metrics.rows_in = len(interactions)
+
+        # Build features (reusing the previous vocabulary keeps one-hot columns stable)
+        previous_artifact = load_transform_artifact()
+        features_df, transform_artifact = build_features(
+            interactions, products, previous_artifact
+        )
+        metrics.rows_out = len(features_df)
+
+        # Save feature store snapshot and the transform artifact used to produce it
+        feature_snapshot_path = save_features(features_df)
+        transform_path = save_transform_artifact(transform_artifact)
+
+        # Per-entity memory-mapped snapshots for scoring/serving workers
+        version = snapshot_version(feature_snapshot_path)
+        user_mmap_path = write_mmap_snapshot(features_df, "user_id", USER_FEATURES, version)
+        item_mmap_path = write_mmap_snapshot(
+            features_df, "item_id", item_feature_columns(features_df), version
+        )
+
+        # Log lineage
+        log_pipeline_run(
+            stage="build_features",
+            input_files=[latest_interactions_file, latest_products_file],
+            output_files=[feature_snapshot_path, transform_path, user_mmap_path, item_mmap_path],
+            metrics=metrics
+        )
+
+        print("\n=== FEATURE ENGINEERING PIPELINE COMPLETED ===")
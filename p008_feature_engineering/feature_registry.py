@@ -0,0 +1,171 @@
+import json
+import numpy as np
+from p008_feature_engineering.feature_transform import (
+    price_to_bucket,
+    PRICE_BUCKET_EDGES,
+    PRICE_BUCKET_LABELS
+)
+
+# --------------------------------------------------
+# Executable feature registry
+#
+# Every feature declares its inputs (raw columns or other features), the
+# entity it describes and how it is computed. Aggregate features declare a
+# (group key, column, agg) triple instead of a function so the builder can
+# serve every aggregate over the same key from a single groupby.
+# Descriptions live in p009_feature_store/metadata/feature_metadata.json.
+# --------------------------------------------------
+
+FEATURE_METADATA_PATH = "p009_feature_store/metadata/feature_metadata.json"
+
+# Columns that only exist after joining the product catalog
+PRODUCT_COLUMNS = [
+    "name", "category", "price", "brand", "rating_avg", "popularity_score", "created_at"
+]
+
+FEATURES = {
+    "user_activity_frequency": {
+        "inputs": ["user_id", "item_id"],
+        "entity": "user_id",
+        "aggregate": ("user_id", "item_id", "count")
+    },
+    "avg_rating_per_user": {
+        "inputs": ["user_id", "rating"],
+        "entity": "user_id",
+        "aggregate": ("user_id", "rating", "mean")
+    },
+    "avg_rating_per_item": {
+        "inputs": ["item_id", "rating"],
+        "entity": "item_id",
+        "aggregate": ("item_id", "rating", "mean")
+    },
+    "session_unique_items": {
+        "inputs": ["session_id", "item_id"],
+        "entity": "session_id",
+        "aggregate": ("session_id", "item_id", "nunique")
+    },
+    "session_interaction_count": {
+        "inputs": ["session_id", "item_id"],
+        "entity": "session_id",
+        "aggregate": ("session_id", "item_id", "count")
+    },
+    "price_bucket": {
+        "inputs": ["price"],
+        "entity": "item_id",
+        "compute": lambda df: price_to_bucket(
+            df["price"].to_numpy(dtype=float), PRICE_BUCKET_EDGES, PRICE_BUCKET_LABELS
+        )
+    },
+    "is_rating_event": {
+        "inputs": ["event_type"],
+        "entity": None,
+        "compute": lambda df: (df["event_type"] == "rating").astype(int)
+    },
+    "popularity_score_norm": {
+        "inputs": ["popularity_score"],
+        "entity": "item_id",
+        "compute": lambda df: df["popularity_score"]
+    }
+}
+
+
+def describe_feature(name, metadata_path=FEATURE_METADATA_PATH):
+    with open(metadata_path, "r") as f:
+        metadata = json.load(f)
+    info = dict(metadata.get(name, {}))
+    spec = FEATURES[name]
+    info["inputs"] = spec["inputs"]
+    info["entity"] = spec["entity"]
+    return info
+
+
+def resolve(requested=None):
+    # Depth-first topological sort over registered features; raw columns are leaves
+    requested = list(FEATURES) if requested is None else list(requested)
+    order = []
+    visiting = set()
+
+    def visit(name):
+        if name in order:
+            return
+        if name in visiting:
+            raise Exception(f"Cycle in feature dependencies at: {name}")
+        if name not in FEATURES:
+            raise Exception(f"Unknown feature: {name}")
+        visiting.add(name)
+        for dep in FEATURES[name]["inputs"]:
+            if dep in FEATURES:
+                visit(dep)
+        visiting.discard(name)
+        order.append(name)
+
+    for name in requested:
+        visit(name)
+
+    # Keep registry declaration order wherever dependencies allow it
+    position = {name: i for i, name in enumerate(FEATURES)}
+    return sorted(order, key=lambda n: (_depth(n), position[n]))
+
+
+def _depth(name):
+    deps = [d for d in FEATURES[name]["inputs"] if d in FEATURES]
+    return 1 + max((_depth(d) for d in deps), default=0)
+
+
+def required_raw_columns(order):
+    columns = set()
+    for name in order:
+        columns.update(c for c in FEATURES[name]["inputs"] if c not in FEATURES)
+    return columns
+
+
+def compute_features(interactions_df, products_df, features=None):
+    order = resolve(features)
+    raw_columns = required_raw_columns(order)
+
+    # The product join is only paid for when a requested feature needs it
+    if raw_columns & set(PRODUCT_COLUMNS):
+        print("Joining interactions with product metadata (on item_id)")
+        df = interactions_df.merge(products_df, on="item_id", how="left")
+    else:
+        df = interactions_df.copy()
+    print(f"Total records: {len(df)}")
+    print(f"Features to compute (with prerequisites): {order}")
+
+    done = set()
+    for name in order:
+        if name in done:
+            continue
+        spec = FEATURES[name]
+
+        if "aggregate" in spec:
+            key = spec["aggregate"][0]
+            # Every pending aggregate on the same key shares this groupby
+            group = [
+                n for n in order
+                if n not in done
+                and "aggregate" in FEATURES[n]
+                and FEATURES[n]["aggregate"][0] == key
+                and all(d in done for d in FEATURES[n]["inputs"] if d in FEATURES)
+            ]
+            print(f"Shared groupby('{key}') -> {group}")
+            grouped = df.groupby(key, sort=False)
+            aggregated = grouped.agg(
+                **{n: (FEATURES[n]["aggregate"][1], FEATURES[n]["aggregate"][2]) for n in group}
+            )
+            # Broadcast back to rows by group number (-1 = missing key -> NaN)
+            codes = grouped.ngroup().to_numpy()
+            has_group = codes >= 0
+            for n in group:
+                values = aggregated[n].to_numpy(dtype=float)
+                df[n] = np.where(has_group, values[np.where(has_group, codes, 0)], np.nan)
+            done.update(group)
+        else:
+            print(f"Computing feature: {name}")
+            df[name] = spec["compute"](df)
+            done.add(name)
+
+    # Stable column layout: inputs first, then features in registry order
+    feature_cols = [n for n in FEATURES if n in done]
+    base_cols = [c for c in df.columns if c not in done]
+    return df[base_cols + feature_cols]
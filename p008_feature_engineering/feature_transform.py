@@ -0,0 +1,176 @@
+import os
+import json
+import bisect
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+# --------------------------------------------------
+# Persisted feature transform artifact
+#
+# Holds everything build_features needs to reproduce the encoding and
+# scaling of a training run on new data: MinMax scaler min/max per numeric
+# column, the category/brand vocabularies and the price bucket edges.
+# --------------------------------------------------
+
+TRANSFORM_STORE_PATH = "p009_feature_store/transforms"
+
+NUMERIC_COLS = [
+    "price",
+    "popularity_score",
+    "user_activity_frequency",
+    "avg_rating_per_user",
+    "avg_rating_per_item",
+    "session_unique_items",
+    "session_interaction_count"
+]
+
+CATEGORICAL_COLS = ["category", "brand", "price_bucket"]
+
+PRICE_BUCKET_EDGES = [0, 500, 2000, 5000, 10000]
+PRICE_BUCKET_LABELS = ["low", "medium", "high", "premium"]
+
+
+def _observed_values(series):
+    return sorted(str(v) for v in series.dropna().unique())
+
+
+def fit_transform_artifact(df, previous_artifact=None):
+    # Vocabularies only ever grow, so one-hot columns stay stable across runs
+    # Only columns present in df are fitted, so a selective build gets a partial artifact
+    categorical_cols = [c for c in CATEGORICAL_COLS if c in df.columns]
+    numeric_cols = [c for c in NUMERIC_COLS if c in df.columns]
+
+    vocabularies = {"price_bucket": list(PRICE_BUCKET_LABELS)}
+    for col in [c for c in ["category", "brand"] if c in categorical_cols]:
+        known = set(_observed_values(df[col]))
+        if previous_artifact is not None:
+            known.update(previous_artifact["vocabularies"].get(col, []))
+        vocabularies[col] = sorted(known)
+
+    scaler = {}
+    for col in numeric_cols:
+        values = df[col].to_numpy(dtype=float)
+        if np.isnan(values).all():
+            col_min, col_max = 0.0, 0.0
+        else:
+            col_min, col_max = float(np.nanmin(values)), float(np.nanmax(values))
+        scaler[col] = {"min": col_min, "max": col_max}
+
+    now = datetime.now()
+    return {
+        "version": now.strftime("%Y%m%d_%H%M%S"),
+        "created_at": now.strftime("%Y-%m-%d %H:%M:%S"),
+        "numeric_cols": numeric_cols,
+        "categorical_cols": categorical_cols,
+        "scaler": scaler,
+        "vocabularies": vocabularies,
+        "price_bucket_edges": list(PRICE_BUCKET_EDGES)
+    }
+
+
+def save_transform_artifact(artifact, base_path=TRANSFORM_STORE_PATH):
+    os.makedirs(base_path, exist_ok=True)
+    path = os.path.join(base_path, f"feature_transform_{artifact['version']}.json")
+    with open(path, "w") as f:
+        json.dump(artifact, f, indent=4)
+    print(f"Feature transform artifact saved at: {path}")
+    return path
+
+
+def load_transform_artifact(path=None, base_path=TRANSFORM_STORE_PATH):
+    if path is None:
+        if not os.path.isdir(base_path):
+            return None
+        files = sorted(
+            f for f in os.listdir(base_path)
+            if f.startswith("feature_transform_") and f.endswith(".json")
+        )
+        if not files:
+            return None
+        # Version is a sortable timestamp, newest file is last
+        path = os.path.join(base_path, files[-1])
+
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def price_to_bucket(price, edges=PRICE_BUCKET_EDGES, labels=PRICE_BUCKET_LABELS):
+    # Same right-closed bins as pd.cut(price, bins=edges, labels=labels)
+    prices = np.asarray(price, dtype=float)
+    idx = np.searchsorted(edges, prices, side="left") - 1
+    valid = (idx >= 0) & (idx < len(labels)) & ~np.isnan(prices)
+    label_arr = np.asarray(labels, dtype=object)
+    return np.where(valid, label_arr[np.clip(idx, 0, len(labels) - 1)], None)
+
+
+def output_columns(artifact):
+    cols = []
+    for col in artifact["categorical_cols"]:
+        cols.extend(f"{col}_{v}" for v in artifact["vocabularies"][col])
+    return cols
+
+
+# --------------------------------------------------
+# Transform: batch (DataFrame) or single row (dict)
+# --------------------------------------------------
+
+def _transform_frame(df, artifact):
+    df = df.copy()
+    edges = artifact["price_bucket_edges"]
+    labels = artifact["vocabularies"]["price_bucket"]
+
+    if "price_bucket" in artifact["categorical_cols"] and "price_bucket" not in df.columns:
+        df["price_bucket"] = price_to_bucket(df["price"].to_numpy(dtype=float), edges, labels)
+
+    # One-hot encode against the fixed vocabulary (same layout as get_dummies)
+    dummy_frames = []
+    for col in artifact["categorical_cols"]:
+        vocab = artifact["vocabularies"][col]
+        codes = pd.Categorical(df[col].astype("object"), categories=vocab).codes
+        one_hot = codes[:, None] == np.arange(len(vocab))
+        dummy_frames.append(pd.DataFrame(
+            one_hot, columns=[f"{col}_{v}" for v in vocab], index=df.index
+        ))
+    df = df.drop(columns=artifact["categorical_cols"])
+    df = pd.concat([df] + dummy_frames, axis=1)
+
+    # MinMax scale with the persisted min/max (zero range maps to 0)
+    numeric_cols = artifact["numeric_cols"]
+    mins = np.array([artifact["scaler"][c]["min"] for c in numeric_cols])
+    ranges = np.array([artifact["scaler"][c]["max"] for c in numeric_cols]) - mins
+    ranges[ranges == 0] = 1.0
+    values = df[numeric_cols].to_numpy(dtype=float)
+    df[numeric_cols] = (values - mins) / ranges
+
+    return df
+
+
+def _transform_row(row, artifact):
+    out = dict(row)
+    if "price_bucket" in artifact["categorical_cols"] and "price_bucket" not in out:
+        edges = artifact["price_bucket_edges"]
+        labels = artifact["vocabularies"]["price_bucket"]
+        idx = bisect.bisect_left(edges, out["price"]) - 1
+        out["price_bucket"] = labels[idx] if 0 <= idx < len(labels) else None
+
+    for col in artifact["categorical_cols"]:
+        value = out.pop(col, None)
+        for v in artifact["vocabularies"][col]:
+            out[f"{col}_{v}"] = value == v
+
+    for col in artifact["numeric_cols"]:
+        value = out.get(col)
+        if value is None:
+            continue
+        col_min = artifact["scaler"][col]["min"]
+        col_range = artifact["scaler"][col]["max"] - col_min
+        out[col] = (value - col_min) / (col_range or 1.0)
+
+    return out
+
+
+def transform(data, artifact):
+    if isinstance(data, dict):
+        return _transform_row(data, artifact)
+    return _transform_frame(data, artifact)
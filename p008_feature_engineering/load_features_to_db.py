@@ -1,121 +1,56 @@
 import os
-import psycopg2
-import pandas as pd
 from p010_lineage.log_lineage import log_pipeline_run
+from p009_feature_store.backends import get_backend
+from p009_feature_store.snapshot_io import get_latest_snapshot, snapshot_row_count
+from p010_lineage.stage_metrics import StageMetrics
 
 FEATURE_STORE_PATH = "p009_feature_store/data"
-TABLE_NAME = "feature_store"
 
-DB_CONFIG = {
-    "database": os.getenv("DB_NAME"),
-    "user": os.getenv("DB_USER"),
-    "password": os.getenv("DB_PASSWORD"),
-    "host": os.getenv("DB_HOST"),
-    "port": os.getenv("DB_PORT")
-}
-
-# Validate environment variables
-for k, v in DB_CONFIG.items():
-    if v is None:
-        raise Exception(f"Environment variable {k} is not set.")
+# COPY tuning: rows per streamed chunk and number of parallel COPY connections
+CHUNK_SIZE = int(os.getenv("LOAD_CHUNK_SIZE", "100000"))
+LOAD_WORKERS = int(os.getenv("LOAD_WORKERS", "1"))
 
 
 def get_latest_feature_file():
-    files = [
-        os.path.join(FEATURE_STORE_PATH, f)
-        for f in os.listdir(FEATURE_STORE_PATH)
-        if f.endswith(".csv")
-    ]
-    if not files:
-        raise Exception("No feature CSV files found.")
-    return max(files, key=os.path.getmtime)
-
-
-def pandas_type_to_postgres(dtype):
-    if "int" in str(dtype):
-        return "INTEGER"
-    elif "float" in str(dtype):
-        return "DOUBLE PRECISION"
-    else:
-        return "TEXT"
-
-
-def create_table_if_not_exists(conn, df):
-    columns = []
-    for col, dtype in zip(df.columns, df.dtypes):
-        pg_type = pandas_type_to_postgres(dtype)
-        columns.append(f'"{col}" {pg_type}')
-
-    create_table_sql = f"""
-    CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
-        id SERIAL PRIMARY KEY,
-        {", ".join(columns)}
-    );
-    """
-
-    cur = conn.cursor()
-    cur.execute(create_table_sql)
-    conn.commit()
-    cur.close()
-
-    print(f"Table '{TABLE_NAME}' checked/created successfully.")
-
-
-def load_to_db(csv_file):
-    print(f"\nLoading feature file into database: {csv_file}")
-    df = pd.read_csv(csv_file)
+    return get_latest_snapshot(FEATURE_STORE_PATH)
 
-    print("Columns detected in CSV:")
-    print(list(df.columns))
-    print(f"Total rows to insert: {len(df)}")
 
-    conn = psycopg2.connect(**DB_CONFIG)
+def load_to_db(snapshot_file, chunk_size=CHUNK_SIZE, workers=LOAD_WORKERS, backend=None):
+    print(f"\nLoading feature file into database: {snapshot_file}")
 
-    # Create table dynamically if not exists
-    create_table_if_not_exists(conn, df)
+    # Backend is chosen by FEATURE_STORE_BACKEND (postgres | sqlite)
+    owns_backend = backend is None
+    if owns_backend:
+        backend = get_backend()
+    print(f"Feature store backend: {backend.name}")
 
-    cur = conn.cursor()
-
-    columns = list(df.columns)
-    placeholders = ", ".join(["%s"] * len(columns))
-    column_names = ", ".join([f'"{c}"' for c in columns])
-
-    insert_query = f"""
-        INSERT INTO {TABLE_NAME} ({column_names})
-        VALUES ({placeholders})
-    """
-
-    inserted = 0
-    for _, row in df.iterrows():
-        cur.execute(insert_query, tuple(row))
-        inserted += 1
-
-        if inserted % 500 == 0:
-            print(f"{inserted} rows inserted...")
-
-    conn.commit()
-    cur.close()
-    conn.close()
-
-    print(f"\nFeature store updated successfully.")
-    print(f"Total rows inserted: {inserted}")
+    try:
+        return backend.load_snapshot(snapshot_file, chunk_size=chunk_size, workers=workers)
+    finally:
+        if owns_backend:
+            backend.close()
 
 
 if __name__ == "__main__":
-    print("\n=== LOADING FEATURE STORE DATA INTO DATABASE ===")
-
-    # 1. Get latest feature CSV
-    latest_csv = get_latest_feature_file()
-    print(f"Latest feature store file detected: {latest_csv}")
-
-    # 2. Load into PostgreSQL
-    load_to_db(latest_csv)
-
-    # 3. Log lineage
-    log_pipeline_run(
-        stage="load_features_to_db",
-        input_files=[latest_csv],
-        output_files=[f"PostgreSQL Table: {TABLE_NAME}"]
-    )
-
-    print("\n=== FEATURE STORE LOAD COMPLETED ===")
+    with StageMetrics("load_features_to_db") as metrics:
+        print("\n=== LOADING FEATURE STORE DATA INTO DATABASE ===")
+
+        # 1. Get latest feature snapshot
+        latest_snapshot = get_latest_feature_file()
+        print(f"Latest feature store file detected: {latest_snapshot}")
+        metrics.rows_in = snapshot_row_count(latest_snapshot)
+
+        # 2. Bulk load into the configured backend
+        backend = get_backend()
+        load_to_db(latest_snapshot, backend=backend)
+        backend.close()
+
+        # 3. Log lineage
+        log_pipeline_run(
+            stage="load_features_to_db",
+            input_files=[latest_snapshot],
+            output_files=[backend.describe()],
+            metrics=metrics
+        )
+
+        print("\n=== FEATURE STORE LOAD COMPLETED ===")
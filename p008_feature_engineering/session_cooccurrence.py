@@ -0,0 +1,317 @@
+import os
+import json
+import time
+import shutil
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from scipy import sparse
+from p010_lineage.log_lineage import log_pipeline_run
+from p010_lineage.stage_metrics import StageMetrics
+from p008_feature_engineering.build_features import get_latest_file, PREPARED_INTERACTIONS_PATH
+
+# --------------------------------------------------
+# Session co-occurrence item-to-item similarity
+#
+# S is the binary session x item matrix (item seen in the session, any
+# event type). One sparse product gives every co-occurrence count:
+#   C = S'S     C[i, j] = sessions containing both i and j
+#               C[i, i] = sessions containing i
+# and the similarity is the cosine C[i, j] / sqrt(C[i, i] C[j, j]).
+# The top-M neighbours of every item are stored as fixed-width arrays
+# (-1 padded), so "customers also viewed" is a dict lookup plus one row
+# slice, and summing the rows of a user's recent items is a cheap
+# candidate generator (SimilarItems.candidates).
+#
+# Incremental update: for the sessions touched by new events only
+#   C += S_new'S_new - S_old'S_old      (touched rows of S, before/after)
+# and top-M is recomputed only for items whose row of C changed or that
+# co-occur with an item whose session count changed. The result is the
+# same as a full rebuild over all events. The state (S, C, id maps) is
+# kept next to the index, one directory per version:
+#   similar_items_<version>/
+#     item_ids.npy neighbours.npy scores.npy    lookup arrays (mmap-able)
+#     session_ids.npy sessions.npz cooccurrence.npz
+#     manifest.json                             counts, source files, mode
+#
+#   python -m p008_feature_engineering.session_cooccurrence
+# updates the latest version with the newest prepared interactions (full
+# build when there is none, or with SIMILAR_ITEMS_REBUILD=1).
+# --------------------------------------------------
+
+SIMILAR_ITEMS_PATH = "p009_feature_store/similar_items"
+TOP_M = int(os.getenv("SIMILAR_ITEMS_TOP_M", "50"))
+# Pairs seen together in fewer sessions are not neighbours
+MIN_COOCCURRENCE = int(os.getenv("SIMILAR_ITEMS_MIN_COOCCURRENCE", "1"))
+KEEP_VERSIONS = int(os.getenv("SIMILAR_ITEMS_KEEP_VERSIONS", "3"))
+REBUILD = os.getenv("SIMILAR_ITEMS_REBUILD", "0") == "1"
+
+
+def extend_ids(known_ids, values):
+    # Codes of values in known_ids, appending unseen values in order of first appearance
+    values = np.asarray(values).astype(str)
+    codes = pd.Index(known_ids).get_indexer(values)
+    if (codes < 0).any():
+        known_ids = np.concatenate([known_ids, pd.unique(values[codes < 0])]).astype(str)
+        codes = pd.Index(known_ids).get_indexer(values)
+    return known_ids, codes
+
+
+def session_matrix(session_codes, item_codes, n_sessions, n_items):
+    # Binary: an item viewed five times in one session counts once
+    matrix = sparse.csr_matrix(
+        (np.ones(len(session_codes), dtype=np.int32), (session_codes, item_codes)), shape=(n_sessions, n_items)
+    )
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix
+
+
+def top_m_neighbours(cooc, rows, m=TOP_M, min_count=MIN_COOCCURRENCE):
+    # (len(rows), m) neighbour ids and cosine scores, best first, ties by item id
+    rows = np.asarray(rows, dtype=np.int64)
+    counts = cooc.diagonal().astype(np.float64)
+    sub = cooc[rows].tocoo()
+
+    keep = (sub.col != rows[sub.row]) & (sub.data >= min_count)
+    r, c, v = sub.row[keep], sub.col[keep], sub.data[keep]
+    sim = v / np.sqrt(counts[rows[r]] * counts[c])
+
+    order = np.lexsort((c, -sim, r))
+    r, c, sim = r[order], c[order], sim[order]
+    rank = np.arange(len(r)) - np.searchsorted(r, r)
+    top = rank < m
+
+    neighbours = np.full((len(rows), m), -1, dtype=np.int32)
+    scores = np.zeros((len(rows), m), dtype=np.float32)
+    neighbours[r[top], rank[top]] = c[top]
+    scores[r[top], rank[top]] = sim[top]
+    return neighbours, scores
+
+
+def _resize(matrix, shape):
+    matrix = matrix.tocsr(copy=True)
+    matrix.resize(shape)
+    return matrix
+
+
+class SessionCooccurrence:
+
+    def __init__(self, item_ids, session_ids, sessions, cooc, neighbours, scores, sources=(), top_m=TOP_M):
+        self.item_ids = np.asarray(item_ids).astype(str)
+        self.session_ids = np.asarray(session_ids).astype(str)
+        self.sessions = sessions
+        self.cooc = cooc
+        self.neighbours = neighbours
+        self.scores = scores
+        # Prepared interaction files already applied
+        self.sources = list(sources)
+        self.top_m = top_m
+
+    @classmethod
+    def build(cls, df, top_m=TOP_M, source=None):
+        item_ids, item_codes = extend_ids(np.array([], dtype=str), df["item_id"])
+        session_ids, session_codes = extend_ids(np.array([], dtype=str), df["session_id"])
+
+        sessions = session_matrix(session_codes, item_codes, len(session_ids), len(item_ids))
+        cooc = (sessions.T @ sessions).tocsr()
+        neighbours, scores = top_m_neighbours(cooc, np.arange(len(item_ids)), top_m)
+        return cls(item_ids, session_ids, sessions, cooc, neighbours, scores, [source] if source else [], top_m)
+
+    def update(self, df, source=None):
+        # Applies new events in place; returns the inner ids whose neighbour lists were recomputed
+        self.item_ids, item_codes = extend_ids(self.item_ids, df["item_id"])
+        self.session_ids, session_codes = extend_ids(self.session_ids, df["session_id"])
+        n_items, n_sessions = len(self.item_ids), len(self.session_ids)
+
+        sessions = _resize(self.sessions, (n_sessions, n_items))
+        added = session_matrix(session_codes, item_codes, n_sessions, n_items)
+        touched = np.unique(session_codes)
+
+        before = sessions[touched]
+        after = before + added[touched]
+        after.data[:] = 1
+        delta = (after.T @ after - before.T @ before).tocsr()
+        delta.eliminate_zeros()
+
+        self.sessions = sessions + added
+        self.sessions.data[:] = 1
+        self.cooc = _resize(self.cooc, (n_items, n_items)) + delta
+
+        # Rows of C that changed, plus every item co-occurring with an item
+        # whose session count (the cosine denominator) changed
+        changed_counts = np.flatnonzero(delta.diagonal())
+        affected = np.union1d(np.unique(delta.tocoo().row), self.cooc[changed_counts].indices)
+
+        neighbours = np.full((n_items, self.top_m), -1, dtype=np.int32)
+        scores = np.zeros((n_items, self.top_m), dtype=np.float32)
+        neighbours[:len(self.neighbours)] = self.neighbours
+        scores[:len(self.scores)] = self.scores
+        neighbours[affected], scores[affected] = top_m_neighbours(self.cooc, affected, self.top_m)
+        self.neighbours, self.scores = neighbours, scores
+
+        if source and source not in self.sources:
+            self.sources.append(source)
+        return affected
+
+    def save(self, base_path=SIMILAR_ITEMS_PATH, mode="full", updated_items=None):
+        version = datetime.now().strftime("%Y%m%d_%H%M%S")
+        out_dir = os.path.join(base_path, f"similar_items_{version}")
+        tmp_dir = out_dir + ".tmp"
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+
+        np.save(os.path.join(tmp_dir, "item_ids.npy"), self.item_ids)
+        np.save(os.path.join(tmp_dir, "neighbours.npy"), self.neighbours)
+        np.save(os.path.join(tmp_dir, "scores.npy"), self.scores)
+        np.save(os.path.join(tmp_dir, "session_ids.npy"), self.session_ids)
+        sparse.save_npz(os.path.join(tmp_dir, "sessions.npz"), self.sessions)
+        sparse.save_npz(os.path.join(tmp_dir, "cooccurrence.npz"), self.cooc)
+
+        manifest = {
+            "version": version,
+            "top_m": self.top_m,
+            "min_cooccurrence": MIN_COOCCURRENCE,
+            "n_items": int(len(self.item_ids)),
+            "n_sessions": int(len(self.session_ids)),
+            "n_pairs": int(self.cooc.nnz - np.count_nonzero(self.cooc.diagonal())) // 2,
+            "mode": mode,
+            "updated_items": int(len(self.item_ids) if updated_items is None else updated_items),
+            "sources": self.sources,
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=4)
+
+        if os.path.exists(out_dir):
+            shutil.rmtree(out_dir)
+        os.replace(tmp_dir, out_dir)
+        return out_dir
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "manifest.json"), "r") as f:
+            manifest = json.load(f)
+        return cls(
+            np.load(os.path.join(path, "item_ids.npy")),
+            np.load(os.path.join(path, "session_ids.npy")),
+            sparse.load_npz(os.path.join(path, "sessions.npz")).tocsr(),
+            sparse.load_npz(os.path.join(path, "cooccurrence.npz")).tocsr(),
+            np.load(os.path.join(path, "neighbours.npy")),
+            np.load(os.path.join(path, "scores.npy")),
+            manifest["sources"],
+            manifest["top_m"]
+        )
+
+
+def get_latest_similar_items(base_path=SIMILAR_ITEMS_PATH):
+    if not os.path.isdir(base_path):
+        return None
+    dirs = sorted(d for d in os.listdir(base_path) if d.startswith("similar_items_") and not d.endswith(".tmp"))
+    # Version is a sortable timestamp, newest directory is last
+    return os.path.join(base_path, dirs[-1]) if dirs else None
+
+
+def prune_versions(base_path=SIMILAR_ITEMS_PATH, keep=KEEP_VERSIONS):
+    dirs = sorted(d for d in os.listdir(base_path) if d.startswith("similar_items_") and not d.endswith(".tmp"))
+    for name in dirs[:-keep]:
+        shutil.rmtree(os.path.join(base_path, name))
+    return dirs[:-keep]
+
+
+# --------------------------------------------------
+# Lookups (serving / candidate generation)
+# --------------------------------------------------
+
+class SimilarItems:
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), "r") as f:
+            self.manifest = json.load(f)
+        # Only the lookup arrays; the update state is never read here
+        self.item_ids = np.load(os.path.join(path, "item_ids.npy"), mmap_mode="r")
+        self.neighbours = np.load(os.path.join(path, "neighbours.npy"), mmap_mode="r")
+        self.scores = np.load(os.path.join(path, "scores.npy"), mmap_mode="r")
+        self.item_index = {raw: inner for inner, raw in enumerate(self.item_ids.tolist())}
+
+    def similar(self, item_id, n=10):
+        # (item ids, cosine scores) of the n most co-occurring items, best first
+        row = self.item_index.get(item_id)
+        if row is None:
+            return self.item_ids[:0], np.empty(0, dtype=np.float32)
+        neighbours = self.neighbours[row, :n]
+        valid = neighbours >= 0
+        return self.item_ids[neighbours[valid]], np.asarray(self.scores[row, :n][valid])
+
+    def candidates(self, item_ids, n=100, weights=None):
+        # Items most similar to a set of seed items (similarity summed over
+        # the seeds, optionally weighted), seeds themselves excluded.
+        # Cost depends on len(item_ids) * M, not on the catalog size.
+        rows = np.array([self.item_index.get(i, -1) for i in item_ids], dtype=np.int64)
+        weights = np.ones(len(rows)) if weights is None else np.asarray(weights, dtype=np.float64)
+        known = rows >= 0
+        rows, weights = rows[known], weights[known]
+        if len(rows) == 0:
+            return self.item_ids[:0], np.empty(0)
+
+        neighbours = self.neighbours[rows].ravel()
+        scores = (self.scores[rows] * weights[:, None]).ravel()
+        valid = (neighbours >= 0) & ~np.isin(neighbours, rows)
+        unique, inverse = np.unique(neighbours[valid], return_inverse=True)
+        totals = np.bincount(inverse, weights=scores[valid], minlength=len(unique))
+
+        top = np.lexsort((unique, -totals))[:n]
+        return self.item_ids[unique[top]], totals[top]
+
+
+if __name__ == "__main__":
+    with StageMetrics("session_cooccurrence") as metrics:
+        print("\n=== SESSION CO-OCCURRENCE INDEX ===")
+        interactions_file = get_latest_file(PREPARED_INTERACTIONS_PATH, ".csv")
+        print(f"Using prepared interactions: {interactions_file}")
+        df = pd.read_csv(interactions_file, usecols=["item_id", "session_id"]).dropna()
+        metrics.rows_in = len(df)
+
+        previous = None if REBUILD else get_latest_similar_items()
+        state = SessionCooccurrence.load(previous) if previous is not None else None
+
+        if state is not None and str(interactions_file) in state.sources:
+            # Re-applying would change nothing (S is binary); keep the current version
+            print(f"{interactions_file} already applied to {previous}")
+            out_dir = previous
+        else:
+            start = time.perf_counter()
+            if state is not None:
+                print(f"Updating {previous}: {len(state.item_ids)} items, {len(state.session_ids)} sessions")
+                updated = state.update(df, source=str(interactions_file))
+                mode = "incremental"
+            else:
+                state = SessionCooccurrence.build(df, source=str(interactions_file))
+                updated = np.arange(len(state.item_ids))
+                mode = "full"
+            elapsed = time.perf_counter() - start
+
+            out_dir = state.save(mode=mode, updated_items=len(updated))
+            pruned = prune_versions()
+            print(f"{'Incremental update' if mode == 'incremental' else 'Full build'} in {elapsed:.2f}s: "
+                  f"{len(state.item_ids)} items, {len(state.session_ids)} sessions, "
+                  f"{len(updated)} neighbour lists recomputed")
+            print(f"Similar-items index saved at: {out_dir}" + (f" (pruned {len(pruned)} old versions)" if pruned else ""))
+        metrics.rows_out = len(state.item_ids)
+
+        index = SimilarItems(out_dir)
+        sample = index.item_ids[0]
+        start = time.perf_counter()
+        items, scores = index.similar(sample, 5)
+        lookup_us = (time.perf_counter() - start) * 1e6
+        print(f"Customers who viewed {sample} also viewed: "
+              f"{dict(zip(items.tolist(), np.round(scores.astype(float), 3).tolist()))} ({lookup_us:.0f} us)")
+
+        log_pipeline_run(
+            stage="session_cooccurrence",
+            input_files=[interactions_file] + ([previous] if previous else []),
+            output_files=[out_dir],
+            metrics=metrics
+        )
@@ -0,0 +1,22 @@
+import os
+from p009_feature_store.backends.base import FeatureStoreBackend
+
+# "postgres" (default) or "sqlite" for the embedded, serverless store
+DEFAULT_BACKEND = os.getenv("FEATURE_STORE_BACKEND", "postgres")
+
+
+def get_backend(name=None, **kwargs):
+    name = (name or DEFAULT_BACKEND).lower()
+
+    # Imported lazily so the SQLite backend never needs psycopg2 installed
+    if name == "postgres":
+        from p009_feature_store.backends.postgres_backend import PostgresBackend
+        return PostgresBackend(**kwargs)
+    if name == "sqlite":
+        from p009_feature_store.backends.sqlite_backend import SQLiteBackend
+        return SQLiteBackend(**kwargs)
+
+    raise Exception(f"Unknown feature store backend: {name}")
+
+
+__all__ = ["FeatureStoreBackend", "get_backend"]
@@ -0,0 +1,38 @@
+# --------------------------------------------------
+# Feature store backend interface
+#
+# load_features_to_db and the retrieval modules only talk to this API, so
+# the PostgreSQL server and the embedded SQLite file are interchangeable.
+# --------------------------------------------------
+
+class FeatureStoreBackend:
+    name = None
+
+    def load_snapshot(self, snapshot_file, chunk_size=100_000, workers=1):
+        # Returns the number of rows inserted/updated
+        raise NotImplementedError
+
+    def get_latest_features(self, limit=10):
+        raise NotImplementedError
+
+    def get_latest_features_for_user(self, user_id, limit=1):
+        raise NotImplementedError
+
+    def get_online_features(self, entity_ids, feature_names, entity_column="user_id"):
+        # Latest value of each feature per entity: {entity_id: {feature: value}}
+        raise NotImplementedError
+
+    def feature_columns(self):
+        raise NotImplementedError
+
+    def describe(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
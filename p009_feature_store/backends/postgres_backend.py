@@ -0,0 +1,467 @@
+import io
+import os
+import time
+import threading
+import psycopg2
+import psycopg2.pool
+import pandas as pd
+import pyarrow.csv as pacsv
+from concurrent.futures import ThreadPoolExecutor
+from p009_feature_store.backends.base import FeatureStoreBackend
+from p009_feature_store.backends.schema import (
+    TABLE_NAME,
+    VERSIONS_TABLE,
+    ENTITY_KEY,
+    column_type,
+    quote_columns,
+    validate_online_request
+)
+from p009_feature_store.snapshot_io import (
+    read_snapshot_schema,
+    iter_snapshot_batches,
+    snapshot_version,
+    snapshot_row_count
+)
+
+
+def db_config_from_env():
+    config = {
+        "database": os.getenv("DB_NAME"),
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+        "host": os.getenv("DB_HOST"),
+        "port": os.getenv("DB_PORT")
+    }
+
+    # Validate environment variables (only when the Postgres backend is used)
+    for k, v in config.items():
+        if v is None:
+            raise Exception(f"Environment variable {k} is not set.")
+    return config
+
+
+# Pool used by online lookups (get_online_features)
+POOL_MIN_CONN = int(os.getenv("DB_POOL_MIN", "1"))
+POOL_MAX_CONN = int(os.getenv("DB_POOL_MAX", "8"))
+
+
+def partition_name(version):
+    return f"{TABLE_NAME}_v{version}"
+
+
+# --------------------------------------------------
+# COPY helpers
+# --------------------------------------------------
+
+def chunk_to_copy_buffer(batch):
+    # Arrow's CSV writer is C++ and releases the GIL; nulls are written as
+    # empty unquoted fields, which COPY reads as NULL
+    buf = io.BytesIO()
+    pacsv.write_csv(batch, buf, pacsv.WriteOptions(include_header=False))
+    buf.seek(0)
+    return buf
+
+
+def copy_chunk(cur, table_name, column_names, batch):
+    copy_sql = f"COPY {table_name} ({column_names}) FROM STDIN WITH (FORMAT csv)"
+    cur.copy_expert(copy_sql, chunk_to_copy_buffer(batch))
+    return batch.num_rows
+
+
+def create_staging_table(cur, staging_table, schema_df, unlogged):
+    columns = [
+        f'"{col}" {column_type(col, dtype).replace(" NOT NULL", "")}'
+        for col, dtype in zip(schema_df.columns, schema_df.dtypes)
+    ]
+    if unlogged:
+        # Shared across worker connections, so it must be a real table
+        cur.execute(f"DROP TABLE IF EXISTS {staging_table};")
+        cur.execute(f"CREATE UNLOGGED TABLE {staging_table} ({', '.join(columns)});")
+    else:
+        cur.execute(f"CREATE TEMP TABLE {staging_table} ({', '.join(columns)}) ON COMMIT DROP;")
+
+
+class PostgresBackend(FeatureStoreBackend):
+    name = "postgres"
+
+    def __init__(self, db_config=None):
+        # Env vars are only checked on first use, not at import time
+        self._db_config = db_config
+        self._conn = None
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._columns = None
+
+    @property
+    def db_config(self):
+        if self._db_config is None:
+            self._db_config = db_config_from_env()
+        return self._db_config
+
+    def connection(self):
+        # One long-lived connection per backend instance
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg2.connect(**self.db_config)
+        return self._conn
+
+    def pool(self):
+        # Thread-safe pool for concurrent online reads, created on first use
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = psycopg2.pool.ThreadedConnectionPool(
+                    POOL_MIN_CONN, POOL_MAX_CONN, **self.db_config
+                )
+        return self._pool
+
+    def close(self):
+        if self._conn is not None and not self._conn.closed:
+            self._conn.close()
+        self._conn = None
+        if self._pool is not None:
+            self._pool.closeall()
+        self._pool = None
+
+    def describe(self):
+        return f"PostgreSQL Table: {TABLE_NAME}"
+
+    # --------------------------------------------------
+    # Schema
+    # --------------------------------------------------
+
+    def create_table_if_not_exists(self, df):
+        conn = self.connection()
+        cur = conn.cursor()
+
+        # Tables created by older loads (SERIAL id, all-TEXT columns) are kept aside
+        cur.execute(
+            "SELECT c.relkind FROM pg_class c "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE c.relname = %s AND n.nspname = current_schema();",
+            (TABLE_NAME,)
+        )
+        existing = cur.fetchone()
+        if existing is not None and existing[0] != "p":
+            print(f"Legacy '{TABLE_NAME}' table found, renaming to '{TABLE_NAME}_legacy'")
+            cur.execute(f"ALTER TABLE {TABLE_NAME} RENAME TO {TABLE_NAME}_legacy;")
+
+        columns = [f'"{col}" {column_type(col, dtype)}' for col, dtype in zip(df.columns, df.dtypes)]
+        cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+            feature_version TEXT NOT NULL,
+            {", ".join(columns)},
+            PRIMARY KEY (feature_version, {quote_columns(ENTITY_KEY)})
+        ) PARTITION BY LIST (feature_version);
+        """)
+
+        # New vocabulary entries show up as new one-hot columns
+        for col, dtype in zip(df.columns, df.dtypes):
+            pg_type = column_type(col, dtype).replace(" NOT NULL", "")
+            cur.execute(f'ALTER TABLE {TABLE_NAME} ADD COLUMN IF NOT EXISTS "{col}" {pg_type};')
+
+        # Entity + time indexes: "latest features for user X" is an index lookup
+        cur.execute(
+            f"CREATE INDEX IF NOT EXISTS {TABLE_NAME}_user_created_idx "
+            f"ON {TABLE_NAME} (user_id, feature_created_at DESC);"
+        )
+        cur.execute(
+            f"CREATE INDEX IF NOT EXISTS {TABLE_NAME}_item_created_idx "
+            f"ON {TABLE_NAME} (item_id, feature_created_at DESC);"
+        )
+        cur.execute(
+            f"CREATE INDEX IF NOT EXISTS {TABLE_NAME}_created_idx "
+            f"ON {TABLE_NAME} (feature_created_at DESC);"
+        )
+
+        cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {VERSIONS_TABLE} (
+            feature_version TEXT PRIMARY KEY,
+            snapshot_file TEXT NOT NULL,
+            row_count BIGINT NOT NULL,
+            loaded_at TIMESTAMP NOT NULL DEFAULT now()
+        );
+        """)
+
+        conn.commit()
+        cur.close()
+
+        print(f"Table '{TABLE_NAME}' checked/created successfully.")
+
+    def is_version_loaded(self, version, row_count):
+        cur = self.connection().cursor()
+        cur.execute(
+            f"SELECT row_count FROM {VERSIONS_TABLE} WHERE feature_version = %s;",
+            (version,)
+        )
+        row = cur.fetchone()
+        cur.close()
+        return row is not None and row[0] == row_count
+
+    # --------------------------------------------------
+    # COPY into staging
+    # --------------------------------------------------
+
+    def _copy_sequential(self, snapshot_file, schema_df, chunk_size):
+        # Everything in one transaction: either the whole snapshot lands or nothing
+        staging_table = f"{TABLE_NAME}_staging"
+        column_names = quote_columns(schema_df.columns)
+
+        cur = self.connection().cursor()
+        create_staging_table(cur, staging_table, schema_df, unlogged=False)
+        loaded = 0
+        for batch in iter_snapshot_batches(snapshot_file, chunk_size):
+            loaded += copy_chunk(cur, staging_table, column_names, batch)
+            print(f"{loaded} rows copied...")
+        cur.close()
+        return staging_table, loaded
+
+    def _copy_parallel(self, snapshot_file, schema_df, chunk_size, workers, staging_table):
+        column_names = quote_columns(schema_df.columns)
+
+        conn = self.connection()
+        cur = conn.cursor()
+        create_staging_table(cur, staging_table, schema_df, unlogged=True)
+        conn.commit()
+        cur.close()
+
+        # One connection per worker thread; psycopg2 releases the GIL during COPY
+        local = threading.local()
+        worker_conns = []
+        conns_lock = threading.Lock()
+        db_config = self.db_config
+
+        def copy_into_staging(batch):
+            if not hasattr(local, "conn"):
+                local.conn = psycopg2.connect(**db_config)
+                with conns_lock:
+                    worker_conns.append(local.conn)
+            worker_cur = local.conn.cursor()
+            n = copy_chunk(worker_cur, staging_table, column_names, batch)
+            local.conn.commit()
+            worker_cur.close()
+            return n
+
+        loaded = 0
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                pending = []
+                for batch in iter_snapshot_batches(snapshot_file, chunk_size):
+                    pending.append(pool.submit(copy_into_staging, batch))
+                    # Keep at most 2 chunks per worker in memory
+                    if len(pending) >= 2 * workers:
+                        loaded += pending.pop(0).result()
+                        print(f"{loaded} rows copied to staging...")
+                for future in pending:
+                    loaded += future.result()
+        finally:
+            for worker_conn in worker_conns:
+                worker_conn.close()
+
+        return staging_table, loaded
+
+    def _drop_staging_table(self, staging_table):
+        # The parallel staging table is committed before the copy, so a
+        # rollback does not remove it
+        conn = self.connection()
+        cur = conn.cursor()
+        try:
+            cur.execute(f"DROP TABLE IF EXISTS {staging_table};")
+            conn.commit()
+        except psycopg2.Error as e:
+            conn.rollback()
+            print(f"WARNING: could not drop staging table {staging_table}: {e}")
+        finally:
+            cur.close()
+
+    # --------------------------------------------------
+    # Publish: upsert staged rows into the version partition
+    # --------------------------------------------------
+
+    def _publish_version(self, staging_table, schema_df, version, snapshot_file, loaded):
+        cur = self.connection().cursor()
+        columns = list(schema_df.columns)
+        column_names = quote_columns(columns)
+        key_columns = quote_columns(["feature_version"] + ENTITY_KEY)
+        value_columns = [c for c in columns if c not in ENTITY_KEY]
+
+        partition = partition_name(version)
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL;", (partition,))
+        partition_exists = cur.fetchone()[0]
+
+        if not partition_exists:
+            # Fresh version: plain insert into a new partition, duplicates keep the first row
+            cur.execute(
+                f"CREATE TABLE {partition} PARTITION OF {TABLE_NAME} FOR VALUES IN (%s);",
+                (version,)
+            )
+            cur.execute(
+                f"""
+                INSERT INTO {TABLE_NAME} (feature_version, {column_names})
+                SELECT %s, {column_names} FROM {staging_table}
+                ON CONFLICT ({key_columns}) DO NOTHING;
+                """,
+                (version,)
+            )
+        else:
+            # Re-load: upsert on key, rows identical to what is stored are not rewritten
+            update_set = ", ".join([f'"{c}" = EXCLUDED."{c}"' for c in value_columns])
+            changed = " OR ".join(
+                [f'{TABLE_NAME}."{c}" IS DISTINCT FROM EXCLUDED."{c}"' for c in value_columns]
+            )
+            cur.execute(
+                f"""
+                INSERT INTO {TABLE_NAME} (feature_version, {column_names})
+                SELECT DISTINCT ON ({quote_columns(ENTITY_KEY)}) %s, {column_names}
+                FROM {staging_table}
+                ON CONFLICT ({key_columns}) DO UPDATE SET {update_set}
+                WHERE {changed};
+                """,
+                (version,)
+            )
+        upserted = cur.rowcount
+
+        cur.execute(f"DROP TABLE IF EXISTS {staging_table};")
+        cur.execute(
+            f"""
+            INSERT INTO {VERSIONS_TABLE} (feature_version, snapshot_file, row_count)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (feature_version) DO UPDATE
+            SET snapshot_file = EXCLUDED.snapshot_file,
+                row_count = EXCLUDED.row_count,
+                loaded_at = now();
+            """,
+            (version, str(snapshot_file), loaded)
+        )
+        cur.close()
+        return upserted
+
+    def load_snapshot(self, snapshot_file, chunk_size=100_000, workers=1):
+        schema_df = read_snapshot_schema(snapshot_file)
+        version = snapshot_version(snapshot_file)
+
+        print("Columns detected in snapshot:")
+        print(list(schema_df.columns))
+        print(f"Feature version: {version}")
+
+        # Create the typed, partitioned table if not exists
+        self.create_table_if_not_exists(schema_df)
+
+        row_count = snapshot_row_count(snapshot_file)
+        if row_count is not None and self.is_version_loaded(version, row_count):
+            print(f"Feature version {version} already loaded ({row_count} rows). Nothing to do.")
+            return 0
+
+        print(f"Bulk loading via COPY (chunk_size={chunk_size}, workers={workers})")
+
+        conn = self.connection()
+        start = time.perf_counter()
+        parallel_staging = f"{TABLE_NAME}_staging_{os.getpid()}" if workers > 1 else None
+        try:
+            if parallel_staging is not None:
+                staging_table, loaded = self._copy_parallel(
+                    snapshot_file, schema_df, chunk_size, workers, parallel_staging
+                )
+            else:
+                staging_table, loaded = self._copy_sequential(
+                    snapshot_file, schema_df, chunk_size
+                )
+            upserted = self._publish_version(
+                staging_table, schema_df, version, snapshot_file, loaded
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            # No-op after a successful publish, which drops it in its transaction
+            if parallel_staging is not None:
+                self._drop_staging_table(parallel_staging)
+        elapsed = time.perf_counter() - start
+
+        print(f"\nFeature store updated successfully.")
+        print(f"Total rows read: {loaded}")
+        print(f"Rows inserted/updated in partition {partition_name(version)}: {upserted}")
+        print(f"Load time: {elapsed:.2f}s ({loaded / elapsed if elapsed else 0:,.0f} rows/sec)")
+        return upserted
+
+    # --------------------------------------------------
+    # Reads
+    # --------------------------------------------------
+
+    def _read_sql(self, query, params):
+        conn = self.connection()
+        try:
+            df = pd.read_sql(query, conn, params=params)
+        finally:
+            # Read-only queries should not leave the shared connection in a transaction
+            conn.rollback()
+        return df
+
+    def get_latest_features(self, limit=10):
+        # feature_created_at is a typed, indexed TIMESTAMP
+        query = f"""
+            SELECT *
+            FROM {TABLE_NAME}
+            ORDER BY feature_created_at DESC
+            LIMIT %s;
+        """
+        return self._read_sql(query, (limit,))
+
+    def get_latest_features_for_user(self, user_id, limit=1):
+        # Served by the (user_id, feature_created_at DESC) index
+        query = f"""
+            SELECT *
+            FROM {TABLE_NAME}
+            WHERE user_id = %s
+            ORDER BY feature_created_at DESC
+            LIMIT %s;
+        """
+        return self._read_sql(query, (user_id, limit))
+
+    # --------------------------------------------------
+    # Online lookups
+    # --------------------------------------------------
+
+    def feature_columns(self):
+        if self._columns is None:
+            pool = self.pool()
+            conn = pool.getconn()
+            try:
+                cur = conn.cursor()
+                cur.execute(
+                    "SELECT column_name FROM information_schema.columns "
+                    "WHERE table_name = %s AND table_schema = current_schema();",
+                    (TABLE_NAME,)
+                )
+                self._columns = {row[0] for row in cur.fetchall()}
+                cur.close()
+                conn.rollback()
+            finally:
+                pool.putconn(conn)
+        return self._columns
+
+    def get_online_features(self, entity_ids, feature_names, entity_column="user_id"):
+        validate_online_request(entity_column, feature_names, self.feature_columns())
+        if not entity_ids:
+            return {}
+
+        # One round trip for the whole batch; DISTINCT ON walks the
+        # (entity, feature_created_at DESC) index and keeps the newest row
+        query = f"""
+            SELECT DISTINCT ON ("{entity_column}") "{entity_column}", {quote_columns(feature_names)}
+            FROM {TABLE_NAME}
+            WHERE "{entity_column}" = ANY(%s)
+            ORDER BY "{entity_column}", feature_created_at DESC;
+        """
+
+        pool = self.pool()
+        conn = pool.getconn()
+        try:
+            cur = conn.cursor()
+            cur.execute(query, (list(entity_ids),))
+            rows = cur.fetchall()
+            cur.close()
+            conn.rollback()
+        finally:
+            pool.putconn(conn)
+
+        return {row[0]: dict(zip(feature_names, row[1:])) for row in rows}
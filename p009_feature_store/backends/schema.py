@@ -0,0 +1,72 @@
+import pandas as pd
+
+# --------------------------------------------------
+# Typed feature_store schema shared by all backends
+# --------------------------------------------------
+
+TABLE_NAME = "feature_store"
+VERSIONS_TABLE = "feature_store_versions"
+
+# One feature row per interaction; the key identifies it within a version
+ENTITY_KEY = ["user_id", "item_id", "session_id", "event_type", "timestamp"]
+
+COLUMN_TYPES = {
+    "user_id": "TEXT NOT NULL",
+    "item_id": "TEXT NOT NULL",
+    "event_type": "TEXT NOT NULL",
+    "rating": "REAL",
+    "timestamp": "TIMESTAMP NOT NULL",
+    "device": "TEXT",
+    "session_id": "TEXT NOT NULL",
+    "name": "TEXT",
+    "price": "REAL",
+    "rating_avg": "REAL",
+    "popularity_score": "REAL",
+    "created_at": "TIMESTAMP",
+    "user_activity_frequency": "REAL",
+    "avg_rating_per_user": "REAL",
+    "avg_rating_per_item": "REAL",
+    "session_unique_items": "REAL",
+    "session_interaction_count": "REAL",
+    "is_rating_event": "SMALLINT",
+    "popularity_score_norm": "REAL",
+    "feature_created_at": "TIMESTAMP NOT NULL"
+}
+
+ONE_HOT_PREFIXES = ("category_", "brand_", "price_bucket_")
+
+# Entity columns that have a (key, feature_created_at DESC) index
+ONLINE_ENTITY_COLUMNS = ("user_id", "item_id")
+
+
+def pandas_type_to_postgres(dtype):
+    if pd.api.types.is_bool_dtype(dtype):
+        return "BOOLEAN"
+    elif pd.api.types.is_datetime64_any_dtype(dtype):
+        return "TIMESTAMP"
+    elif pd.api.types.is_integer_dtype(dtype):
+        return "BIGINT"
+    elif pd.api.types.is_float_dtype(dtype):
+        return "DOUBLE PRECISION"
+    else:
+        return "TEXT"
+
+
+def column_type(col, dtype):
+    if col in COLUMN_TYPES:
+        return COLUMN_TYPES[col]
+    if col.startswith(ONE_HOT_PREFIXES):
+        return "BOOLEAN"
+    return pandas_type_to_postgres(dtype)
+
+
+def quote_columns(columns):
+    return ", ".join([f'"{c}"' for c in columns])
+
+
+def validate_online_request(entity_column, feature_names, known_columns):
+    if entity_column not in ONLINE_ENTITY_COLUMNS:
+        raise Exception(f"Online lookups are only indexed for {ONLINE_ENTITY_COLUMNS}")
+    unknown = [f for f in feature_names if f not in known_columns]
+    if unknown:
+        raise Exception(f"Unknown feature(s): {unknown}")
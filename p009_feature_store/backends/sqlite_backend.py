@@ -0,0 +1,256 @@
+import os
+import time
+import sqlite3
+import pandas as pd
+import pyarrow as pa
+from p009_feature_store.backends.base import FeatureStoreBackend
+from p009_feature_store.backends.schema import (
+    TABLE_NAME,
+    VERSIONS_TABLE,
+    ENTITY_KEY,
+    column_type,
+    quote_columns,
+    validate_online_request
+)
+from p009_feature_store.snapshot_io import (
+    read_snapshot_schema,
+    iter_snapshot_batches,
+    snapshot_version,
+    snapshot_row_count
+)
+
+# --------------------------------------------------
+# Embedded SQLite backend
+#
+# Runs in-process on a local file: no server, no network round trips.
+# Timestamps are stored as ISO text, which sorts chronologically.
+# --------------------------------------------------
+
+SQLITE_PATH = os.getenv("FEATURE_STORE_SQLITE_PATH", "p009_feature_store/feature_store.db")
+
+
+def sqlite_type(col, dtype):
+    pg_type = column_type(col, dtype)
+    not_null = " NOT NULL" if pg_type.endswith("NOT NULL") else ""
+    base = pg_type.replace(" NOT NULL", "")
+    if base in ("BOOLEAN", "SMALLINT", "INTEGER", "BIGINT"):
+        return "INTEGER" + not_null
+    if base in ("REAL", "DOUBLE PRECISION"):
+        return "REAL" + not_null
+    return "TEXT" + not_null
+
+
+def batch_to_rows(batch):
+    # Timestamps -> ISO text, dictionaries -> plain strings, then row tuples
+    columns = []
+    for col in batch.columns:
+        if pa.types.is_timestamp(col.type):
+            col = col.cast(pa.string())
+        elif pa.types.is_dictionary(col.type):
+            col = col.cast(col.type.value_type)
+        columns.append(col.to_pylist())
+    return list(zip(*columns))
+
+
+class SQLiteBackend(FeatureStoreBackend):
+    name = "sqlite"
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self._conn = None
+        self._columns = None
+
+    def connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL;")
+            self._conn.execute("PRAGMA synchronous=NORMAL;")
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+
+    def describe(self):
+        return f"SQLite Table: {TABLE_NAME} ({self.path})"
+
+    # --------------------------------------------------
+    # Schema
+    # --------------------------------------------------
+
+    def create_table_if_not_exists(self, df):
+        conn = self.connection()
+        columns = [f'"{col}" {sqlite_type(col, dtype)}' for col, dtype in zip(df.columns, df.dtypes)]
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+            feature_version TEXT NOT NULL,
+            {", ".join(columns)},
+            PRIMARY KEY (feature_version, {quote_columns(ENTITY_KEY)})
+        );
+        """)
+
+        # New vocabulary entries show up as new one-hot columns
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({TABLE_NAME});")}
+        for col, dtype in zip(df.columns, df.dtypes):
+            if col not in existing:
+                col_type = sqlite_type(col, dtype).replace(" NOT NULL", "")
+                conn.execute(f'ALTER TABLE {TABLE_NAME} ADD COLUMN "{col}" {col_type};')
+
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {TABLE_NAME}_user_created_idx "
+            f"ON {TABLE_NAME} (user_id, feature_created_at DESC);"
+        )
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {TABLE_NAME}_item_created_idx "
+            f"ON {TABLE_NAME} (item_id, feature_created_at DESC);"
+        )
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {TABLE_NAME}_created_idx "
+            f"ON {TABLE_NAME} (feature_created_at DESC);"
+        )
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {VERSIONS_TABLE} (
+            feature_version TEXT PRIMARY KEY,
+            snapshot_file TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            loaded_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+        """)
+        conn.commit()
+
+        print(f"Table '{TABLE_NAME}' checked/created successfully in {self.path}.")
+
+    def is_version_loaded(self, version, row_count):
+        row = self.connection().execute(
+            f"SELECT row_count FROM {VERSIONS_TABLE} WHERE feature_version = ?;",
+            (version,)
+        ).fetchone()
+        return row is not None and row[0] == row_count
+
+    # --------------------------------------------------
+    # Load
+    # --------------------------------------------------
+
+    def load_snapshot(self, snapshot_file, chunk_size=100_000, workers=1):
+        schema_df = read_snapshot_schema(snapshot_file)
+        version = snapshot_version(snapshot_file)
+
+        print("Columns detected in snapshot:")
+        print(list(schema_df.columns))
+        print(f"Feature version: {version}")
+
+        self.create_table_if_not_exists(schema_df)
+
+        row_count = snapshot_row_count(snapshot_file)
+        if row_count is not None and self.is_version_loaded(version, row_count):
+            print(f"Feature version {version} already loaded ({row_count} rows). Nothing to do.")
+            return 0
+
+        # SQLite has a single writer, so workers is ignored here
+        print(f"Bulk loading into SQLite (chunk_size={chunk_size})")
+
+        columns = list(schema_df.columns)
+        column_names = quote_columns(columns)
+        key_columns = quote_columns(["feature_version"] + ENTITY_KEY)
+        value_columns = [c for c in columns if c not in ENTITY_KEY]
+        placeholders = ", ".join(["?"] * (len(columns) + 1))
+        update_set = ", ".join([f'"{c}" = excluded."{c}"' for c in value_columns])
+        changed = " OR ".join(
+            [f'{TABLE_NAME}."{c}" IS NOT excluded."{c}"' for c in value_columns]
+        )
+        upsert_sql = f"""
+            INSERT INTO {TABLE_NAME} (feature_version, {column_names})
+            VALUES ({placeholders})
+            ON CONFLICT ({key_columns}) DO UPDATE SET {update_set}
+            WHERE {changed};
+        """
+
+        conn = self.connection()
+        start = time.perf_counter()
+        loaded = 0
+        before = conn.total_changes
+        try:
+            # Whole snapshot in one transaction
+            conn.execute("BEGIN;")
+            for batch in iter_snapshot_batches(snapshot_file, chunk_size):
+                rows = batch_to_rows(batch)
+                conn.executemany(upsert_sql, [(version,) + row for row in rows])
+                loaded += len(rows)
+                print(f"{loaded} rows loaded...")
+            conn.execute(
+                f"""
+                INSERT INTO {VERSIONS_TABLE} (feature_version, snapshot_file, row_count)
+                VALUES (?, ?, ?)
+                ON CONFLICT (feature_version) DO UPDATE
+                SET snapshot_file = excluded.snapshot_file,
+                    row_count = excluded.row_count,
+                    loaded_at = CURRENT_TIMESTAMP;
+                """,
+                (version, str(snapshot_file), loaded)
+            )
+            upserted = conn.total_changes - before - 1
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        elapsed = time.perf_counter() - start
+
+        print(f"\nFeature store updated successfully.")
+        print(f"Total rows read: {loaded}")
+        print(f"Rows inserted/updated for version {version}: {upserted}")
+        print(f"Load time: {elapsed:.2f}s ({loaded / elapsed if elapsed else 0:,.0f} rows/sec)")
+        return upserted
+
+    # --------------------------------------------------
+    # Reads
+    # --------------------------------------------------
+
+    def get_latest_features(self, limit=10):
+        query = f"""
+            SELECT *
+            FROM {TABLE_NAME}
+            ORDER BY feature_created_at DESC
+            LIMIT ?;
+        """
+        return pd.read_sql(query, self.connection(), params=(limit,))
+
+    def get_latest_features_for_user(self, user_id, limit=1):
+        query = f"""
+            SELECT *
+            FROM {TABLE_NAME}
+            WHERE user_id = ?
+            ORDER BY feature_created_at DESC
+            LIMIT ?;
+        """
+        return pd.read_sql(query, self.connection(), params=(user_id, limit))
+
+    # --------------------------------------------------
+    # Online lookups
+    # --------------------------------------------------
+
+    def feature_columns(self):
+        if self._columns is None:
+            rows = self.connection().execute(f"PRAGMA table_info({TABLE_NAME});")
+            self._columns = {row[1] for row in rows}
+        return self._columns
+
+    def get_online_features(self, entity_ids, feature_names, entity_column="user_id"):
+        validate_online_request(entity_column, feature_names, self.feature_columns())
+        if not entity_ids:
+            return {}
+
+        # SQLite returns bare columns from the row holding MAX(), so this is
+        # "newest row per entity" served by the (entity, feature_created_at) index
+        placeholders = ", ".join(["?"] * len(entity_ids))
+        query = f"""
+            SELECT "{entity_column}", MAX(feature_created_at), {quote_columns(feature_names)}
+            FROM {TABLE_NAME}
+            WHERE "{entity_column}" IN ({placeholders})
+            GROUP BY "{entity_column}";
+        """
+        rows = self.connection().execute(query, list(entity_ids)).fetchall()
+        return {row[0]: dict(zip(feature_names, row[2:])) for row in rows}
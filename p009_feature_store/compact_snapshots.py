@@ -0,0 +1,307 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from p010_lineage.log_lineage import log_pipeline_run
+from p010_lineage.stage_metrics import StageMetrics
+from p009_feature_store.snapshot_io import (
+    FEATURE_STORE_PATH,
+    COMPRESSION,
+    DICTIONARY_COLS,
+    list_snapshots,
+    read_snapshot,
+    snapshot_version,
+    to_snapshot_types
+)
+from p009_feature_store.snapshot_catalog import (
+    CATALOG_PATH,
+    load_catalog,
+    save_catalog,
+    find_entry,
+    resolve_version,
+    version_to_datetime
+)
+
+# --------------------------------------------------
+# Feature store compaction and retention
+#
+# Raw snapshots are full copies of every feature row, so consecutive runs
+# mostly repeat each other. Compaction folds them into one store that is
+# partitioned into user_id hash buckets and keeps each distinct row once,
+# with the range of versions it was valid for:
+#
+#   _valid_from <= V < _valid_to      (open rows have _valid_to = OPEN_VERSION)
+#
+# Reading "as of V" is a row-group filtered scan of that store. Retention
+# expires old versions, drops rows no retained version can see and deletes
+# raw snapshot files once they are compacted, keeping only the newest few.
+# --------------------------------------------------
+
+COMPACTED_STORE_PATH = "p009_feature_store/compacted"
+NUM_BUCKETS = int(os.getenv("FEATURE_COMPACTION_BUCKETS", "16"))
+
+# Versions that stay queryable, and raw snapshot files kept next to them
+RETENTION_VERSIONS = int(os.getenv("FEATURE_RETENTION_VERSIONS", "10"))
+RAW_SNAPSHOTS_TO_KEEP = int(os.getenv("FEATURE_RAW_SNAPSHOTS_TO_KEEP", "1"))
+
+OPEN_VERSION = "99999999_999999"
+ROW_KEY = ["user_id", "item_id", "session_id", "event_type", "timestamp"]
+
+
+def bucket_of(user_ids, num_buckets=NUM_BUCKETS):
+    # Deterministic across processes (pandas uses a fixed hash key)
+    values = pd.Series(user_ids).astype(str).to_numpy(dtype=object)
+    return (pd.util.hash_array(values) % num_buckets).astype(int)
+
+
+def bucket_path(bucket, base_path=COMPACTED_STORE_PATH):
+    return os.path.join(base_path, f"bucket={bucket:02d}", "part-0.parquet")
+
+
+def sync_catalog(base_path=FEATURE_STORE_PATH, catalog_path=CATALOG_PATH):
+    # One-off migration: register snapshots written before the catalog existed
+    catalog = load_catalog(catalog_path)
+    added = 0
+    for path in list_snapshots(base_path):
+        version = snapshot_version(path)
+        if find_entry(catalog, version) is not None:
+            continue
+        try:
+            created_at = version_to_datetime(version)
+        except ValueError:
+            print(f"Skipping snapshot with unrecognised name: {path}")
+            continue
+        df = read_snapshot(path)
+        catalog["snapshots"].append({
+            "version": version,
+            "raw_path": path,
+            "format": os.path.splitext(path)[1].lstrip("."),
+            "created_at": str(created_at),
+            "columns": list(df.columns),
+            "n_rows": int(len(df)),
+            "bytes": os.path.getsize(path),
+            "compacted": False,
+            "status": "active"
+        })
+        added += 1
+    if added:
+        save_catalog(catalog, catalog_path)
+    print(f"Catalog sync: {added} untracked snapshot(s) registered")
+    return catalog
+
+
+def _prepare_snapshot_rows(path, num_buckets=NUM_BUCKETS):
+    df = to_snapshot_types(read_snapshot(path))
+    df = df.drop(columns=["feature_created_at"], errors="ignore")
+
+    # Row identity = key + feature values, independent of when it was computed
+    df["_row_hash"] = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    key = [c for c in ROW_KEY if c in df.columns]
+    df = df.drop_duplicates(subset=key, keep="last").drop_duplicates(subset=["_row_hash"])
+    df["_bucket"] = bucket_of(df["user_id"], num_buckets)
+    return df
+
+
+def _write_bucket(df, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+
+    # Sorted by user so row-group statistics prune user_id filters
+    df = df.sort_values(["user_id", "_valid_from"], kind="stable").reset_index(drop=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(
+        table,
+        tmp_path,
+        compression=COMPRESSION,
+        use_dictionary=[c for c in DICTIONARY_COLS + ["_valid_from", "_valid_to"] if c in df.columns],
+        write_statistics=True
+    )
+    os.replace(tmp_path, path)
+
+
+def _read_bucket(path):
+    if not os.path.exists(path):
+        return None
+    df = pq.read_table(path).to_pandas()
+    return to_snapshot_types(df)
+
+
+def _apply_version(store, new_rows, version):
+    # Close rows that disappeared or changed, open rows that are new or changed
+    if store is None or store.empty:
+        added = new_rows.assign(_valid_from=version, _valid_to=OPEN_VERSION)
+        return added, len(added), 0
+
+    is_open = (store["_valid_to"] == OPEN_VERSION).to_numpy()
+    open_hashes = store["_row_hash"].to_numpy()[is_open]
+    new_hashes = new_rows["_row_hash"].to_numpy()
+
+    closing = is_open & ~np.isin(store["_row_hash"].to_numpy(), new_hashes)
+    store = store.copy()
+    store.loc[closing, "_valid_to"] = version
+
+    added = new_rows[~np.isin(new_hashes, open_hashes)]
+    added = added.assign(_valid_from=version, _valid_to=OPEN_VERSION)
+    merged = pd.concat([store, added], ignore_index=True)
+
+    # One-hot columns introduced by a later vocabulary are False for older rows
+    for col in merged.columns:
+        if merged[col].dtype == object and col.startswith(("category_", "brand_", "price_bucket_")):
+            merged[col] = merged[col].fillna(False).astype(bool)
+    return merged, len(added), int(closing.sum())
+
+
+def compact(base_path=FEATURE_STORE_PATH, store_path=COMPACTED_STORE_PATH,
+            catalog_path=CATALOG_PATH, num_buckets=NUM_BUCKETS):
+    catalog = sync_catalog(base_path, catalog_path)
+    store_info = catalog.get("compacted_store") or {"path": store_path, "num_buckets": num_buckets}
+    if store_info["num_buckets"] != num_buckets:
+        raise Exception(
+            f"Compacted store uses {store_info['num_buckets']} buckets, got {num_buckets}"
+        )
+    catalog["compacted_store"] = store_info
+
+    pending = [
+        e for e in catalog["snapshots"]
+        if e["status"] == "active" and not e["compacted"]
+        and e.get("raw_path") and os.path.exists(e["raw_path"])
+    ]
+    print(f"Snapshots pending compaction: {[e['version'] for e in pending]}")
+
+    # Versions are applied oldest first so validity ranges stay contiguous
+    for entry in pending:
+        new_rows = _prepare_snapshot_rows(entry["raw_path"], num_buckets)
+        total_added, total_closed = 0, 0
+        for bucket in range(num_buckets):
+            path = bucket_path(bucket, store_path)
+            store = _read_bucket(path)
+            bucket_rows = new_rows[new_rows["_bucket"] == bucket].drop(columns=["_bucket"])
+            merged, added, closed = _apply_version(store, bucket_rows, entry["version"])
+            # Unchanged buckets still need the columns a new vocabulary adds
+            new_columns = store is not None and not set(bucket_rows.columns) <= set(store.columns)
+            if added or closed or store is None or new_columns:
+                _write_bucket(merged, path)
+            total_added += added
+            total_closed += closed
+
+        entry["compacted"] = True
+        save_catalog(catalog, catalog_path)
+        print(
+            f"Compacted {entry['version']}: {len(new_rows)} rows, "
+            f"{total_added} new/changed, {total_closed} closed"
+        )
+
+    save_catalog(catalog, catalog_path)
+    return catalog
+
+
+def apply_retention(store_path=COMPACTED_STORE_PATH, catalog_path=CATALOG_PATH,
+                    retention_versions=RETENTION_VERSIONS, raw_to_keep=RAW_SNAPSHOTS_TO_KEEP):
+    catalog = load_catalog(catalog_path)
+    active = [e for e in catalog["snapshots"] if e["status"] == "active"]
+
+    expired = active[:-retention_versions] if retention_versions > 0 else []
+    for entry in expired:
+        entry["status"] = "expired"
+    retained = active[len(expired):]
+    print(f"Retention: {len(retained)} version(s) kept, {len(expired)} expired")
+
+    # Raw files: keep the newest few for path-based consumers, drop the rest once compacted
+    keep_raw = {e["version"] for e in retained[-raw_to_keep:]} if raw_to_keep > 0 else set()
+    removed_bytes = 0
+    for entry in catalog["snapshots"]:
+        raw_path = entry.get("raw_path")
+        if not raw_path or entry["version"] in keep_raw:
+            continue
+        if entry["compacted"] or entry["status"] == "expired":
+            if os.path.exists(raw_path):
+                removed_bytes += os.path.getsize(raw_path)
+                os.remove(raw_path)
+                print(f"Removed raw snapshot: {raw_path}")
+            entry["raw_path"] = None
+
+    # Rows closed before the oldest retained version are invisible to every reader
+    if retained and catalog.get("compacted_store") and os.path.isdir(store_path):
+        oldest = retained[0]["version"]
+        vacuumed = 0
+        for bucket in range(catalog["compacted_store"]["num_buckets"]):
+            path = bucket_path(bucket, store_path)
+            store = _read_bucket(path)
+            if store is None:
+                continue
+            dead = (store["_valid_to"] <= oldest).to_numpy()
+            if dead.any():
+                _write_bucket(store[~dead], path)
+                vacuumed += int(dead.sum())
+        print(f"Vacuumed {vacuumed} row(s) older than version {oldest}")
+
+    save_catalog(catalog, catalog_path)
+    print(f"Reclaimed {removed_bytes / 1024 / 1024:.1f} MB of raw snapshots")
+    return catalog
+
+
+# --------------------------------------------------
+# Time-travel reads
+# --------------------------------------------------
+
+def read_features_as_of(version=None, as_of=None, columns=None, user_ids=None,
+                        store_path=COMPACTED_STORE_PATH, catalog_path=CATALOG_PATH):
+    catalog = load_catalog(catalog_path)
+    entry = resolve_version(catalog, version, as_of)
+
+    columns = list(columns) if columns is not None else list(entry["columns"])
+    if entry.get("raw_path") and os.path.exists(entry["raw_path"]):
+        return read_snapshot(entry["raw_path"], columns=columns, user_ids=user_ids)
+
+    if not entry["compacted"]:
+        raise Exception(f"Feature snapshot {entry['version']} has no readable data")
+
+    # Only buckets that can hold the requested users are opened
+    num_buckets = catalog["compacted_store"]["num_buckets"]
+    buckets = range(num_buckets) if user_ids is None else sorted(set(bucket_of(user_ids, num_buckets)))
+    filters = [("_valid_from", "<=", entry["version"]), ("_valid_to", ">", entry["version"])]
+    if user_ids is not None:
+        filters.append(("user_id", "in", [str(u) for u in user_ids]))
+
+    stored_columns = [c for c in columns if c != "feature_created_at"]
+    frames = []
+    for bucket in buckets:
+        path = bucket_path(bucket, store_path)
+        if os.path.exists(path):
+            frames.append(pq.read_table(path, columns=stored_columns, filters=filters).to_pandas())
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=stored_columns)
+
+    if "feature_created_at" in columns:
+        df["feature_created_at"] = pd.Timestamp(entry["created_at"])
+    return df[columns]
+
+
+def store_size_bytes(path):
+    total = 0
+    for root, dirs, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+if __name__ == "__main__":
+    with StageMetrics("compact_feature_store") as metrics:
+        print("\n=== FEATURE STORE COMPACTION STARTED ===")
+
+        raw_before = store_size_bytes(FEATURE_STORE_PATH)
+        catalog = compact()
+        catalog = apply_retention()
+        raw_after = store_size_bytes(FEATURE_STORE_PATH)
+        compacted = store_size_bytes(COMPACTED_STORE_PATH)
+
+        print(f"\nRaw snapshots: {raw_before / 1024 / 1024:.1f} MB -> {raw_after / 1024 / 1024:.1f} MB")
+        print(f"Compacted store: {compacted / 1024 / 1024:.1f} MB")
+
+        log_pipeline_run(
+            stage="compact_feature_store",
+            input_files=[FEATURE_STORE_PATH],
+            output_files=[COMPACTED_STORE_PATH, CATALOG_PATH],
+            metrics=metrics
+        )
+
+        print("\n=== FEATURE STORE COMPACTION COMPLETED ===")
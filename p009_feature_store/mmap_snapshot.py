@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import shutil
+import numpy as np
+from datetime import datetime
+
+# --------------------------------------------------
+# Memory-mapped feature snapshots
+#
+# One directory per (entity, version):
+#   ids.npy          sorted entity ids (fixed-width unicode) -> row index
+#   <feature>.npy    one contiguous array per feature, aligned with ids
+#   manifest.json    entity column, feature names/dtypes, row count
+#
+# Readers open the arrays with np.load(mmap_mode="r"): nothing is parsed,
+# and every process mapping the same files shares one page-cache copy.
+# Only NumPy is imported, so a scoring worker starts without pandas.
+# --------------------------------------------------
+
+MMAP_STORE_PATH = "p009_feature_store/mmap"
+
+USER_FEATURES = [
+    "user_activity_frequency",
+    "avg_rating_per_user"
+]
+
+ITEM_FEATURES = [
+    "avg_rating_per_item",
+    "price",
+    "popularity_score",
+    "popularity_score_norm"
+]
+
+ONE_HOT_PREFIXES = ("category_", "brand_", "price_bucket_")
+
+
+def item_feature_columns(df):
+    return ITEM_FEATURES + [c for c in df.columns if c.startswith(ONE_HOT_PREFIXES)]
+
+
+def write_mmap_snapshot(df, entity_column, feature_names, version=None, base_path=MMAP_STORE_PATH):
+    version = version or datetime.now().strftime("%Y%m%d_%H%M%S")
+    entity_name = entity_column.replace("_id", "")
+    out_dir = os.path.join(base_path, f"{entity_name}_{version}")
+    tmp_dir = out_dir + ".tmp"
+
+    # One row per entity: its most recent interaction row
+    if "timestamp" in df.columns:
+        df = df.sort_values("timestamp", kind="stable")
+    df = df.drop_duplicates(subset=[entity_column], keep="last")
+    df = df.assign(**{entity_column: df[entity_column].astype(str)})
+    df = df.sort_values(entity_column).reset_index(drop=True)
+
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    ids = df[entity_column].to_numpy().astype("U")
+    np.save(os.path.join(tmp_dir, "ids.npy"), ids)
+
+    features = {}
+    for name in feature_names:
+        values = df[name]
+        if values.dtype == bool:
+            arr = values.to_numpy(dtype=bool)
+        else:
+            arr = values.to_numpy(dtype=np.float32, na_value=np.nan)
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(arr))
+        features[name] = str(arr.dtype)
+
+    manifest = {
+        "version": version,
+        "entity_column": entity_column,
+        "n_rows": int(len(ids)),
+        "features": features,
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=4)
+
+    # Readers never see a half-written snapshot
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.replace(tmp_dir, out_dir)
+
+    print(f"Memory-mapped {entity_name} snapshot saved at: {out_dir} ({len(ids)} rows)")
+    return out_dir
+
+
+def get_latest_mmap_snapshot(entity_column="user_id", base_path=MMAP_STORE_PATH):
+    prefix = entity_column.replace("_id", "") + "_"
+    if not os.path.isdir(base_path):
+        raise Exception(f"No memory-mapped snapshots found in {base_path}")
+    dirs = sorted(
+        d for d in os.listdir(base_path)
+        if d.startswith(prefix) and not d.endswith(".tmp")
+    )
+    if not dirs:
+        raise Exception(f"No memory-mapped {prefix[:-1]} snapshots found in {base_path}")
+    # Version is a sortable timestamp, newest directory is last
+    return os.path.join(base_path, dirs[-1])
+
+
+class MmapFeatureSnapshot:
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), "r") as f:
+            self.manifest = json.load(f)
+        self.entity_column = self.manifest["entity_column"]
+        self.feature_names = list(self.manifest["features"])
+        self.ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        self._arrays = {}
+
+    def feature(self, name):
+        # Mapped lazily: only features that are read get paged in
+        if name not in self._arrays:
+            if name not in self.manifest["features"]:
+                raise Exception(f"Unknown feature: {name}")
+            self._arrays[name] = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+        return self._arrays[name]
+
+    def row_index(self, entity_ids):
+        # Binary search over the sorted id array; -1 for unknown entities.
+        # Keys keep their full length: casting to the stored fixed-width dtype
+        # would truncate longer ids into matches ("U00012" -> "U0001")
+        keys = np.asarray(entity_ids, dtype=str)
+        if len(self.ids) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        pos = np.searchsorted(self.ids, keys)
+        pos_clipped = np.minimum(pos, len(self.ids) - 1)
+        found = (pos < len(self.ids)) & (self.ids[pos_clipped] == keys)
+        return np.where(found, pos_clipped, -1)
+
+    def lookup(self, entity_ids, feature_names=None):
+        feature_names = feature_names or self.feature_names
+        rows = self.row_index(entity_ids)
+        found = rows >= 0
+        out = np.full((len(rows), len(feature_names)), np.nan, dtype=np.float32)
+        for j, name in enumerate(feature_names):
+            out[found, j] = self.feature(name)[rows[found]]
+        return out, found
+
+
+if __name__ == "__main__":
+    print("\n=== MEMORY-MAPPED SNAPSHOT COLD START ===")
+
+    for entity_column in ["user_id", "item_id"]:
+        path = get_latest_mmap_snapshot(entity_column)
+
+        start = time.perf_counter()
+        snapshot = MmapFeatureSnapshot(path)
+        sample_ids = snapshot.ids[:5].tolist()
+        values, found = snapshot.lookup(sample_ids)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        print(f"\n{path}: {snapshot.manifest['n_rows']} rows, {len(snapshot.feature_names)} features")
+        print(f"Open + first lookup: {elapsed:.2f} ms")
+        for entity_id, row in zip(sample_ids, values):
+            print(entity_id, dict(zip(snapshot.feature_names, np.round(row, 4).tolist())))
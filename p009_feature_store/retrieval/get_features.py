@@ -1,33 +1,22 @@
-import os
-import psycopg2
-import pandas as pd
+from p009_feature_store.backends import get_backend
 
-DB_CONFIG = {
-    "database": os.getenv("DB_NAME"),
-    "user": os.getenv("DB_USER"),
-    "password": os.getenv("DB_PASSWORD"),
-    "host": os.getenv("DB_HOST"),
-    "port": os.getenv("DB_PORT")
-}
+# Shared backend: one connection reused across calls in this process
+_backend = None
 
-for k, v in DB_CONFIG.items():
-    if v is None:
-        raise Exception(f"Environment variable {k} is not set.")
+
+def _get_backend():
+    global _backend
+    if _backend is None:
+        _backend = get_backend()
+    return _backend
 
 
 def get_latest_features(limit=10):
-    conn = psycopg2.connect(**DB_CONFIG)
-
-    query = """
-        SELECT *
-        FROM feature_store
-        ORDER BY feature_created_at DESC
-        LIMIT %s;
-    """
-
-    df = pd.read_sql(query, conn, params=(limit,))
-    conn.close()
-    return df
+    return _get_backend().get_latest_features(limit)
+
+
+def get_latest_features_for_user(user_id, limit=1):
+    return _get_backend().get_latest_features_for_user(user_id, limit)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+import time
+import pandas as pd
+from p009_feature_store.snapshot_io import read_snapshot
+from p009_feature_store.snapshot_catalog import load_catalog, active_versions
+from p009_feature_store.compact_snapshots import read_features_as_of
+
+# --------------------------------------------------
+# Point-in-time correct historical feature retrieval
+#
+# Each snapshot holds features as of its feature_created_at. For every row
+# of entity_df we attach the newest snapshot value whose feature_created_at
+# is <= the row's as-of time, so aggregates computed later never leak into
+# earlier labels. The join is a single sorted merge_asof, grouped by entity.
+# --------------------------------------------------
+
+DEFAULT_FEATURES = [
+    "user_activity_frequency",
+    "avg_rating_per_user"
+]
+
+
+def load_feature_history(feature_names, entity_column="user_id", snapshots=None):
+    columns = [entity_column, "timestamp", "feature_created_at"] + list(feature_names)
+
+    # Default: every retained catalog version, whether raw or compacted
+    if snapshots is None:
+        versions = [e["version"] for e in active_versions(load_catalog())]
+        readers = [lambda v=v: read_features_as_of(version=v, columns=columns) for v in versions]
+    else:
+        readers = [lambda p=p: read_snapshot(p, columns=columns) for p in snapshots]
+    if not readers:
+        raise Exception("No feature snapshot files found.")
+
+    frames = []
+    for read in readers:
+        df = read()
+
+        # One row per entity per snapshot: the entity's last interaction row
+        df = df.sort_values("timestamp", kind="stable")
+        df = df.drop_duplicates(subset=[entity_column], keep="last")
+        frames.append(df.drop(columns=["timestamp"]))
+
+    history = pd.concat(frames, ignore_index=True)
+    history[entity_column] = history[entity_column].astype(str)
+    history["feature_created_at"] = pd.to_datetime(history["feature_created_at"]).astype("datetime64[ns]")
+    return history.sort_values("feature_created_at", kind="stable").reset_index(drop=True)
+
+
+def get_historical_features(entity_df, as_of_column, feature_names=None,
+                            entity_column="user_id", snapshots=None,
+                            max_staleness=None, history=None):
+    feature_names = list(feature_names or DEFAULT_FEATURES)
+    if history is None:
+        history = load_feature_history(feature_names, entity_column, snapshots)
+
+    left = entity_df.copy()
+    left["_row_order"] = range(len(left))
+    left["_entity_key"] = left[entity_column].astype(str)
+    left["_as_of"] = pd.to_datetime(left[as_of_column]).astype("datetime64[ns]")
+    left = left.sort_values("_as_of", kind="stable")
+
+    right = history.rename(columns={entity_column: "_entity_key"})
+    right = right[["_entity_key", "feature_created_at"] + feature_names]
+
+    # Backward as-of join: newest snapshot at or before each row's as-of time
+    joined = pd.merge_asof(
+        left,
+        right,
+        left_on="_as_of",
+        right_on="feature_created_at",
+        by="_entity_key",
+        direction="backward",
+        allow_exact_matches=True,
+        tolerance=pd.Timedelta(max_staleness) if max_staleness is not None else None,
+        suffixes=("", "_feature")
+    )
+
+    joined = joined.sort_values("_row_order").drop(columns=["_row_order", "_entity_key", "_as_of"])
+    return joined.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    from p008_feature_engineering.build_features import get_latest_file, PREPARED_INTERACTIONS_PATH
+
+    print("\n=== POINT-IN-TIME TRAINING SET BUILD STARTED ===")
+
+    interactions_file = get_latest_file(PREPARED_INTERACTIONS_PATH, ".csv")
+    print(f"Using prepared interactions as label frame: {interactions_file}")
+    labels = pd.read_csv(interactions_file, usecols=["user_id", "item_id", "event_type", "timestamp"])
+
+    start = time.perf_counter()
+    training_df = get_historical_features(labels, as_of_column="timestamp")
+    elapsed = time.perf_counter() - start
+
+    matched = training_df["feature_created_at"].notna().sum()
+    print(f"Rows joined: {len(training_df)} in {elapsed:.2f}s")
+    print(f"Rows with features available as of their timestamp: {matched}")
+    print(training_df.head())
@@ -0,0 +1,161 @@
+import os
+import time
+import random
+import threading
+import numpy as np
+from collections import OrderedDict
+from p009_feature_store.backends import get_backend
+
+# --------------------------------------------------
+# Online feature retrieval
+#
+# get_online_features() serves the recommender: cache hits are answered
+# in-process, misses are fetched from the backend in one batched query.
+# --------------------------------------------------
+
+CACHE_SIZE = int(os.getenv("ONLINE_CACHE_SIZE", "100000"))
+CACHE_TTL_SECONDS = float(os.getenv("ONLINE_CACHE_TTL_SECONDS", "300"))
+
+
+class TTLCache:
+    # LRU eviction on size, entries also expire after ttl_seconds
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl_seconds=CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            expires_at, value = entry
+            if expires_at < now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def put(self, key, value, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._data[key] = (now + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_cache = TTLCache()
+
+
+def _get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = get_backend()
+    return _backend
+
+
+def get_online_features(entity_ids, feature_names, entity_column="user_id"):
+    # Ids are stored as text: int ids would miss the cache keys and the
+    # backend rows (and fail the Postgres text = ANY(int[]) comparison)
+    entity_ids = [str(entity_id) for entity_id in entity_ids]
+    feature_names = tuple(feature_names)
+    now = time.monotonic()
+
+    result = {}
+    missing = []
+    for entity_id in entity_ids:
+        found, value = _cache.get((entity_column, entity_id, feature_names), now)
+        if found:
+            result[entity_id] = value
+        else:
+            missing.append(entity_id)
+
+    if missing:
+        fetched = _get_backend().get_online_features(
+            list(dict.fromkeys(missing)), list(feature_names), entity_column
+        )
+        for entity_id in missing:
+            # Unknown entities are cached as None so they do not hit the DB again
+            value = fetched.get(entity_id)
+            _cache.put((entity_column, entity_id, feature_names), value, now)
+            result[entity_id] = value
+
+    return result
+
+
+def get_cache_stats():
+    return _cache.stats()
+
+
+def clear_cache():
+    _cache.clear()
+
+
+# --------------------------------------------------
+# Latency benchmark
+# --------------------------------------------------
+
+if __name__ == "__main__":
+    print("\n=== ONLINE FEATURE LOOKUP BENCHMARK ===")
+
+    feature_names = [
+        "user_activity_frequency",
+        "avg_rating_per_user"
+    ]
+
+    sample = _get_backend().get_latest_features(1000)
+    user_ids = sample["user_id"].astype(str).unique().tolist()
+    print(f"Sampled {len(user_ids)} user ids from the feature store")
+
+    # Cold: every lookup is a miss served by the backend
+    start = time.perf_counter()
+    get_online_features(user_ids, feature_names)
+    print(f"Cold batched lookup of {len(user_ids)} users: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    # Warm: single-entity lookups served from cache
+    latencies = []
+    n_lookups = 20000
+    start = time.perf_counter()
+    for _ in range(n_lookups):
+        t0 = time.perf_counter()
+        get_online_features([random.choice(user_ids)], feature_names)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+
+    latencies_us = np.array(latencies) * 1e6
+    print(f"Cached lookups/sec: {n_lookups / elapsed:,.0f}")
+    print(f"p50 latency: {np.percentile(latencies_us, 50):.1f} us")
+    print(f"p99 latency: {np.percentile(latencies_us, 99):.1f} us")
+    print(f"Cache stats: {get_cache_stats()}")
@@ -0,0 +1,108 @@
+import os
+import json
+from datetime import datetime
+
+# --------------------------------------------------
+# Feature snapshot catalog
+#
+# One JSON document listing every feature snapshot version: where its rows
+# live (raw snapshot file and/or the compacted store), when its features
+# were computed, its columns and whether retention has expired it.
+# Readers resolve "latest" or "as of version/time T" from here instead of
+# listing p009_feature_store/data and comparing mtimes.
+# --------------------------------------------------
+
+CATALOG_PATH = "p009_feature_store/metadata/snapshot_catalog.json"
+
+VERSION_FORMAT = "%Y%m%d_%H%M%S"
+
+
+def version_to_datetime(version):
+    return datetime.strptime(version, VERSION_FORMAT)
+
+
+def load_catalog(catalog_path=CATALOG_PATH):
+    if not os.path.exists(catalog_path):
+        return {"snapshots": [], "compacted_store": None}
+    with open(catalog_path, "r") as f:
+        return json.load(f)
+
+
+def save_catalog(catalog, catalog_path=CATALOG_PATH):
+    if os.path.dirname(catalog_path):
+        os.makedirs(os.path.dirname(catalog_path), exist_ok=True)
+    catalog["snapshots"] = sorted(catalog["snapshots"], key=lambda s: s["version"])
+    catalog["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    # Write-then-rename so readers never see a partial catalog
+    tmp_path = catalog_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(catalog, f, indent=4)
+    os.replace(tmp_path, catalog_path)
+
+
+def find_entry(catalog, version):
+    for entry in catalog["snapshots"]:
+        if entry["version"] == version:
+            return entry
+    return None
+
+
+def register_snapshot(path, version, created_at, columns, n_rows=None, catalog_path=CATALOG_PATH):
+    catalog = load_catalog(catalog_path)
+    entry = find_entry(catalog, version)
+    if entry is None:
+        entry = {"version": version}
+        catalog["snapshots"].append(entry)
+
+    entry.update({
+        "raw_path": path,
+        "format": os.path.splitext(path)[1].lstrip("."),
+        "created_at": str(created_at),
+        "columns": list(columns),
+        "n_rows": n_rows,
+        "bytes": os.path.getsize(path) if os.path.exists(path) else None,
+        "compacted": entry.get("compacted", False),
+        "status": "active"
+    })
+    save_catalog(catalog, catalog_path)
+    print(f"Registered feature snapshot {version} in catalog: {catalog_path}")
+    return entry
+
+
+def active_versions(catalog):
+    return [s for s in catalog["snapshots"] if s["status"] == "active"]
+
+
+def resolve_version(catalog, version=None, as_of=None):
+    entries = active_versions(catalog)
+    if not entries:
+        raise Exception("No active feature snapshots in catalog.")
+
+    if version is not None:
+        entry = find_entry(catalog, version)
+        if entry is None:
+            raise Exception(f"Unknown feature snapshot version: {version}")
+        if entry["status"] != "active":
+            raise Exception(f"Feature snapshot {version} expired by retention policy")
+        return entry
+
+    if as_of is not None:
+        # Newest version whose features were computed at or before as_of
+        if not isinstance(as_of, datetime):
+            as_of = datetime.fromisoformat(str(as_of))
+        candidates = [e for e in entries if datetime.fromisoformat(e["created_at"]) <= as_of]
+        if not candidates:
+            raise Exception(f"No feature snapshot available as of {as_of}")
+        return candidates[-1]
+
+    return entries[-1]
+
+
+def latest_raw_snapshot(catalog_path=CATALOG_PATH):
+    # Newest version that still has a raw snapshot file on disk
+    catalog = load_catalog(catalog_path)
+    for entry in reversed(active_versions(catalog)):
+        if entry.get("raw_path") and os.path.exists(entry["raw_path"]):
+            return entry["raw_path"]
+    return None
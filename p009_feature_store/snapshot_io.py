@@ -0,0 +1,169 @@
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from p009_feature_store.snapshot_catalog import latest_raw_snapshot
+
+# --------------------------------------------------
+# Feature store snapshot I/O
+#
+# Snapshots are written as compressed Parquet: id/label columns are
+# dictionary encoded, one-hot flags stay bool and normalized features are
+# stored as float32. Rows are sorted by user_id so row-group statistics let
+# readers skip data when filtering on user_id / feature_created_at.
+# Legacy CSV snapshots are still readable through the same functions.
+# --------------------------------------------------
+
+FEATURE_STORE_PATH = "p009_feature_store/data"
+SNAPSHOT_EXTENSIONS = (".parquet", ".csv")
+
+DICTIONARY_COLS = [
+    "user_id", "item_id", "event_type", "device", "session_id", "name"
+]
+TIMESTAMP_COLS = ["timestamp", "created_at", "feature_created_at"]
+INT_COLS = ["is_rating_event"]
+
+ROW_GROUP_SIZE = 128 * 1024
+COMPRESSION = "zstd"
+# CSV batches are sized in bytes: rows per batch are estimated from a sample
+CSV_SAMPLE_BYTES = 1024 * 1024
+CSV_MIN_BLOCK_BYTES = 64 * 1024
+
+
+def list_snapshots(base_path=FEATURE_STORE_PATH):
+    if not os.path.isdir(base_path):
+        return []
+    return [
+        os.path.join(base_path, f)
+        for f in os.listdir(base_path)
+        if f.endswith(SNAPSHOT_EXTENSIONS)
+    ]
+
+
+def get_latest_snapshot(base_path=FEATURE_STORE_PATH):
+    # The catalog knows the newest version without scanning the directory
+    if base_path == FEATURE_STORE_PATH:
+        path = latest_raw_snapshot()
+        if path is not None:
+            return path
+
+    files = list_snapshots(base_path)
+    if not files:
+        raise Exception("No feature snapshot files found.")
+    return max(files, key=os.path.getmtime)
+
+
+def snapshot_version(path):
+    # features_20260126_215013.parquet -> "20260126_215013"
+    name = os.path.splitext(os.path.basename(str(path)))[0]
+    return name[len("features_"):] if name.startswith("features_") else name
+
+
+def snapshot_row_count(path):
+    # Free for Parquet (footer metadata); CSV would need a full scan
+    if str(path).endswith(".parquet"):
+        return pq.ParquetFile(path).metadata.num_rows
+    return None
+
+
+def to_snapshot_types(df):
+    df = df.copy()
+    for col in df.columns:
+        if col in DICTIONARY_COLS:
+            df[col] = df[col].astype(str).astype("category")
+        elif col in TIMESTAMP_COLS:
+            df[col] = pd.to_datetime(df[col])
+        elif col in INT_COLS:
+            df[col] = df[col].astype("int8")
+        elif pd.api.types.is_bool_dtype(df[col]):
+            continue
+        elif pd.api.types.is_float_dtype(df[col]):
+            df[col] = df[col].astype("float32")
+    return df
+
+
+def write_parquet_snapshot(df, path):
+    df = to_snapshot_types(df)
+    if "user_id" in df.columns:
+        df = df.sort_values("user_id", kind="stable").reset_index(drop=True)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(
+        table,
+        path,
+        compression=COMPRESSION,
+        row_group_size=ROW_GROUP_SIZE,
+        use_dictionary=[c for c in DICTIONARY_COLS if c in df.columns],
+        write_statistics=True
+    )
+    return path
+
+
+def read_snapshot_schema(path):
+    # Empty frame with the snapshot's columns and dtypes, without reading rows
+    if str(path).endswith(".parquet"):
+        return pq.read_schema(path).empty_table().to_pandas()
+    return pd.read_csv(path, nrows=1000).iloc[0:0]
+
+
+def _csv_block_size(path, chunk_size):
+    # Bytes holding about chunk_size rows, from the average row length of the
+    # first MB; aimed ~2% low so row length drift rarely overfills a block
+    with open(path, "rb") as f:
+        sample = f.read(CSV_SAMPLE_BYTES)
+    bytes_per_row = len(sample) / max(sample.count(b"\n"), 1)
+    return max(int(bytes_per_row * chunk_size * 0.98), CSV_MIN_BLOCK_BYTES)
+
+
+def iter_snapshot_batches(path, chunk_size=100_000, columns=None):
+    # Streams pyarrow RecordBatches of at most chunk_size rows so callers
+    # never hold the whole snapshot
+    if str(path).endswith(".parquet"):
+        parquet_file = pq.ParquetFile(path)
+        yield from parquet_file.iter_batches(batch_size=chunk_size, columns=columns)
+    else:
+        reader = pacsv.open_csv(
+            path,
+            read_options=pacsv.ReadOptions(block_size=_csv_block_size(path, chunk_size)),
+            convert_options=pacsv.ConvertOptions(include_columns=columns)
+        )
+        for batch in reader:
+            # Blocks are cut at byte offsets, so a block can hold a few rows too many
+            for offset in range(0, batch.num_rows, chunk_size):
+                yield batch.slice(offset, chunk_size)
+
+
+def _build_filters(user_ids, created_from, created_to):
+    filters = []
+    if user_ids is not None:
+        filters.append(("user_id", "in", [str(u) for u in user_ids]))
+    if created_from is not None:
+        filters.append(("feature_created_at", ">=", pd.Timestamp(created_from)))
+    if created_to is not None:
+        filters.append(("feature_created_at", "<=", pd.Timestamp(created_to)))
+    return filters or None
+
+
+def read_snapshot(path, columns=None, user_ids=None, created_from=None, created_to=None):
+    if str(path).endswith(".parquet"):
+        table = pq.read_table(
+            path,
+            columns=columns,
+            filters=_build_filters(user_ids, created_from, created_to)
+        )
+        return table.to_pandas()
+
+    # Legacy CSV snapshot: project at parse time, filter afterwards
+    df = pd.read_csv(path, usecols=columns)
+    if user_ids is not None:
+        df = df[df["user_id"].astype(str).isin([str(u) for u in user_ids])]
+    if created_from is not None or created_to is not None:
+        created = pd.to_datetime(df["feature_created_at"])
+        mask = pd.Series(True, index=df.index)
+        if created_from is not None:
+            mask &= created >= pd.Timestamp(created_from)
+        if created_to is not None:
+            mask &= created <= pd.Timestamp(created_to)
+        df = df[mask]
+    return df.reset_index(drop=True)
@@ -0,0 +1,387 @@
+import os
+import sys
+import json
+import uuid
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+
+# --------------------------------------------------
+# Append-only lineage store (SQLite, WAL mode)
+#
+# Every log_pipeline_run() is one short INSERT transaction, so logging cost
+# does not depend on how much history exists, and concurrent Prefect tasks
+# (separate processes) append safely: WAL lets readers run alongside the
+# single writer and busy_timeout serialises competing writers.
+#
+#   lineage_runs   one row per logged stage execution
+#   lineage_files  one row per (run, path, role) edge, role = input|output,
+#                  with the file's content hash when it is a local file
+#   stage_runs     orchestrated stage executions by fingerprint (stage cache)
+#   stage_metrics  wall/CPU time, peak RSS, rows and bytes per stage run
+#   file_hashes    sha256 memo keyed by (path, size, mtime) so unchanged
+#                  files are never re-read
+#
+# Paths are stored with forward slashes so Windows and POSIX runs match.
+# --------------------------------------------------
+
+LINEAGE_DB_PATH = os.getenv("LINEAGE_DB_PATH", "p010_lineage/lineage.db")
+LEGACY_JSON_PATH = "p010_lineage/lineage_log.json"
+BUSY_TIMEOUT_MS = 30000
+MAX_GRAPH_DEPTH = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lineage_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT,
+    stage TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    fingerprint TEXT
+);
+CREATE TABLE IF NOT EXISTS lineage_files (
+    entry_id INTEGER NOT NULL REFERENCES lineage_runs(id),
+    role TEXT NOT NULL CHECK (role IN ('input', 'output')),
+    path TEXT NOT NULL,
+    content_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stage_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    module TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    run_id TEXT,
+    status TEXT NOT NULL CHECK (status IN ('success', 'skipped')),
+    timestamp TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stage_metrics (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    entry_id INTEGER REFERENCES lineage_runs(id),
+    run_id TEXT,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    wall_seconds REAL,
+    cpu_seconds REAL,
+    peak_rss_mb REAL,
+    rows_in INTEGER,
+    rows_out INTEGER,
+    bytes_read INTEGER,
+    bytes_written INTEGER,
+    rows_per_second REAL
+);
+CREATE TABLE IF NOT EXISTS lineage_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_lineage_runs_stage ON lineage_runs (stage, timestamp);
+CREATE INDEX IF NOT EXISTS idx_lineage_runs_run_id ON lineage_runs (run_id);
+CREATE INDEX IF NOT EXISTS idx_lineage_files_path ON lineage_files (path, role);
+CREATE INDEX IF NOT EXISTS idx_lineage_files_entry ON lineage_files (entry_id, role);
+CREATE INDEX IF NOT EXISTS idx_lineage_runs_fingerprint ON lineage_runs (fingerprint);
+CREATE INDEX IF NOT EXISTS idx_stage_runs_fingerprint ON stage_runs (fingerprint, status);
+CREATE INDEX IF NOT EXISTS idx_stage_metrics_stage ON stage_metrics (stage, id);
+"""
+
+# Columns added after the first release of the store: (table, column, type)
+MIGRATIONS = [
+    ("lineage_runs", "fingerprint", "TEXT"),
+    ("lineage_files", "content_hash", "TEXT")
+]
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def normalize_path(path):
+    return str(path).replace("\\", "/")
+
+
+def current_run_id():
+    # The orchestrator exports PIPELINE_RUN_ID so all stages of a flow share it
+    return os.getenv("PIPELINE_RUN_ID")
+
+
+class LineageStore:
+
+    def __init__(self, path=LINEAGE_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def connection(self):
+        # sqlite3 connections are per thread; Prefect runs tasks on worker threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS};")
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("PRAGMA synchronous=NORMAL;")
+            self._migrate(conn)
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _migrate(self, conn):
+        for table, column, col_type in MIGRATIONS:
+            existing = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+            if existing and column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+        self._local.conn = None
+
+    # ----------------------------------------------
+    # Writes
+    # ----------------------------------------------
+
+    def content_hash(self, path):
+        # sha256 of a file, or of (relative path, hash) pairs for a directory;
+        # None for things that are not local files (tables, MLflow runs, ...)
+        if os.path.isdir(path):
+            digest = hashlib.sha256()
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    full_path = os.path.join(root, name)
+                    rel_path = normalize_path(os.path.relpath(full_path, path))
+                    digest.update(f"{rel_path}:{self.content_hash(full_path)}\n".encode())
+            return digest.hexdigest()
+        if not os.path.isfile(path):
+            return None
+
+        key = normalize_path(os.path.abspath(path))
+        stat = os.stat(path)
+        conn = self.connection()
+        row = conn.execute(
+            "SELECT size, mtime_ns, content_hash FROM file_hashes WHERE path = ?", (key,)
+        ).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        self.remember_hash(path, content_hash)
+        return content_hash
+
+    def remember_hash(self, path, content_hash):
+        stat = os.stat(path)
+        self.connection().execute(
+            "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)",
+            (normalize_path(os.path.abspath(path)), stat.st_size, stat.st_mtime_ns, content_hash)
+        )
+
+    def _insert(self, conn, stage, files, run_id, timestamp, fingerprint=None):
+        cur = conn.execute(
+            "INSERT INTO lineage_runs (run_id, stage, timestamp, fingerprint) VALUES (?, ?, ?, ?)",
+            (run_id, stage, timestamp, fingerprint)
+        )
+        entry_id = cur.lastrowid
+        conn.executemany(
+            "INSERT INTO lineage_files (entry_id, role, path, content_hash) VALUES (?, ?, ?, ?)",
+            [(entry_id, role, normalize_path(p), h) for role, p, h in files]
+        )
+        return entry_id
+
+    def append(self, stage, input_files, output_files, run_id=None, timestamp=None, fingerprint=None):
+        timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Hash outside the write transaction so other writers are not blocked on I/O
+        files = [("input", p, self.content_hash(p)) for p in input_files]
+        files += [("output", p, self.content_hash(p)) for p in output_files]
+
+        conn = self.connection()
+        # BEGIN IMMEDIATE takes the write lock up front instead of failing mid-transaction
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            entry_id = self._insert(conn, stage, files, run_id, timestamp, fingerprint)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return entry_id
+
+    def import_legacy_json(self, json_path=LEGACY_JSON_PATH):
+        # One-time import of the old rewrite-the-whole-file log
+        if not os.path.exists(json_path):
+            return 0
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            done = conn.execute(
+                "SELECT value FROM lineage_meta WHERE key = 'legacy_json_imported'"
+            ).fetchone()
+            if done is not None:
+                conn.execute("COMMIT")
+                return 0
+
+            with open(json_path, "r") as f:
+                entries = json.load(f)
+            for entry in entries:
+                files = [("input", p, None) for p in entry.get("input_files", [])]
+                files += [("output", p, None) for p in entry.get("output_files", [])]
+                self._insert(conn, entry["stage"], files, None, entry["timestamp"])
+            conn.execute(
+                "INSERT INTO lineage_meta (key, value) VALUES ('legacy_json_imported', ?)",
+                (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        print(f"Imported {len(entries)} legacy lineage entries from {json_path}")
+        return len(entries)
+
+    # ----------------------------------------------
+    # Queries
+    # ----------------------------------------------
+
+    def _entries(self, where, params, limit):
+        conn = self.connection()
+        rows = conn.execute(
+            f"SELECT id, run_id, stage, timestamp, fingerprint FROM lineage_runs WHERE {where} "
+            f"ORDER BY id DESC LIMIT ?",
+            list(params) + [limit]
+        ).fetchall()
+        entries = []
+        for entry_id, run_id, stage, timestamp, fingerprint in rows:
+            files = conn.execute(
+                "SELECT role, path, content_hash FROM lineage_files WHERE entry_id = ?", (entry_id,)
+            ).fetchall()
+            entries.append({
+                "id": entry_id,
+                "run_id": run_id,
+                "stage": stage,
+                "timestamp": timestamp,
+                "fingerprint": fingerprint,
+                "input_files": [p for role, p, h in files if role == "input"],
+                "output_files": [p for role, p, h in files if role == "output"],
+                "content_hashes": {p: h for role, p, h in files if h is not None}
+            })
+        return entries
+
+    def entries_for_stage(self, stage, limit=20):
+        return self._entries("stage = ?", [stage], limit)
+
+    def entries_for_run(self, run_id, limit=1000):
+        return self._entries("run_id = ?", [run_id], limit)
+
+    def entries_for_fingerprint(self, fingerprint, limit=20):
+        return self._entries("fingerprint = ?", [fingerprint], limit)
+
+    def entries_for_file(self, path, limit=20):
+        return self._entries(
+            "id IN (SELECT entry_id FROM lineage_files WHERE path = ?)",
+            [normalize_path(path)],
+            limit
+        )
+
+    def record_metrics(self, metrics):
+        columns = list(metrics)
+        self.connection().execute(
+            f"INSERT INTO stage_metrics ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+            [metrics[c] for c in columns]
+        )
+
+    def metric_stages(self):
+        rows = self.connection().execute("SELECT DISTINCT stage FROM stage_metrics ORDER BY stage").fetchall()
+        return [r[0] for r in rows]
+
+    def stage_metrics(self, stage, limit=10):
+        cur = self.connection().execute(
+            "SELECT * FROM stage_metrics WHERE stage = ? ORDER BY id DESC LIMIT ?", (stage, limit)
+        )
+        columns = [d[0] for d in cur.description]
+        return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+    def _traverse(self, path, from_role, to_role, max_depth):
+        # Recursive walk over file -> stage -> file edges, nearest first
+        query = f"""
+            WITH RECURSIVE walk(path, stage, depth) AS (
+                SELECT ?, NULL, 0
+                UNION
+                SELECT next.path, r.stage, walk.depth + 1
+                FROM walk
+                JOIN lineage_files here ON here.path = walk.path AND here.role = '{from_role}'
+                JOIN lineage_runs r ON r.id = here.entry_id
+                JOIN lineage_files next ON next.entry_id = here.entry_id AND next.role = '{to_role}'
+                WHERE walk.depth < ?
+            )
+            SELECT path, stage, MIN(depth) FROM walk
+            WHERE depth > 0
+            GROUP BY path, stage
+            ORDER BY MIN(depth), path
+        """
+        rows = self.connection().execute(query, (normalize_path(path), max_depth)).fetchall()
+        return [{"path": p, "stage": s, "depth": d} for p, s, d in rows]
+
+    def upstream(self, path, max_depth=MAX_GRAPH_DEPTH):
+        # Everything path was derived from
+        return self._traverse(path, "output", "input", max_depth)
+
+    def downstream(self, path, max_depth=MAX_GRAPH_DEPTH):
+        # Everything derived from path
+        return self._traverse(path, "input", "output", max_depth)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = LineageStore()
+            _store.import_legacy_json()
+    return _store
+
+
+def new_run_id():
+    return datetime.now().strftime("%Y%m%d_%H%M%S") + "_" + uuid.uuid4().hex[:8]
+
+
+# --------------------------------------------------
+# CLI
+#   python -m p010_lineage.lineage_store upstream <path>
+#   python -m p010_lineage.lineage_store downstream <path>
+#   python -m p010_lineage.lineage_store stage <stage>
+#   python -m p010_lineage.lineage_store run <run_id>
+#   python -m p010_lineage.lineage_store file <path>
+# --------------------------------------------------
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python -m p010_lineage.lineage_store {upstream|downstream|stage|run|file} <value>")
+        sys.exit(1)
+
+    command, value = sys.argv[1], sys.argv[2]
+    store = get_store()
+
+    if command in ("upstream", "downstream"):
+        nodes = getattr(store, command)(value)
+        print(f"\n{command.capitalize()} of {value}: {len(nodes)} file(s)")
+        for node in nodes:
+            print(f"  [{node['depth']}] {node['path']}  (stage: {node['stage']})")
+    elif command in ("stage", "run", "file"):
+        lookup = {
+            "stage": store.entries_for_stage,
+            "run": store.entries_for_run,
+            "file": store.entries_for_file
+        }[command]
+        for entry in lookup(value):
+            print(json.dumps(entry, indent=4))
+    else:
+        print(f"Unknown command: {command}")
+        sys.exit(1)
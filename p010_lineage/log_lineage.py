@@ -1,29 +1,24 @@
-import json
 import os
-from datetime import datetime
+from p010_lineage.lineage_store import get_store, current_run_id
 
-LINEAGE_FILE = "p010_lineage/lineage_log.json"
+# Lineage entries are appended to the SQLite store in p010_lineage/lineage_store.py;
+# lineage_log.json is the legacy log and is imported into it once.
 
-def log_pipeline_run(stage, input_files, output_files):
-    os.makedirs("p010_lineage", exist_ok=True)
 
-    if not os.path.exists(LINEAGE_FILE):
-        with open(LINEAGE_FILE, "w") as f:
-            json.dump([], f)
+def log_pipeline_run(stage, input_files, output_files, run_id=None, metrics=None):
+    entry_id = get_store().append(
+        stage,
+        input_files,
+        output_files,
+        run_id=run_id or current_run_id(),
+        # Set by the orchestrator's stage cache for the stage being executed
+        fingerprint=os.getenv("STAGE_FINGERPRINT")
+    )
 
-    with open(LINEAGE_FILE, "r") as f:
-        data = json.load(f)
-
-    entry = {
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "stage": stage,
-        "input_files": input_files,
-        "output_files": output_files
-    }
-
-    data.append(entry)
-
-    with open(LINEAGE_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+    # Runtime metrics of the enclosing StageMetrics block are stored against this entry
+    if metrics is not None:
+        metrics.entry_id = entry_id
+        metrics.add_files(input_files, output_files)
 
     print(f"Lineage logged for stage: {stage}")
+    return entry_id
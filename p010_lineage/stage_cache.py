@@ -0,0 +1,191 @@
+import os
+import re
+import ast
+import json
+import hashlib
+from datetime import datetime
+from p010_lineage.lineage_store import get_store, normalize_path
+from p009_feature_store.snapshot_catalog import load_catalog, latest_raw_snapshot
+
+# --------------------------------------------------
+# Content-addressed stage cache
+#
+# A stage's fingerprint is the sha256 of:
+#   code    - its module file and every repo module it imports (transitively)
+#   config  - the values of every environment variable that code reads
+#   inputs  - content hashes of the files the stage will pick up, resolved
+#             the way the stage resolves them (newest mtime, or the
+#             feature snapshot catalog)
+#
+# If a previous successful run has the same fingerprint, recorded outputs in
+# lineage and those outputs still hash to the same content, the stage is
+# skipped and the outputs are marked newest so downstream stages select them
+# again. A hit whose feature snapshot is no longer the catalog's latest
+# version is a miss: touching the file would not make readers pick it.
+# --------------------------------------------------
+
+# Stage bookkeeping variables that must not change the fingerprint
+IGNORED_ENV_VARS = {"PIPELINE_RUN_ID", "STAGE_FINGERPRINT", "PIPELINE_FORCE"}
+
+ENV_VAR_PATTERN = re.compile(
+    r"""os\.(?:getenv|environ\.get)\(\s*["']([A-Za-z0-9_]+)["']|os\.environ\[\s*["']([A-Za-z0-9_]+)["']\s*\]"""
+)
+
+
+def module_file(module_name, root="."):
+    base = os.path.join(root, *module_name.split("."))
+    if os.path.isfile(base + ".py"):
+        return base + ".py"
+    if os.path.isfile(os.path.join(base, "__init__.py")):
+        return os.path.join(base, "__init__.py")
+    return None
+
+
+def local_imports(path, root="."):
+    # Repo modules (p0xx_*) imported by a source file, resolved to file paths
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            names.add(node.module)
+            # "from package import module" imports a submodule
+            names.update(f"{node.module}.{alias.name}" for alias in node.names)
+
+    files = set()
+    for name in names:
+        if not re.match(r"p\d{3}_", name):
+            continue
+        resolved = module_file(name, root)
+        if resolved is not None:
+            files.add(resolved)
+    return files
+
+
+def code_closure(module_name, root="."):
+    start = module_file(module_name, root)
+    if start is None:
+        raise Exception(f"Cannot locate module source: {module_name}")
+
+    seen = set()
+    pending = [start]
+    while pending:
+        path = pending.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        pending.extend(local_imports(path, root) - seen)
+    return sorted(seen)
+
+
+def read_env_vars(source_files):
+    names = set()
+    for path in source_files:
+        with open(path, "r", encoding="utf-8") as f:
+            for match in ENV_VAR_PATTERN.finditer(f.read()):
+                names.add(match.group(1) or match.group(2))
+    return sorted(names - IGNORED_ENV_VARS)
+
+
+def latest_file(base_path, extension):
+    # Same selection rule the stages use: most recently modified match
+    candidates = []
+    for root, dirs, files in os.walk(base_path):
+        for file in files:
+            if file.endswith(extension):
+                candidates.append(os.path.join(root, file))
+    return max(candidates, key=os.path.getmtime) if candidates else None
+
+
+def resolve_input(spec):
+    # (directory, extension): newest file by mtime; a function: the path it returns
+    if callable(spec):
+        try:
+            return spec()
+        except Exception:
+            # No input yet: the stage itself reports it
+            return None
+    return latest_file(*spec)
+
+
+def superseded_snapshots(paths):
+    # Registered feature snapshots that are not the catalog's latest version
+    catalog = load_catalog()
+    registered = {normalize_path(e["raw_path"]) for e in catalog["snapshots"] if e.get("raw_path")}
+    latest = latest_raw_snapshot()
+    latest = normalize_path(latest) if latest else None
+    return [p for p in paths if normalize_path(p) in registered and normalize_path(p) != latest]
+
+
+def stage_fingerprint(module_name, inputs, root="."):
+    store = get_store()
+
+    source_files = code_closure(module_name, root)
+    code = {normalize_path(os.path.relpath(p, root)): store.content_hash(p) for p in source_files}
+    # Values are only ever hashed, so credentials do not end up in the store
+    config = {name: os.getenv(name) for name in read_env_vars(source_files)}
+
+    # Input content only: a new file with identical bytes keeps the fingerprint
+    input_hashes = []
+    for spec in inputs:
+        path = resolve_input(spec)
+        input_hashes.append(store.content_hash(path) if path else None)
+
+    payload = json.dumps(
+        {"module": module_name, "code": code, "config": config, "inputs": input_hashes},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def cached_outputs(fingerprint):
+    # Outputs of the last successful run with this fingerprint, or None on a miss
+    store = get_store()
+    conn = store.connection()
+    hit = conn.execute(
+        "SELECT id FROM stage_runs WHERE fingerprint = ? AND status = 'success' ORDER BY id DESC LIMIT 1",
+        (fingerprint,)
+    ).fetchone()
+    if hit is None:
+        return None
+
+    entries = store.entries_for_fingerprint(fingerprint, limit=1)
+    if not entries or not entries[0]["output_files"]:
+        # No outputs in lineage: nothing to verify or reuse
+        return None
+    entry = entries[0]
+
+    outputs = {}
+    for path in entry["output_files"]:
+        recorded = entry["content_hashes"].get(path)
+        if recorded is None:
+            # Not a local file (database table, MLflow run): nothing to verify
+            continue
+        if store.content_hash(path) != recorded:
+            print(f"Cached output changed or missing: {path}")
+            return None
+        outputs[path] = recorded
+
+    for path in superseded_snapshots(entry["output_files"]):
+        print(f"Cached feature snapshot is no longer the latest catalog version: {path}")
+        return None
+    return outputs
+
+
+def reuse_outputs(outputs):
+    # Stages that pick their inputs by newest mtime select the reused outputs again
+    store = get_store()
+    for path, content_hash in outputs.items():
+        os.utime(path, None)
+        if os.path.isfile(path):
+            store.remember_hash(path, content_hash)
+
+
+def record_stage_run(module_name, fingerprint, run_id, status):
+    get_store().connection().execute(
+        "INSERT INTO stage_runs (module, fingerprint, run_id, status, timestamp) VALUES (?, ?, ?, ?, ?)",
+        (module_name, fingerprint, run_id, status, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    )
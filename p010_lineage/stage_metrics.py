@@ -0,0 +1,193 @@
+import os
+import sys
+import time
+import functools
+from datetime import datetime
+from p010_lineage.lineage_store import get_store, current_run_id
+
+try:
+    import resource
+except ImportError:
+    # Windows: peak RSS comes from psutil when it is installed
+    resource = None
+
+# --------------------------------------------------
+# Per-stage runtime metrics
+#
+#   with StageMetrics("build_features") as metrics:
+#       ...
+#       metrics.rows_in = len(df)
+#       log_pipeline_run(..., metrics=metrics)
+#
+# On exit one row goes to the stage_metrics table of the lineage store,
+# linked to the stage's lineage entry when log_pipeline_run received it.
+# Bytes read/written default to the sizes of the stage's input/output files.
+#
+#   python -m p010_lineage.stage_metrics [stage] [runs]
+# prints recent runs per stage and flags regressions against the median.
+# --------------------------------------------------
+
+REGRESSION_THRESHOLD = 1.2
+# Absolute change also required, so sub-second jitter is not reported
+REGRESSION_MIN_DELTA = {"wall_seconds": 1.0, "cpu_seconds": 1.0, "peak_rss_mb": 50.0}
+DEFAULT_TREND_RUNS = 10
+
+
+def path_size(path):
+    if os.path.isdir(path):
+        return sum(
+            os.path.getsize(os.path.join(root, f))
+            for root, dirs, files in os.walk(path) for f in files
+        )
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return 0
+
+
+def peak_rss_mb():
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 1024 / 1024
+    except (ImportError, AttributeError):
+        return None
+
+
+class StageMetrics:
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.rows_in = None
+        self.rows_out = None
+        self.bytes_read = None
+        self.bytes_written = None
+        self.input_files = []
+        self.output_files = []
+        self.entry_id = None
+        self.result = None
+
+    def add_files(self, input_files=(), output_files=()):
+        self.input_files.extend(input_files)
+        self.output_files.extend(output_files)
+
+    def __enter__(self):
+        self.started_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall_start
+        bytes_read = self.bytes_read
+        if bytes_read is None:
+            bytes_read = sum(path_size(p) for p in self.input_files)
+        bytes_written = self.bytes_written
+        if bytes_written is None:
+            bytes_written = sum(path_size(p) for p in self.output_files)
+
+        self.result = {
+            "entry_id": self.entry_id,
+            "run_id": current_run_id(),
+            "stage": self.stage,
+            "status": "success" if exc_type is None else "failed",
+            "started_at": self.started_at,
+            "wall_seconds": wall,
+            "cpu_seconds": time.process_time() - self._cpu_start,
+            "peak_rss_mb": peak_rss_mb(),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "bytes_read": bytes_read,
+            "bytes_written": bytes_written,
+            "rows_per_second": self.rows_in / wall if self.rows_in and wall > 0 else None
+        }
+
+        # Metrics must never turn a successful stage into a failed one
+        try:
+            get_store().record_metrics(self.result)
+        except Exception as e:
+            print(f"WARNING: could not record stage metrics: {e}")
+        print(format_metrics(self.result))
+        return False
+
+
+def track_stage(stage):
+    # Decorator form for modules whose main work is a single function
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with StageMetrics(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def format_metrics(m):
+    rss = f"{m['peak_rss_mb']:.0f} MB" if m["peak_rss_mb"] is not None else "n/a"
+    throughput = f"{m['rows_per_second']:,.0f} rows/s" if m["rows_per_second"] else "n/a"
+    return (
+        f"Stage metrics [{m['stage']}]: wall {m['wall_seconds']:.2f}s, cpu {m['cpu_seconds']:.2f}s, "
+        f"peak RSS {rss}, rows {m['rows_in']} -> {m['rows_out']}, "
+        f"read {m['bytes_read'] / 1024 / 1024:.1f} MB, written {m['bytes_written'] / 1024 / 1024:.1f} MB, "
+        f"{throughput}"
+    )
+
+
+# --------------------------------------------------
+# Trend CLI
+# --------------------------------------------------
+
+def _fmt(value, spec):
+    return "-" if value is None else format(value, spec)
+
+
+def _median(values):
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+
+def print_trends(stage=None, runs=DEFAULT_TREND_RUNS):
+    stages = [stage] if stage else get_store().metric_stages()
+    if not stages:
+        print("No stage metrics recorded yet.")
+        return
+
+    for name in stages:
+        rows = get_store().stage_metrics(name, runs)
+        if not rows:
+            print(f"\nNo metrics recorded for stage: {name}")
+            continue
+
+        print(f"\n=== {name} (last {len(rows)} runs, newest first) ===")
+        print(f"{'started_at':<20} {'status':<8} {'wall_s':>8} {'cpu_s':>8} {'rss_mb':>8} "
+              f"{'rows_in':>10} {'rows_out':>10} {'rows/s':>12}")
+        for m in rows:
+            print(
+                f"{m['started_at']:<20} {m['status']:<8} {_fmt(m['wall_seconds'], '.2f'):>8} "
+                f"{_fmt(m['cpu_seconds'], '.2f'):>8} {_fmt(m['peak_rss_mb'], '.0f'):>8} "
+                f"{_fmt(m['rows_in'], 'd'):>10} {_fmt(m['rows_out'], 'd'):>10} "
+                f"{_fmt(m['rows_per_second'], ',.0f'):>12}"
+            )
+
+        # Newest successful run against the median of the earlier ones
+        successful = [m for m in rows if m["status"] == "success"]
+        if len(successful) >= 2:
+            latest, history = successful[0], successful[1:]
+            for key, min_delta in REGRESSION_MIN_DELTA.items():
+                baseline = _median([m[key] for m in history])
+                if not baseline or latest[key] is None:
+                    continue
+                if latest[key] > baseline * REGRESSION_THRESHOLD and latest[key] - baseline > min_delta:
+                    print(f"REGRESSION: {key} {latest[key]:.2f} vs median {baseline:.2f} "
+                          f"(+{(latest[key] / baseline - 1) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    stage_arg = sys.argv[1] if len(sys.argv) > 1 else None
+    runs_arg = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_TREND_RUNS
+    print_trends(stage_arg, runs_arg)
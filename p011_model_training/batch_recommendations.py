@@ -0,0 +1,232 @@
+import os
+import sys
+import json
+import time
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datetime import datetime
+from multiprocessing import Pool
+from p010_lineage.log_lineage import log_pipeline_run
+from p010_lineage.stage_metrics import StageMetrics
+from p011_model_training.svd_scoring import SVDScorer, select_top_k
+from p011_model_training.model_artifact import load_scorer, default_model_path, model_sha256
+
+# --------------------------------------------------
+# Offline top-K recommendations for every user
+#
+# The scorer's factor matrices and a CSR matrix of already-seen items are
+# written once as .npy files; every worker memory-maps them, so the pool
+# shares one page-cache copy instead of pickling the model per process.
+# Each worker scores a contiguous range of users, masks seen items and
+# writes its own Parquet part (user_id, rank, item_id, score).
+#
+# Output directory (files starting with "_" are skipped by Parquet readers):
+#   part-*.parquet     recommendations
+#   _seen/*.npy        seen-items CSR in the model's inner ids
+#   _manifest.json     model hash, K, counts - lets the serving API check
+#                      that the lists belong to the model it has loaded
+#
+#   python -m p011_model_training.batch_recommendations [model_path]
+# defaults to the SVD model (svd_model/ or svd_model.pkl).
+# --------------------------------------------------
+
+PREPARED_INTERACTIONS_PATH = "data_lake/prepared/interactions"
+RECOMMENDATIONS_PATH = "p009_feature_store/recommendations"
+
+TOP_K = int(os.getenv("BATCH_TOP_K", "100"))
+WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 1)))
+USERS_PER_TASK = int(os.getenv("BATCH_USERS_PER_TASK", "20000"))
+# Upper bound for one dense score block (users x items float64)
+SCORE_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def get_latest_file(base_path, extension):
+    all_files = []
+    for root, dirs, files in os.walk(base_path):
+        for file in files:
+            if file.endswith(extension):
+                all_files.append(os.path.join(root, file))
+
+    if not all_files:
+        raise Exception(f"No files found in {base_path}")
+
+    return max(all_files, key=os.path.getmtime)
+
+
+def build_seen_matrix(scorer, interactions_df):
+    # CSR (indptr, indices) of trained items each trained user interacted with
+    users = scorer.inner_users(interactions_df["user_id"].astype(str))
+    items = scorer.inner_items(interactions_df["item_id"].astype(str))
+    keep = (users >= 0) & (items >= 0)
+    pairs = np.unique(np.stack([users[keep], items[keep]], axis=1), axis=0)
+
+    counts = np.bincount(pairs[:, 0], minlength=len(scorer.user_ids))
+    indptr = np.zeros(len(scorer.user_ids) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, pairs[:, 1].astype(np.int32)
+
+
+# --------------------------------------------------
+# Worker side
+# --------------------------------------------------
+
+_worker = {}
+
+
+def load_seen(path, mmap_mode="r"):
+    return (
+        np.load(os.path.join(path, "_seen", "indptr.npy"), mmap_mode=mmap_mode),
+        np.load(os.path.join(path, "_seen", "indices.npy"), mmap_mode=mmap_mode)
+    )
+
+
+def _init_worker(shared_dir, out_dir, k):
+    _worker["scorer"] = SVDScorer.load_arrays(shared_dir, mmap_mode="r")
+    _worker["indptr"], _worker["indices"] = load_seen(out_dir)
+    _worker["out_dir"] = out_dir
+    _worker["k"] = k
+
+
+def _score_users(task):
+    start, stop = task
+    scorer = _worker["scorer"]
+    indptr, indices, k = _worker["indptr"], _worker["indices"], _worker["k"]
+    n_items = len(scorer.item_ids)
+    block = max(1, SCORE_BLOCK_BYTES // (8 * n_items))
+
+    user_col, rank_col, item_col, score_col = [], [], [], []
+    for block_start in range(start, stop, block):
+        users = np.arange(block_start, min(block_start + block, stop))
+        scores = scorer.score_inner(users)
+
+        # Seen items can never be recommended
+        for row, u in enumerate(users):
+            scores[row, indices[indptr[u]:indptr[u + 1]]] = -np.inf
+
+        idx = select_top_k(scores, k)
+        top_scores = np.take_along_axis(scores, idx, axis=1)
+        valid = np.isfinite(top_scores)
+
+        ranks = np.broadcast_to(np.arange(1, idx.shape[1] + 1, dtype=np.int16), idx.shape)
+        user_col.append(np.repeat(users, valid.sum(axis=1)))
+        rank_col.append(ranks[valid])
+        item_col.append(idx[valid])
+        score_col.append(top_scores[valid].astype(np.float32))
+
+    user_idx = np.concatenate(user_col)
+    item_idx = np.concatenate(item_col)
+
+    # Ids are dictionary encoded against the model's id arrays: no per-row strings
+    table = pa.table({
+        "user_id": pa.DictionaryArray.from_arrays(
+            pa.array(user_idx - start, type=pa.int32()),
+            pa.array(np.asarray(scorer.user_ids[start:stop]).astype(str))
+        ),
+        "rank": pa.array(np.concatenate(rank_col)),
+        "item_id": pa.DictionaryArray.from_arrays(
+            pa.array(item_idx, type=pa.int32()),
+            pa.array(np.asarray(scorer.item_ids).astype(str))
+        ),
+        "score": pa.array(np.concatenate(score_col))
+    })
+    pq.write_table(
+        table,
+        os.path.join(_worker["out_dir"], f"part-{start:09d}.parquet"),
+        compression="zstd"
+    )
+    return stop - start
+
+
+# --------------------------------------------------
+# Driver
+# --------------------------------------------------
+
+def generate_recommendations(scorer, interactions_df, k=TOP_K, workers=WORKERS,
+                             users_per_task=USERS_PER_TASK, base_path=RECOMMENDATIONS_PATH,
+                             model_sha256=None):
+    version = datetime.now().strftime("%Y%m%d_%H%M%S")
+    out_dir = os.path.join(base_path, f"top{k}_{version}")
+    tmp_dir = out_dir + ".tmp"
+    shared_dir = os.path.join(tmp_dir, "_model")
+
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(shared_dir)
+    os.makedirs(os.path.join(tmp_dir, "_seen"))
+
+    scorer.save_arrays(shared_dir)
+    indptr, indices = build_seen_matrix(scorer, interactions_df)
+    np.save(os.path.join(tmp_dir, "_seen", "indptr.npy"), indptr)
+    np.save(os.path.join(tmp_dir, "_seen", "indices.npy"), indices)
+
+    n_users = len(scorer.user_ids)
+    tasks = [(s, min(s + users_per_task, n_users)) for s in range(0, n_users, users_per_task)]
+    print(f"Scoring {n_users} users x {len(scorer.item_ids)} items, top-{k}, "
+          f"{len(tasks)} task(s) on {workers} worker(s)")
+
+    start = time.perf_counter()
+    done = 0
+    if workers <= 1:
+        _init_worker(shared_dir, tmp_dir, k)
+        for task in tasks:
+            done += _score_users(task)
+    else:
+        with Pool(workers, initializer=_init_worker, initargs=(shared_dir, tmp_dir, k)) as pool:
+            report_every = max(1, len(tasks) // 10)
+            for finished, n in enumerate(pool.imap_unordered(_score_users, tasks), 1):
+                done += n
+                if finished % report_every == 0:
+                    print(f"  {done}/{n_users} users ({done / (time.perf_counter() - start):,.0f} users/sec)")
+    elapsed = time.perf_counter() - start
+
+    shutil.rmtree(shared_dir)
+    with open(os.path.join(tmp_dir, "_manifest.json"), "w") as f:
+        json.dump({
+            "model_sha256": model_sha256,
+            "k": k,
+            "n_users": n_users,
+            "n_items": len(scorer.item_ids),
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }, f, indent=4)
+
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.replace(tmp_dir, out_dir)
+
+    print(f"Recommendations written to: {out_dir}")
+    print(f"Users scored: {done} in {elapsed:.2f}s ({done / elapsed:,.0f} users/sec)")
+    return out_dir, done
+
+
+if __name__ == "__main__":
+    with StageMetrics("batch_recommendations") as metrics:
+        print("\n=== BATCH RECOMMENDATION GENERATION STARTED ===")
+
+        model_path = sys.argv[1] if len(sys.argv) > 1 else default_model_path()
+        scorer = load_scorer(model_path)
+        print(f"Loaded model: {model_path}")
+
+        interactions_file = get_latest_file(PREPARED_INTERACTIONS_PATH, ".csv")
+        print(f"Excluding items already seen in: {interactions_file}")
+        interactions = pd.read_csv(interactions_file, usecols=["user_id", "item_id"])
+
+        output_dir, users_scored = generate_recommendations(
+            scorer, interactions, model_sha256=model_sha256(model_path)
+        )
+        metrics.rows_in = users_scored
+        metrics.rows_out = sum(
+            pq.ParquetFile(os.path.join(output_dir, f)).metadata.num_rows
+            for f in os.listdir(output_dir) if f.endswith(".parquet")
+        )
+
+        log_pipeline_run(
+            stage="batch_recommendations",
+            input_files=[model_path, interactions_file],
+            output_files=[output_dir],
+            metrics=metrics
+        )
+
+        print("\n=== BATCH RECOMMENDATION GENERATION COMPLETED ===")
@@ -0,0 +1,265 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+import mlflow
+from datetime import datetime
+from p010_lineage.log_lineage import log_pipeline_run
+from p010_lineage.stage_metrics import StageMetrics
+from p011_model_training.svd_scoring import SVDScorer
+from p011_model_training.model_artifact import (
+    load_scorer, load_manifest, save_scorer, model_sha256, is_artifact, MODEL_DIR
+)
+from p011_model_training.ann_index import IVFIndex, ann_index_path
+from p011_model_training.batch_recommendations import get_latest_file, PREPARED_INTERACTIONS_PATH
+
+# --------------------------------------------------
+# Incremental fold-in of new users and items
+#
+# Users/items in new ratings that the model has never seen get factors
+# and biases without retraining: with the other side frozen, each one is
+# a small ridge regression
+#   min  sum_i (r_ui - mu - b_i - q_i . p_u - b_u)^2 + lp |p_u|^2 + lb b_u^2
+# solved in closed form over [q_i, 1] (and the mirror image for items).
+# The penalties are MAP priors: noise variance (residuals of the model on
+# ratings between known users and items) over the variance of the existing
+# factors / biases. SGD's reg_all is far too weak here - with a handful of
+# ratings per new user it fits them exactly and generalises worse than
+# the biases alone.
+# Ratings between two new entities are handled by alternating between
+# the item side and the user side for FOLD_IN_ROUNDS rounds. Optionally a
+# few SGD epochs over just the new ratings refine the new parameters
+# (existing factors never change).
+#
+# The extended model replaces the artifact and is logged as a new run of
+# the SVD experiment, so the serving API hot-swaps it on its next poll.
+# A full retrain (train_svd_model.py) is still needed periodically to
+# update existing users and items.
+#
+#   python -m p011_model_training.fold_in [interactions.csv]
+# --------------------------------------------------
+
+EXPERIMENT_NAME = "RecoMart_Recommender_SVD"
+FOLD_IN_ROUNDS = int(os.getenv("FOLD_IN_ROUNDS", "2"))
+FOLD_IN_SGD_EPOCHS = int(os.getenv("FOLD_IN_SGD_EPOCHS", "0"))
+# SGD refinement only; used when the model manifest has no hyperparameters
+DEFAULT_REG = 0.02
+DEFAULT_LR = 0.005
+# Noise variance when no ratings between known users and items are available
+DEFAULT_NOISE_VARIANCE = 1.0
+SEED = 42
+
+
+def load_ratings(path, scorer):
+    # (ratings involving an unseen user or item, ratings between known ones)
+    df = pd.read_csv(path, usecols=["user_id", "item_id", "rating"])
+    df = df[df["rating"].notna()]
+    df["user_id"] = df["user_id"].astype(str)
+    df["item_id"] = df["item_id"].astype(str)
+
+    known = df["user_id"].isin(scorer.user_index) & df["item_id"].isin(scorer.item_index)
+    return df[~known].reset_index(drop=True), df[known].reset_index(drop=True)
+
+
+def noise_variance(scorer, known_df):
+    if known_df.empty:
+        return DEFAULT_NOISE_VARIANCE
+    users = scorer.inner_users(known_df["user_id"])
+    items = scorer.inner_items(known_df["item_id"])
+    est = np.einsum("ij,ij->i", scorer.pu[users], scorer.qi[items])
+    if scorer.biased:
+        est = est + scorer.global_mean + scorer.bu[users] + scorer.bi[items]
+    return float(np.mean((known_df["rating"].to_numpy() - est) ** 2))
+
+
+def prior_penalty(factors, biases, noise_var, biased):
+    # Diagonal ridge penalty: noise variance / prior variance per coordinate
+    penalty = [noise_var / max(float(np.mean(np.square(factors))), 1e-12)] * factors.shape[1]
+    if biased:
+        penalty.append(noise_var / max(float(np.mean(np.square(biases))), 1e-12))
+    return np.diag(penalty)
+
+
+def _solve_side(entities, others, targets, other_factors, other_solved, penalty, biased):
+    # Ridge solution [factors, bias] per entity from its ratings against solved others
+    usable = other_solved[others]
+    entities, others, targets = entities[usable], others[usable], targets[usable]
+
+    solutions = {}
+    if len(entities) == 0:
+        return solutions
+
+    order = np.argsort(entities, kind="stable")
+    entities, others, targets = entities[order], others[order], targets[order]
+    starts = np.flatnonzero(np.r_[True, entities[1:] != entities[:-1]])
+    ends = np.r_[starts[1:], len(entities)]
+
+    for start, end in zip(starts, ends):
+        design = other_factors[others[start:end]]
+        if biased:
+            design = np.hstack([design, np.ones((end - start, 1))])
+        solutions[entities[start]] = np.linalg.solve(
+            design.T @ design + penalty, design.T @ targets[start:end]
+        )
+    return solutions
+
+
+def fold_in(scorer, ratings_df, noise_var=DEFAULT_NOISE_VARIANCE, reg=DEFAULT_REG, lr=DEFAULT_LR,
+            rounds=FOLD_IN_ROUNDS, sgd_epochs=FOLD_IN_SGD_EPOCHS, seed=SEED):
+    n_users, n_items = len(scorer.user_ids), len(scorer.item_ids)
+    n_factors = scorer.pu.shape[1]
+    user_penalty = prior_penalty(scorer.pu, scorer.bu, noise_var, scorer.biased)
+    item_penalty = prior_penalty(scorer.qi, scorer.bi, noise_var, scorer.biased)
+
+    new_user_ids = pd.unique(ratings_df.loc[~ratings_df["user_id"].isin(scorer.user_index), "user_id"])
+    new_item_ids = pd.unique(ratings_df.loc[~ratings_df["item_id"].isin(scorer.item_index), "item_id"])
+    user_lookup = {u: n_users + k for k, u in enumerate(new_user_ids)}
+    item_lookup = {i: n_items + k for k, i in enumerate(new_item_ids)}
+
+    users = np.array([scorer.user_index.get(u, user_lookup.get(u)) for u in ratings_df["user_id"]], dtype=np.int64)
+    items = np.array([scorer.item_index.get(i, item_lookup.get(i)) for i in ratings_df["item_id"]], dtype=np.int64)
+    ratings = ratings_df["rating"].to_numpy(dtype=np.float64)
+
+    # Existing parameters followed by zero-initialised rows for the new ids
+    pu = np.vstack([scorer.pu, np.zeros((len(new_user_ids), n_factors))])
+    qi = np.vstack([scorer.qi, np.zeros((len(new_item_ids), n_factors))])
+    bu = np.concatenate([scorer.bu, np.zeros(len(new_user_ids))])
+    bi = np.concatenate([scorer.bi, np.zeros(len(new_item_ids))])
+    user_solved = np.r_[np.ones(n_users, dtype=bool), np.zeros(len(new_user_ids), dtype=bool)]
+    item_solved = np.r_[np.ones(n_items, dtype=bool), np.zeros(len(new_item_ids), dtype=bool)]
+
+    mu = scorer.global_mean if scorer.biased else 0.0
+    new_item_rows = items >= n_items
+    new_user_rows = users >= n_users
+
+    for _ in range(rounds):
+        # Items first: on round one they can only use existing users
+        rows = new_item_rows
+        target = ratings[rows] - mu - (bu[users[rows]] if scorer.biased else 0.0)
+        for item, x in _solve_side(items[rows], users[rows], target, pu, user_solved,
+                                   item_penalty, scorer.biased).items():
+            qi[item] = x[:n_factors]
+            bi[item] = x[n_factors] if scorer.biased else 0.0
+            item_solved[item] = True
+
+        rows = new_user_rows
+        target = ratings[rows] - mu - (bi[items[rows]] if scorer.biased else 0.0)
+        for user, x in _solve_side(users[rows], items[rows], target, qi, item_solved,
+                                   user_penalty, scorer.biased).items():
+            pu[user] = x[:n_factors]
+            bu[user] = x[n_factors] if scorer.biased else 0.0
+            user_solved[user] = True
+
+    def rmse():
+        est = mu + np.einsum("ij,ij->i", pu[users], qi[items])
+        if scorer.biased:
+            est = est + bu[users] + bi[items]
+        return float(np.sqrt(np.mean((ratings - est) ** 2))) if len(ratings) else 0.0
+
+    stats = {"new_ratings": len(ratings), "noise_variance": noise_var, "rmse_closed_form": rmse()}
+
+    # SGD refinement, same update rule as surprise's SVD, new parameters only
+    rng = np.random.default_rng(seed)
+    for _ in range(sgd_epochs):
+        for row in rng.permutation(len(ratings)):
+            u, i = users[row], items[row]
+            err = ratings[row] - (mu + bu[u] + bi[i] + qi[i] @ pu[u])
+            pu_u = pu[u].copy()
+            if u >= n_users:
+                if scorer.biased:
+                    bu[u] += lr * (err - reg * bu[u])
+                pu[u] += lr * (err * qi[i] - reg * pu[u])
+            if i >= n_items:
+                if scorer.biased:
+                    bi[i] += lr * (err - reg * bi[i])
+                qi[i] += lr * (err * pu_u - reg * qi[i])
+    if sgd_epochs:
+        stats["rmse_after_sgd"] = rmse()
+
+    # Ids whose every rating pointed at another unsolvable id stay unknown
+    keep_users = np.r_[np.ones(n_users, dtype=bool), user_solved[n_users:]]
+    keep_items = np.r_[np.ones(n_items, dtype=bool), item_solved[n_items:]]
+    stats["new_users"] = int(user_solved[n_users:].sum())
+    stats["new_items"] = int(item_solved[n_items:].sum())
+    stats["skipped_users"] = len(new_user_ids) - stats["new_users"]
+    stats["skipped_items"] = len(new_item_ids) - stats["new_items"]
+
+    folded = SVDScorer(
+        pu[keep_users], qi[keep_items], bu[keep_users], bi[keep_items], scorer.global_mean,
+        np.concatenate([np.asarray(scorer.user_ids).astype(str), np.asarray(new_user_ids, dtype=str)])[keep_users],
+        np.concatenate([np.asarray(scorer.item_ids).astype(str), np.asarray(new_item_ids, dtype=str)])[keep_items],
+        scorer.rating_scale, biased=scorer.biased
+    )
+    return folded, stats
+
+
+if __name__ == "__main__":
+    with StageMetrics("fold_in") as metrics:
+        print("\n=== SVD FOLD-IN STARTED ===")
+
+        if not is_artifact(MODEL_DIR):
+            raise Exception(f"Fold-in needs the NumPy model artifact at {MODEL_DIR}; run train_svd_model first")
+
+        manifest = load_manifest(MODEL_DIR)
+        hyperparameters = manifest.get("hyperparameters", {})
+        base_sha = model_sha256(MODEL_DIR)
+        # Loaded into memory: the artifact directory is replaced below
+        scorer = load_scorer(MODEL_DIR, mmap_mode=None)
+        had_index = os.path.isfile(ann_index_path(MODEL_DIR))
+
+        interactions_file = sys.argv[1] if len(sys.argv) > 1 else get_latest_file(PREPARED_INTERACTIONS_PATH, ".csv")
+        new_ratings, known_ratings = load_ratings(interactions_file, scorer)
+        print(f"Ratings involving unseen users/items in {interactions_file}: {len(new_ratings)}")
+        metrics.rows_in = len(new_ratings)
+
+        if new_ratings.empty:
+            print("Nothing to fold in.")
+        else:
+            start = time.perf_counter()
+            folded, stats = fold_in(
+                scorer, new_ratings,
+                noise_var=noise_variance(scorer, known_ratings),
+                reg=hyperparameters.get("reg_all", DEFAULT_REG),
+                lr=hyperparameters.get("lr_all", DEFAULT_LR)
+            )
+            stats["fold_in_seconds"] = time.perf_counter() - start
+            print(f"Folded in {stats['new_users']} users and {stats['new_items']} items "
+                  f"in {stats['fold_in_seconds']:.2f}s (RMSE on new ratings {stats['rmse_closed_form']:.4f})")
+            if stats["skipped_users"] or stats["skipped_items"]:
+                print(f"Left unknown (no usable ratings): {stats['skipped_users']} users, "
+                      f"{stats['skipped_items']} items")
+
+            model_path = save_scorer(folded, MODEL_DIR, metadata={
+                "hyperparameters": hyperparameters,
+                "fold_in": {
+                    "base_model_sha256": base_sha,
+                    "interactions_file": str(interactions_file),
+                    "new_users": stats["new_users"],
+                    "new_items": stats["new_items"],
+                    "folded_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                }
+            })
+            if had_index:
+                IVFIndex.build(folded).save(ann_index_path(model_path))
+            metrics.rows_out = stats["new_users"] + stats["new_items"]
+
+            mlflow.set_experiment(EXPERIMENT_NAME)
+            with mlflow.start_run(run_name=f"SVD_FoldIn_{datetime.now().strftime('%Y%m%d_%H%M%S')}"):
+                mlflow.log_param("model_type", "SVD_fold_in")
+                mlflow.log_param("base_model_sha256", base_sha)
+                mlflow.log_param("interactions_path", str(interactions_file))
+                mlflow.log_param("rounds", FOLD_IN_ROUNDS)
+                mlflow.log_param("sgd_epochs", FOLD_IN_SGD_EPOCHS)
+                mlflow.log_metrics(stats)
+                mlflow.log_artifacts(model_path, artifact_path="model/svd_model")
+            print(f"Folded model saved to {model_path} and logged to MLflow")
+
+            log_pipeline_run(
+                stage="fold_in",
+                input_files=[interactions_file],
+                output_files=[model_path],
+                metrics=metrics
+            )
+
+        print("\n=== SVD FOLD-IN COMPLETED ===")
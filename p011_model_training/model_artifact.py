@@ -0,0 +1,125 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tracemalloc
+from p011_model_training.svd_scoring import SVDScorer, file_sha256, MODEL_PATH, MANIFEST_FILE
+
+# --------------------------------------------------
+# SVD model artifact: NumPy arrays + JSON manifest
+#
+#   svd_model/
+#     manifest.json          format, global mean, rating scale, shapes,
+#                            per-file sha256, training hyperparameters
+#     pu.npy qi.npy          user / item factors
+#     bu.npy bi.npy          user / item biases
+#     user_ids.npy           raw ids in inner-id order (the id maps)
+#     item_ids.npy
+#     ivf_index.npz          ANN index (ann_index.py), when built
+#
+# Loading needs only NumPy: no surprise import, no trainset. Arrays are
+# memory-mapped, so load time does not grow with the model and every
+# process that maps the same files shares one copy in the page cache.
+#
+#   python -m p011_model_training.model_artifact [svd_model.pkl] [svd_model]
+# converts a pickled surprise model and compares load time and memory.
+# --------------------------------------------------
+
+MODEL_DIR = "svd_model"
+
+
+def save_scorer(scorer, path=MODEL_DIR, metadata=None):
+    # Written to a sibling directory first so readers never see half a model
+    tmp_path = path.rstrip("/\\") + ".tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+
+    scorer.save_arrays(tmp_path, metadata=metadata)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def export_model(model, path=MODEL_DIR, hyperparameters=None):
+    return save_scorer(
+        SVDScorer.from_surprise(model), path, metadata={"hyperparameters": hyperparameters or {}}
+    )
+
+
+def is_artifact(path):
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+
+def load_manifest(path=MODEL_DIR):
+    with open(os.path.join(path, MANIFEST_FILE), "r") as f:
+        return json.load(f)
+
+
+def default_model_path():
+    # Artifact directory when there is one, else a pickled surprise model
+    return MODEL_DIR if is_artifact(MODEL_DIR) else MODEL_PATH
+
+
+def load_scorer(path=None, mmap_mode="r"):
+    path = path or default_model_path()
+    if is_artifact(path):
+        return SVDScorer.load_arrays(path, mmap_mode=mmap_mode)
+    if os.path.isfile(path):
+        return SVDScorer.load(path)
+    raise Exception(f"No SVD model found at {path}")
+
+
+def model_sha256(path):
+    # The manifest holds the hash of every array, so it identifies the model
+    if is_artifact(path):
+        return file_sha256(os.path.join(path, MANIFEST_FILE))
+    return file_sha256(path)
+
+
+# --------------------------------------------------
+# Pickle vs artifact comparison
+# --------------------------------------------------
+
+def _measure_load(load):
+    tracemalloc.start()
+    start = time.perf_counter()
+    scorer = load()
+    elapsed = time.perf_counter() - start
+    allocated = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return scorer, elapsed, allocated
+
+
+if __name__ == "__main__":
+    pickle_path = sys.argv[1] if len(sys.argv) > 1 else MODEL_PATH
+    artifact_path = sys.argv[2] if len(sys.argv) > 2 else MODEL_DIR
+
+    print("\n=== SVD MODEL ARTIFACT EXPORT ===")
+    import pickle
+    with open(pickle_path, "rb") as f:
+        model = pickle.load(f)
+    export_model(model, artifact_path, hyperparameters={
+        "n_factors": model.n_factors,
+        "n_epochs": model.n_epochs,
+        "lr_all": model.lr_bu,
+        "reg_all": model.reg_bu
+    })
+    print(f"Exported {pickle_path} -> {artifact_path}")
+
+    scorer_pkl, pkl_seconds, pkl_bytes = _measure_load(lambda: SVDScorer.load(pickle_path))
+    scorer_npy, npy_seconds, npy_bytes = _measure_load(lambda: load_scorer(artifact_path))
+
+    pickle_mb = os.path.getsize(pickle_path) / 1024 / 1024
+    artifact_mb = sum(
+        os.path.getsize(os.path.join(artifact_path, f)) for f in os.listdir(artifact_path)
+    ) / 1024 / 1024
+    print(f"{'':<10} {'size MB':>10} {'load ms':>10} {'heap MB':>10}")
+    print(f"{'pickle':<10} {pickle_mb:>10.1f} {pkl_seconds * 1000:>10.1f} {pkl_bytes / 1024 / 1024:>10.1f}")
+    print(f"{'artifact':<10} {artifact_mb:>10.1f} {npy_seconds * 1000:>10.1f} {npy_bytes / 1024 / 1024:>10.1f}")
+
+    users = list(scorer_pkl.user_ids[:100])
+    diff = abs(scorer_pkl.score(users) - scorer_npy.score(users)).max()
+    print(f"Max score difference pickle vs artifact: {diff:.2e}")
@@ -1,12 +1,10 @@
-import pickle
 import pandas as pd
 from pathlib import Path
+from p011_model_training.model_artifact import load_scorer
 
-# Load model
-MODEL_PATH = "svd_model.pkl"
-
-with open(MODEL_PATH, "rb") as f:
-    model = pickle.load(f)
+# Load model: memory-mapped NumPy artifact (falls back to a pickled model).
+# Factors/biases as NumPy arrays: all items are scored in one matrix multiply
+scorer = load_scorer()
 
 print("SVD model loaded.")
 
@@ -33,15 +31,9 @@ print(f"\nGenerating recommendations for user: {user_id}")
 # Get all unique items
 all_items = df["item_id"].astype(str).unique()
 
-# Predict ratings
-predictions = []
-for item in all_items:
-    pred = model.predict(user_id, item)
-    predictions.append((item, pred.est))
-
-# Sort and show top 5 recommendations
-top_n = sorted(predictions, key=lambda x: x[1], reverse=True)[:5]
+# Predict ratings for every item and keep the top 5
+top_items, top_scores = scorer.top_k([user_id], k=5, item_ids=all_items)[0]
 
 print(f"\nTop recommendations for user {user_id}:")
-for item, score in top_n:
+for item, score in zip(top_items, top_scores):
     print(f"Item: {item}, Predicted rating: {round(score, 2)}")
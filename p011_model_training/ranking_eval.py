@@ -0,0 +1,219 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+from multiprocessing import Pool
+from scipy import sparse
+from p011_model_training.svd_scoring import SVDScorer, select_top_k
+
+# --------------------------------------------------
+# Full-catalog ranking evaluation
+#
+# Every evaluated user gets the top-K over the whole catalog with their
+# training items removed - the list serving would show - and the metrics
+# are computed against their held-out relevant items (test rating >=
+# threshold):
+#   precision@K, recall@K, NDCG@K (binary gains), MAP@K, hit rate@K
+# Users are scored in blocks with one matrix multiply, training items
+# are masked from a CSR matrix, top-K uses argpartition (select_top_k),
+# and user chunks run on a process pool that memory-maps the model.
+# All K values are derived from one top-max(K) pass.
+#
+#   python -m p011_model_training.ranking_eval
+# evaluates the current model on train_svd_model's held-out split.
+# --------------------------------------------------
+
+DEFAULT_KS = (5, 10, 20)
+RELEVANCE_THRESHOLD = 3.5
+METRICS = ["precision", "recall", "ndcg", "map", "hit_rate"]
+WORKERS = int(os.getenv("EVAL_WORKERS", str(os.cpu_count() or 1)))
+USERS_PER_TASK = int(os.getenv("EVAL_USERS_PER_TASK", "20000"))
+# Upper bound for one dense score block (users x items float64)
+SCORE_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def interaction_matrix(users, items, n_users, n_items):
+    # Binary CSR user x item matrix; duplicate pairs collapse to 1
+    matrix = sparse.csr_matrix(
+        (np.ones(len(users), dtype=np.int8), (users, items)), shape=(n_users, n_items)
+    )
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix
+
+
+def _block_metrics(scorer, train, test, users, ks):
+    scores = scorer.score_inner(users)
+
+    seen = train[users].tocoo()
+    scores[seen.row, seen.col] = -np.inf
+
+    kmax = max(ks)
+    top = select_top_k(scores, kmax)
+    relevant = test[users].toarray().astype(bool)
+    hits = np.take_along_axis(relevant, top, axis=1)
+    hits &= np.isfinite(np.take_along_axis(scores, top, axis=1))
+    n_relevant = relevant.sum(axis=1)
+
+    discounts = 1.0 / np.log2(np.arange(2, kmax + 2))
+    sums = {}
+    for k in ks:
+        h = hits[:, :k]
+        n_hits = h.sum(axis=1)
+        ideal = np.minimum(n_relevant, k)
+        idcg = np.cumsum(discounts[:k])[ideal - 1]
+        precision_at_rank = np.cumsum(h, axis=1) / np.arange(1, k + 1)
+
+        sums[k] = {
+            "precision": (n_hits / k).sum(),
+            "recall": (n_hits / n_relevant).sum(),
+            "ndcg": ((h * discounts[:k]).sum(axis=1) / idcg).sum(),
+            "map": ((precision_at_rank * h).sum(axis=1) / ideal).sum(),
+            "hit_rate": (n_hits > 0).sum()
+        }
+    return sums
+
+
+def _chunk_metrics(scorer, train, test, users, ks):
+    block = max(1, SCORE_BLOCK_BYTES // (8 * len(scorer.item_ids)))
+    totals = {k: dict.fromkeys(METRICS, 0.0) for k in ks}
+    for start in range(0, len(users), block):
+        for k, values in _block_metrics(scorer, train, test, users[start:start + block], ks).items():
+            for name, value in values.items():
+                totals[k][name] += value
+    return totals
+
+
+# --------------------------------------------------
+# Worker side
+# --------------------------------------------------
+
+_worker = {}
+
+
+def _init_worker(shared_dir, ks):
+    _worker["scorer"] = SVDScorer.load_arrays(os.path.join(shared_dir, "model"), mmap_mode="r")
+    _worker["train"] = sparse.load_npz(os.path.join(shared_dir, "train.npz"))
+    _worker["test"] = sparse.load_npz(os.path.join(shared_dir, "test.npz"))
+    _worker["ks"] = ks
+
+
+def _evaluate_users(users):
+    return _chunk_metrics(_worker["scorer"], _worker["train"], _worker["test"], users, _worker["ks"])
+
+
+# --------------------------------------------------
+# Driver
+# --------------------------------------------------
+
+def evaluate_ranking(scorer, train_users, train_items, test_users, test_items, test_ratings=None,
+                     ks=DEFAULT_KS, threshold=RELEVANCE_THRESHOLD, workers=WORKERS,
+                     users_per_task=USERS_PER_TASK):
+    # Inner-id pairs in; {k: {metric: mean over users with a relevant test item}} out
+    n_users, n_items = len(scorer.user_ids), len(scorer.item_ids)
+    test_users, test_items = np.asarray(test_users), np.asarray(test_items)
+    if test_ratings is not None:
+        keep = np.asarray(test_ratings) >= threshold
+        test_users, test_items = test_users[keep], test_items[keep]
+
+    train = interaction_matrix(train_users, train_items, n_users, n_items)
+    test = interaction_matrix(test_users, test_items, n_users, n_items)
+    eval_users = np.flatnonzero(np.diff(test.indptr))
+    if len(eval_users) == 0:
+        raise Exception("No users with relevant held-out items to evaluate")
+
+    start = time.perf_counter()
+    chunks = [eval_users[s:s + users_per_task] for s in range(0, len(eval_users), users_per_task)]
+    if workers <= 1 or len(chunks) == 1:
+        results = [_chunk_metrics(scorer, train, test, chunk, ks) for chunk in chunks]
+    else:
+        shared_dir = tempfile.mkdtemp(prefix="ranking_eval_")
+        try:
+            scorer.save_arrays(os.path.join(shared_dir, "model"))
+            sparse.save_npz(os.path.join(shared_dir, "train.npz"), train)
+            sparse.save_npz(os.path.join(shared_dir, "test.npz"), test)
+            with Pool(workers, initializer=_init_worker, initargs=(shared_dir, ks)) as pool:
+                results = pool.map(_evaluate_users, chunks)
+        finally:
+            shutil.rmtree(shared_dir, ignore_errors=True)
+    elapsed = time.perf_counter() - start
+
+    metrics = {k: dict.fromkeys(METRICS, 0.0) for k in ks}
+    for result in results:
+        for k in ks:
+            for name in METRICS:
+                metrics[k][name] += result[k][name]
+    for k in ks:
+        for name in METRICS:
+            metrics[k][name] = float(metrics[k][name] / len(eval_users))
+
+    print(f"Ranked {n_items} items for {len(eval_users)} users in {elapsed:.2f}s "
+          f"({len(eval_users) / elapsed:,.0f} users/sec)")
+    return metrics
+
+
+def evaluate_surprise_split(scorer, trainset, testset, ks=DEFAULT_KS, threshold=RELEVANCE_THRESHOLD,
+                            workers=WORKERS):
+    # scorer built from the model trained on trainset, so inner ids line up
+    train = np.array([(u, i) for u, i, _ in trainset.all_ratings()], dtype=np.int64).reshape(-1, 2)
+
+    test_users = scorer.inner_users([u for u, _, _ in testset])
+    test_items = scorer.inner_items([i for _, i, _ in testset])
+    test_ratings = np.array([r for _, _, r in testset], dtype=np.float64)
+    # Held-out pairs of users or items the model never saw cannot be ranked
+    known = (test_users >= 0) & (test_items >= 0)
+
+    return evaluate_ranking(
+        scorer, train[:, 0], train[:, 1],
+        test_users[known], test_items[known], test_ratings[known],
+        ks=ks, threshold=threshold, workers=workers
+    )
+
+
+def flatten_metrics(metrics, prefix="catalog_"):
+    # {k: {name: value}} -> {"catalog_ndcg_at_10": value, ...} for MLflow
+    return {f"{prefix}{name}_at_{k}": value for k, values in metrics.items() for name, value in values.items()}
+
+
+def format_metrics(metrics):
+    lines = [f"{'K':>4} " + " ".join(f"{name:>10}" for name in METRICS)]
+    for k, values in metrics.items():
+        lines.append(f"{k:>4} " + " ".join(f"{values[name]:>10.4f}" for name in METRICS))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import pandas as pd
+    from surprise import Dataset, Reader
+    from surprise.model_selection import train_test_split
+    from p011_model_training.model_artifact import load_scorer
+    from p011_model_training.batch_recommendations import get_latest_file, PREPARED_INTERACTIONS_PATH
+
+    print("\n=== FULL-CATALOG RANKING EVALUATION ===")
+    data_path = sys.argv[1] if len(sys.argv) > 1 else get_latest_file(PREPARED_INTERACTIONS_PATH, ".csv")
+    df = pd.read_csv(data_path)
+    df = df[df["rating"].notna()]
+    df["user_id"] = df["user_id"].astype(str)
+    df["item_id"] = df["item_id"].astype(str)
+
+    # Same split as train_svd_model, so held-out pairs were not trained on
+    reader = Reader(rating_scale=(df["rating"].min(), df["rating"].max()))
+    data = Dataset.load_from_df(df[["user_id", "item_id", "rating"]], reader)
+    trainset, testset = train_test_split(data, test_size=0.2, random_state=42)
+
+    scorer = load_scorer()
+    train_users = scorer.inner_users([trainset.to_raw_uid(u) for u, _, _ in trainset.all_ratings()])
+    train_items = scorer.inner_items([trainset.to_raw_iid(i) for _, i, _ in trainset.all_ratings()])
+    test_users = scorer.inner_users([u for u, _, _ in testset])
+    test_items = scorer.inner_items([i for _, i, _ in testset])
+    test_ratings = np.array([r for _, _, r in testset])
+
+    known_train = (train_users >= 0) & (train_items >= 0)
+    known_test = (test_users >= 0) & (test_items >= 0)
+    metrics = evaluate_ranking(
+        scorer, train_users[known_train], train_items[known_train],
+        test_users[known_test], test_items[known_test], test_ratings[known_test]
+    )
+    print(format_metrics(metrics))
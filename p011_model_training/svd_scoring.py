@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+import numpy as np
+
+# --------------------------------------------------
+# Vectorized SVD scoring
+#
+# Reproduces surprise's SVD.predict() with NumPy:
+#   known user and item : mu + bu[u] + bi[i] + qi[i] . pu[u]
+#   unknown user        : mu + bi[i]            (bias term of the side that is known)
+#   unknown item        : mu + bu[u]
+#   both unknown        : mu
+# (unbiased models predict the global mean whenever either side is unknown)
+# then clips to the trainset rating scale. A batch of users is scored
+# against every item with one matrix multiply.
+# Models without a rating scale (implicit ALS, train_als_model.py) return
+# the raw preference scores unclipped.
+# --------------------------------------------------
+
+MODEL_PATH = "svd_model.pkl"
+DEFAULT_BATCH_SIZE = 1024
+
+ARTIFACT_FORMAT = "svd-npy-v1"
+MANIFEST_FILE = "manifest.json"
+ARRAY_NAMES = ["pu", "qi", "bu", "bi", "user_ids", "item_ids"]
+
+
+class SVDScorer:
+
+    def __init__(self, pu, qi, bu, bi, global_mean, user_ids, item_ids,
+                 rating_scale, biased=True):
+        self.pu = np.ascontiguousarray(pu, dtype=np.float64)
+        self.qi = np.ascontiguousarray(qi, dtype=np.float64)
+        self.bu = np.asarray(bu, dtype=np.float64)
+        self.bi = np.asarray(bi, dtype=np.float64)
+        self.global_mean = float(global_mean)
+        self.rating_scale = None if rating_scale is None else (float(rating_scale[0]), float(rating_scale[1]))
+        self.biased = biased
+
+        # Raw ids in inner-id order; raw -> inner lookups are built on first use
+        self.user_ids = np.asarray(user_ids)
+        self.item_ids = np.asarray(item_ids)
+        self._user_index = None
+        self._item_index = None
+
+    @property
+    def user_index(self):
+        if self._user_index is None:
+            self._user_index = {raw: inner for inner, raw in enumerate(self.user_ids)}
+        return self._user_index
+
+    @property
+    def item_index(self):
+        if self._item_index is None:
+            self._item_index = {raw: inner for inner, raw in enumerate(self.item_ids)}
+        return self._item_index
+
+    @classmethod
+    def from_surprise(cls, model):
+        trainset = model.trainset
+        user_ids = [trainset.to_raw_uid(u) for u in range(trainset.n_users)]
+        item_ids = [trainset.to_raw_iid(i) for i in range(trainset.n_items)]
+        return cls(
+            model.pu, model.qi, model.bu, model.bi,
+            trainset.global_mean, user_ids, item_ids,
+            trainset.rating_scale, biased=model.biased
+        )
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        with open(path, "rb") as f:
+            return cls.from_surprise(pickle.load(f))
+
+    def save_arrays(self, path, metadata=None):
+        # One .npy per array so other processes can memory-map them, plus a
+        # manifest with everything else (see model_artifact.py)
+        os.makedirs(path, exist_ok=True)
+        arrays = {}
+        for name in ARRAY_NAMES:
+            value = getattr(self, name)
+            if name in ("user_ids", "item_ids"):
+                # Fixed-width unicode: loadable without pickle and mmap-able
+                value = value.astype(str)
+            file_name = f"{name}.npy"
+            np.save(os.path.join(path, file_name), value)
+            arrays[name] = {
+                "file": file_name,
+                "shape": list(value.shape),
+                "dtype": value.dtype.str,
+                "sha256": file_sha256(os.path.join(path, file_name))
+            }
+
+        manifest = {
+            "format": ARTIFACT_FORMAT,
+            "global_mean": self.global_mean,
+            "rating_scale": None if self.rating_scale is None else list(self.rating_scale),
+            "biased": self.biased,
+            "n_users": len(self.user_ids),
+            "n_items": len(self.item_ids),
+            "n_factors": self.pu.shape[1],
+            "arrays": arrays
+        }
+        manifest.update(metadata or {})
+        with open(os.path.join(path, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=4)
+        return path
+
+    @classmethod
+    def load_arrays(cls, path, mmap_mode="r"):
+        with open(os.path.join(path, MANIFEST_FILE), "r") as f:
+            meta = json.load(f)
+        if meta.get("format") != ARTIFACT_FORMAT:
+            raise Exception(f"Unsupported model artifact format in {path}: {meta.get('format')}")
+        arrays = {
+            name: np.load(os.path.join(path, meta["arrays"][name]["file"]), mmap_mode=mmap_mode)
+            for name in ARRAY_NAMES
+        }
+        return cls(
+            arrays["pu"], arrays["qi"], arrays["bu"], arrays["bi"],
+            meta["global_mean"], arrays["user_ids"], arrays["item_ids"],
+            meta["rating_scale"], biased=meta["biased"]
+        )
+
+    def inner_users(self, raw_ids):
+        return np.array([self.user_index.get(u, -1) for u in raw_ids], dtype=np.int64)
+
+    def inner_items(self, raw_ids):
+        return np.array([self.item_index.get(i, -1) for i in raw_ids], dtype=np.int64)
+
+    def score(self, user_ids, item_ids=None):
+        # (n_users, n_items) estimated ratings; item_ids=None scores every trained item
+        items = None if item_ids is None else self.inner_items(item_ids)
+        return self.score_inner(self.inner_users(user_ids), items)
+
+    def score_inner(self, users, items=None):
+        # Same as score() on inner indices; -1 marks an unknown user/item
+        users = np.asarray(users)
+        items = np.arange(len(self.item_ids)) if items is None else np.asarray(items)
+
+        known_u = users >= 0
+        known_i = items >= 0
+        u = np.where(known_u, users, 0)
+        i = np.where(known_i, items, 0)
+
+        both = known_u[:, None] & known_i[None, :]
+        dot = self.pu[u] @ self.qi[i].T
+
+        if self.biased:
+            est = self.global_mean + np.where(known_u, self.bu[u], 0.0)[:, None]
+            est = est + np.where(known_i, self.bi[i], 0.0)[None, :]
+            est = est + np.where(both, dot, 0.0)
+        else:
+            est = np.where(both, dot, self.global_mean)
+
+        if self.rating_scale is None:
+            return est
+        return np.clip(est, self.rating_scale[0], self.rating_scale[1])
+
+    def top_k(self, user_ids, k=10, item_ids=None, batch_size=DEFAULT_BATCH_SIZE,
+              index=None, nprobe=None):
+        # [(item_ids, scores)] per user, best first; ties keep candidate order
+        # like a stable sort over model.predict() results.
+        # With an ANN index (ann_index.IVFIndex) known users over the full
+        # catalog are answered approximately from the probed lists only.
+        if index is not None and item_ids is None:
+            return self._top_k_ann(user_ids, k, index, nprobe, batch_size)
+
+        candidates = self.item_ids if item_ids is None else np.asarray(item_ids, dtype=object)
+        results = []
+        for start in range(0, len(user_ids), batch_size):
+            batch = list(user_ids[start:start + batch_size])
+            scores = self.score(batch, None if item_ids is None else candidates)
+            idx = select_top_k(scores, k)
+            top_scores = np.take_along_axis(scores, idx, axis=1)
+            results.extend(zip(candidates[idx], top_scores))
+        return results
+
+    def _top_k_ann(self, user_ids, k, index, nprobe, batch_size):
+        inner = self.inner_users(user_ids)
+        results = [None] * len(inner)
+
+        known = np.flatnonzero(inner >= 0)
+        for start in range(0, len(known), batch_size):
+            rows = known[start:start + batch_size]
+            for row, (idx, scores) in zip(rows, index.search(self, inner[rows], k, nprobe)):
+                results[row] = (self.item_ids[idx], scores)
+
+        # Unknown users all get the same bias-only ranking
+        unknown = np.flatnonzero(inner < 0)
+        if len(unknown):
+            scores = self.score_inner([-1])
+            idx = select_top_k(scores, k)[0]
+            for row in unknown:
+                results[row] = (self.item_ids[idx], scores[0, idx])
+        return results
+
+
+def file_sha256(path):
+    # Identifies a model artifact independently of where it was copied to
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def select_top_k(scores, k):
+    # Row-wise indices of the k best scores in O(n_items) per row (no full sort)
+    n_items = scores.shape[1]
+    k = min(k, n_items)
+    if k == 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+
+    # k-th best score per row, then everything strictly better plus the
+    # first few equal ones (by position) so the cut is deterministic
+    threshold = np.take_along_axis(
+        scores, np.argpartition(scores, n_items - k, axis=1)[:, n_items - k:n_items - k + 1], axis=1
+    )
+    better = scores > threshold
+    equal = scores == threshold
+    needed = k - better.sum(axis=1, keepdims=True)
+    chosen = better | (equal & (np.cumsum(equal, axis=1) <= needed))
+
+    idx = np.nonzero(chosen)[1].reshape(scores.shape[0], k)
+    values = np.take_along_axis(scores, idx, axis=1)
+    order = np.lexsort((idx, -values), axis=-1)
+    return np.take_along_axis(idx, order, axis=1)
+
+
+if __name__ == "__main__":
+    import random
+
+    print("\n=== SVD SCORING BENCHMARK ===")
+    with open(MODEL_PATH, "rb") as f:
+        model = pickle.load(f)
+    scorer = SVDScorer.from_surprise(model)
+    print(f"Users: {len(scorer.user_ids)}, items: {len(scorer.item_ids)}, factors: {scorer.pu.shape[1]}")
+
+    sample_users = random.sample(list(scorer.user_ids), min(20, len(scorer.user_ids)))
+    items = list(scorer.item_ids)
+
+    # Reference: one model.predict() call per (user, item)
+    start = time.perf_counter()
+    reference = np.array([[model.predict(u, i).est for i in items] for u in sample_users])
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = scorer.score(sample_users)
+    vector_seconds = time.perf_counter() - start
+
+    print(f"Max abs difference vs model.predict: {np.abs(reference - vectorized).max():.2e}")
+    print(f"model.predict loop: {loop_seconds * 1000:.1f} ms, vectorized: {vector_seconds * 1000:.2f} ms "
+          f"({loop_seconds / max(vector_seconds, 1e-9):,.0f}x)")
+
+    start = time.perf_counter()
+    all_top = scorer.top_k(list(scorer.user_ids), k=5)
+    elapsed = time.perf_counter() - start
+    print(f"Top-5 for all {len(all_top)} users: {elapsed:.3f}s")
@@ -0,0 +1,157 @@
+import os
+import math
+import time
+import random
+import itertools
+import mlflow
+from multiprocessing import Pool
+from surprise import SVD, accuracy
+
+# --------------------------------------------------
+# SVD hyperparameter search with successive halving
+#
+# Candidates (a grid or random samples of n_factors / lr_all / reg_all)
+# are trained for a few epochs, the best 1/ETA go on to ETA times more
+# epochs, and so on up to MAX_EPOCHS:
+#   27 configs @ 5 epochs -> 9 @ 15 -> 3 @ 45
+# Each rung runs on a process pool. The train/validation split is handed
+# to every worker once through the pool initializer and reused by all of
+# its trials. Trials become nested MLflow runs under the training run, with
+# validation RMSE logged per rung (step = epochs).
+#
+# Enabled from train_svd_model.py with SVD_SEARCH=1. Trials are scored on
+# a validation split of the training ratings; the best config is then
+# retrained on the full training set and evaluated on the held-out test
+# set as the run's model.
+# --------------------------------------------------
+
+SEARCH_STRATEGY = os.getenv("SVD_SEARCH_STRATEGY", "grid")
+RANDOM_TRIALS = int(os.getenv("SVD_SEARCH_TRIALS", "20"))
+MIN_EPOCHS = int(os.getenv("SVD_SEARCH_MIN_EPOCHS", "5"))
+MAX_EPOCHS = int(os.getenv("SVD_SEARCH_MAX_EPOCHS", "45"))
+ETA = int(os.getenv("SVD_SEARCH_ETA", "3"))
+WORKERS = int(os.getenv("SVD_SEARCH_WORKERS", str(os.cpu_count() or 1)))
+SEED = 42
+
+SEARCH_GRID = {
+    "n_factors": [50, 100, 150],
+    "lr_all": [0.002, 0.005, 0.01],
+    "reg_all": [0.02, 0.05, 0.1]
+}
+
+
+def candidate_configs(strategy=SEARCH_STRATEGY, n_trials=RANDOM_TRIALS, seed=SEED):
+    if strategy == "grid":
+        keys = list(SEARCH_GRID)
+        return [dict(zip(keys, values)) for values in itertools.product(*SEARCH_GRID.values())]
+
+    if strategy == "random":
+        rng = random.Random(seed)
+        # Log-uniform over the grid's range (and a bit beyond) for the rates
+        return [
+            {
+                "n_factors": rng.randint(20, 200),
+                "lr_all": round(10 ** rng.uniform(math.log10(0.001), math.log10(0.02)), 5),
+                "reg_all": round(10 ** rng.uniform(math.log10(0.005), math.log10(0.2)), 5)
+            }
+            for _ in range(n_trials)
+        ]
+
+    raise Exception(f"Unknown search strategy: {strategy} (expected grid or random)")
+
+
+def epoch_schedule(min_epochs=MIN_EPOCHS, max_epochs=MAX_EPOCHS, eta=ETA):
+    rungs = []
+    epochs = min_epochs
+    while epochs < max_epochs:
+        rungs.append(epochs)
+        epochs *= eta
+    rungs.append(max_epochs)
+    return rungs
+
+
+# --------------------------------------------------
+# Worker side
+# --------------------------------------------------
+
+_shared = {}
+
+
+def _init_worker(trainset, valset):
+    _shared["trainset"] = trainset
+    _shared["valset"] = valset
+
+
+def _run_trial(task):
+    trial_id, params, n_epochs = task
+    start = time.perf_counter()
+
+    # surprise cannot resume SGD, so every rung retrains from scratch
+    model = SVD(n_epochs=n_epochs, random_state=SEED, **params)
+    model.fit(_shared["trainset"])
+    predictions = model.test(_shared["valset"])
+
+    return {
+        "trial": trial_id,
+        "n_epochs": n_epochs,
+        "rmse": accuracy.rmse(predictions, verbose=False),
+        "mae": accuracy.mae(predictions, verbose=False),
+        "fit_seconds": time.perf_counter() - start
+    }
+
+
+# --------------------------------------------------
+# Search driver
+# --------------------------------------------------
+
+def search_hyperparameters(trainset, valset, strategy=SEARCH_STRATEGY, workers=WORKERS, eta=ETA):
+    # valset is carved out of the training ratings, never the final test
+    # set. Must run inside an active MLflow run: trials are logged as its children
+    configs = candidate_configs(strategy)
+    rungs = epoch_schedule(eta=eta)
+    history = {trial_id: [] for trial_id in range(len(configs))}
+
+    print(f"Hyperparameter search: {len(configs)} {strategy} configs, epochs {rungs}, "
+          f"keep 1/{eta} per rung, {workers} worker(s)")
+
+    start = time.perf_counter()
+    alive = list(range(len(configs)))
+    with Pool(workers, initializer=_init_worker, initargs=(trainset, valset)) as pool:
+        for rung, n_epochs in enumerate(rungs):
+            tasks = [(t, configs[t], n_epochs) for t in alive]
+            for result in pool.imap_unordered(_run_trial, tasks):
+                history[result["trial"]].append(result)
+
+            ranked = sorted(alive, key=lambda t: history[t][-1]["rmse"])
+            best = history[ranked[0]][-1]
+            print(f"  rung {rung + 1}/{len(rungs)}: {len(alive)} trials @ {n_epochs} epochs, "
+                  f"best RMSE {best['rmse']:.4f} (trial {best['trial']})")
+
+            if rung < len(rungs) - 1:
+                alive = ranked[:max(1, math.ceil(len(alive) / eta))]
+    elapsed = time.perf_counter() - start
+
+    best_trial = min(alive, key=lambda t: history[t][-1]["rmse"])
+    best_params = dict(configs[best_trial], n_epochs=rungs[-1])
+
+    for trial_id, config in enumerate(configs):
+        with mlflow.start_run(run_name=f"trial_{trial_id:02d}", nested=True):
+            mlflow.log_params(config)
+            for result in history[trial_id]:
+                mlflow.log_metric("rmse", result["rmse"], step=result["n_epochs"])
+                mlflow.log_metric("mae", result["mae"], step=result["n_epochs"])
+                mlflow.log_metric("fit_seconds", result["fit_seconds"], step=result["n_epochs"])
+            mlflow.set_tag("epochs_reached", history[trial_id][-1]["n_epochs"])
+            mlflow.set_tag("stopped_early", history[trial_id][-1]["n_epochs"] < rungs[-1])
+            mlflow.set_tag("promoted", trial_id == best_trial)
+
+    mlflow.log_param("search_strategy", strategy)
+    mlflow.log_param("search_trials", len(configs))
+    mlflow.log_param("search_epoch_rungs", ",".join(str(e) for e in rungs))
+    mlflow.log_metric("search_best_rmse", history[best_trial][-1]["rmse"])
+    mlflow.log_metric("search_seconds", elapsed)
+
+    fits = sum(len(h) for h in history.values())
+    print(f"Search finished in {elapsed:.1f}s ({fits} fits): best trial {best_trial} {best_params} "
+          f"RMSE {history[best_trial][-1]['rmse']:.4f}")
+    return best_params
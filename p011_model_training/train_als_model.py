@@ -0,0 +1,288 @@
+import os
+import time
+import mlflow
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from scipy import sparse
+from p010_lineage.stage_metrics import StageMetrics
+from p011_model_training.svd_scoring import SVDScorer
+from p011_model_training.model_artifact import save_scorer
+from p011_model_training.ann_index import IVFIndex, ann_index_path
+from p011_model_training.ranking_eval import evaluate_ranking, flatten_metrics, format_metrics
+from p011_model_training.batch_recommendations import get_latest_file, PREPARED_INTERACTIONS_PATH
+
+# --------------------------------------------------
+# Implicit-feedback ALS over views, clicks, purchases and ratings
+#
+# Every event is implicit evidence of interest, weighted by its type
+# (EVENT_WEIGHTS) and summed per (user, item) into a sparse matrix R.
+# Following Hu, Koren & Volinsky (2008):
+#   preference  p_ui = 1 if r_ui > 0 else 0
+#   confidence  c_ui = 1 + ALPHA * r_ui
+#   minimise    sum over ALL pairs c_ui (p_ui - x_u . y_i)^2 + REG (|X|^2 + |Y|^2)
+# With Y fixed every user solves
+#   (Y'Y + Y'(C_u - I)Y + REG I) x_u = Y' C_u p_u
+# Y'Y is shared by all users and the rest only touches the user's own
+# items, so one sweep costs O(nnz * factors) instead of O(users * items).
+# The systems are solved with a few conjugate-gradient steps warm-started
+# from the previous sweep, for a whole block of users at once (sparse
+# matrix products + NumPy). Blocks run on a thread pool: SciPy's sparse
+# kernels and NumPy's BLAS release the GIL. Items are solved the same way
+# from R'.
+#
+# The factors are exported as an unbiased SVDScorer artifact without a
+# rating scale (als_model/), so batch_recommendations, the ANN index,
+# ranking_eval and the serving API work on it unchanged:
+#   python -m p011_model_training.train_als_model
+#   python -m p011_model_training.batch_recommendations als_model
+# --------------------------------------------------
+
+EXPERIMENT_NAME = "RecoMart_Recommender_ALS"
+MODEL_DIR = "als_model"
+
+# "event:weight,..." - event types not listed are ignored
+EVENT_WEIGHTS = {
+    name: float(weight)
+    for name, weight in (
+        pair.split(":") for pair in os.getenv("ALS_EVENT_WEIGHTS", "view:1,click:2,rating:3,purchase:5").split(",")
+    )
+}
+ALS_PARAMS = {
+    "factors": int(os.getenv("ALS_FACTORS", "64")),
+    "alpha": float(os.getenv("ALS_ALPHA", "10")),
+    "reg": float(os.getenv("ALS_REG", "0.1")),
+    "iterations": int(os.getenv("ALS_ITERATIONS", "15")),
+    "cg_steps": int(os.getenv("ALS_CG_STEPS", "3"))
+}
+THREADS = int(os.getenv("ALS_THREADS", str(os.cpu_count() or 1)))
+# Non-zeros per solver block; each block gathers nnz x factors floats
+BLOCK_NNZ = int(os.getenv("ALS_BLOCK_NNZ", "65536"))
+TEST_SIZE = 0.2
+SEED = 42
+# Rows whose CG residual is this small are left alone (avoids 0/0)
+CG_TOLERANCE = 1e-20
+
+
+# --------------------------------------------------
+# Data: events -> weighted (user, item) pairs -> CSR
+# --------------------------------------------------
+
+def interaction_weights(df, weights=EVENT_WEIGHTS):
+    weight = df["event_type"].map(weights)
+    df = df.assign(weight=weight)[weight.notna() & (weight > 0)]
+    return df.groupby(["user_id", "item_id"], as_index=False, sort=False)["weight"].sum()
+
+
+def split_pairs(n_pairs, test_size=TEST_SIZE, seed=SEED):
+    rng = np.random.default_rng(seed)
+    return rng.random(n_pairs) < test_size
+
+
+def confidence_matrix(users, items, weights, n_users, n_items, alpha):
+    # Stores c_ui - 1 = alpha * r_ui: the part of the confidence above the
+    # baseline 1 every unobserved pair gets
+    return sparse.csr_matrix(
+        (alpha * np.asarray(weights, dtype=np.float64), (users, items)), shape=(n_users, n_items)
+    )
+
+
+# --------------------------------------------------
+# Conjugate-gradient ALS
+# --------------------------------------------------
+
+def row_blocks(indptr, block_nnz=BLOCK_NNZ):
+    # Contiguous row ranges holding about block_nnz non-zeros each
+    starts = np.searchsorted(indptr, np.arange(0, indptr[-1], block_nnz), side="right") - 1
+    bounds = np.unique(np.concatenate([[0], starts, [len(indptr) - 1]]))
+    return [slice(int(bounds[b]), int(bounds[b + 1])) for b in range(len(bounds) - 1)]
+
+
+def _rowdot(a, b):
+    return np.einsum("ij,ij->i", a, b)
+
+
+def _solve_block(conf, factors, fixed, gram, rows, cg_steps):
+    block = conf[rows]
+    n_rows = block.shape[0]
+    if n_rows == 0:
+        return
+    owner = np.repeat(np.arange(n_rows), np.diff(block.indptr))
+    # The fixed side's vectors for this block's non-zeros, reused by every CG step
+    gathered = fixed[block.indices]
+
+    def apply(v):
+        # (Y'Y + REG I) v + Y'(C - I)Y v, row by row
+        weighted = block.data * _rowdot(v[owner], gathered)
+        return v @ gram + sparse.csr_matrix((weighted, block.indices, block.indptr), shape=block.shape) @ fixed
+
+    # Y' C p with p = 1 on the observed items
+    target = sparse.csr_matrix((block.data + 1.0, block.indices, block.indptr), shape=block.shape) @ fixed
+
+    x = factors[rows].copy()
+    residual = target - apply(x)
+    direction = residual.copy()
+    rs = _rowdot(residual, residual)
+    for _ in range(cg_steps):
+        active = rs > CG_TOLERANCE
+        if not active.any():
+            break
+        ad = apply(direction)
+        step = np.where(active, rs / np.where(active, _rowdot(direction, ad), 1.0), 0.0)
+        x += step[:, None] * direction
+        residual -= step[:, None] * ad
+        rs_new = _rowdot(residual, residual)
+        direction = residual + np.where(active, rs_new / np.where(active, rs, 1.0), 0.0)[:, None] * direction
+        rs = rs_new
+
+    # Blocks own disjoint row ranges, so threads never write the same rows
+    factors[rows] = x
+
+
+def als_sweep(conf, factors, fixed, reg, cg_steps, executor):
+    # Re-solve every row of factors with fixed held constant
+    gram = fixed.T @ fixed + reg * np.eye(fixed.shape[1])
+    tasks = [
+        executor.submit(_solve_block, conf, factors, fixed, gram, rows, cg_steps)
+        for rows in row_blocks(conf.indptr)
+    ]
+    for task in tasks:
+        task.result()
+
+
+def implicit_loss(conf, user_factors, item_factors, reg):
+    # Full objective without materialising users x items:
+    #   sum_all s^2 = sum((X'X) * (Y'Y)), plus per non-zero c(1 - s)^2 - s^2
+    loss = np.sum((user_factors.T @ user_factors) * (item_factors.T @ item_factors))
+    coo = conf.tocoo()
+    for start in range(0, coo.nnz, BLOCK_NNZ):
+        end = start + BLOCK_NNZ
+        s = _rowdot(user_factors[coo.row[start:end]], item_factors[coo.col[start:end]])
+        c = 1.0 + coo.data[start:end]
+        loss += np.sum(c * (1.0 - s) ** 2 - s ** 2)
+    return float(loss + reg * (np.sum(user_factors ** 2) + np.sum(item_factors ** 2)))
+
+
+def train_als(conf, factors, reg, iterations, cg_steps, threads=THREADS, seed=SEED):
+    # conf: users x items CSR of c - 1; returns user factors, item factors, per-iteration history
+    n_users, n_items = conf.shape
+    rng = np.random.default_rng(seed)
+    user_factors = rng.normal(0, 0.01, (n_users, factors))
+    item_factors = rng.normal(0, 0.01, (n_items, factors))
+    conf_t = conf.T.tocsr()
+
+    history = []
+    with ThreadPoolExecutor(threads) as executor:
+        for iteration in range(1, iterations + 1):
+            start = time.perf_counter()
+            als_sweep(conf, user_factors, item_factors, reg, cg_steps, executor)
+            als_sweep(conf_t, item_factors, user_factors, reg, cg_steps, executor)
+            seconds = time.perf_counter() - start
+
+            loss = implicit_loss(conf, user_factors, item_factors, reg)
+            history.append({"iteration": iteration, "loss": loss, "seconds": seconds})
+            print(f"  iteration {iteration}/{iterations}: loss {loss:,.1f} ({seconds:.2f}s)")
+
+    return user_factors, item_factors, history
+
+
+def als_scorer(user_factors, item_factors, user_ids, item_ids):
+    # Score = x_u . y_i: no biases, no global mean, no clipping
+    return SVDScorer(
+        user_factors, item_factors, np.zeros(len(user_ids)), np.zeros(len(item_ids)),
+        0.0, user_ids, item_ids, None, biased=False
+    )
+
+
+# --------------------------------------------------
+# Main Training Pipeline
+# --------------------------------------------------
+
+if __name__ == "__main__":
+    with StageMetrics("train_als_model") as metrics:
+        print("\n=== IMPLICIT ALS TRAINING STARTED ===")
+        data_path = get_latest_file(PREPARED_INTERACTIONS_PATH, ".csv")
+        print(f"Using interaction data from: {data_path}")
+
+        df = pd.read_csv(data_path, usecols=["user_id", "item_id", "event_type"])
+        df["user_id"] = df["user_id"].astype(str)
+        df["item_id"] = df["item_id"].astype(str)
+        metrics.rows_in = len(df)
+
+        pairs = interaction_weights(df)
+        if pairs.empty:
+            raise ValueError(f"No events of types {list(EVENT_WEIGHTS)} found. Cannot train ALS model.")
+        print(f"Events: {len(df)} -> weighted user-item pairs: {len(pairs)} (weights {EVENT_WEIGHTS})")
+
+        users, user_ids = pd.factorize(pairs["user_id"])
+        items, item_ids = pd.factorize(pairs["item_id"])
+        n_users, n_items = len(user_ids), len(item_ids)
+
+        # Held-out pairs are the relevant items for the ranking evaluation
+        test = split_pairs(len(pairs))
+        params = dict(ALS_PARAMS)
+        conf = confidence_matrix(
+            users[~test], items[~test], pairs["weight"].to_numpy()[~test], n_users, n_items, params["alpha"]
+        )
+
+        mlflow.set_experiment(EXPERIMENT_NAME)
+        run_name = f"ALS_Run_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+        with mlflow.start_run(run_name=run_name) as run:
+            print(f"Training ALS on {n_users} users x {n_items} items, {conf.nnz} non-zeros, "
+                  f"{params}, {THREADS} thread(s)...")
+            start = time.perf_counter()
+            user_factors, item_factors, history = train_als(
+                conf, params["factors"], params["reg"], params["iterations"], params["cg_steps"]
+            )
+            train_seconds = time.perf_counter() - start
+
+            scorer = als_scorer(user_factors, item_factors, user_ids.to_numpy(), item_ids.to_numpy())
+
+            print("Evaluating full-catalog ranking...")
+            train_coo = conf.tocoo()
+            catalog_metrics = evaluate_ranking(
+                scorer, train_coo.row, train_coo.col, users[test], items[test]
+            )
+            print(format_metrics(catalog_metrics))
+
+            # ---------------------------
+            # Logging to MLflow
+            # ---------------------------
+            mlflow.log_param("model_type", "ImplicitALS")
+            mlflow.log_params(params)
+            mlflow.log_param("event_weights", ",".join(f"{k}:{v:g}" for k, v in EVENT_WEIGHTS.items()))
+            mlflow.log_param("threads", THREADS)
+            mlflow.log_param("training_data_path", str(data_path))
+            mlflow.log_param("training_rows", len(df))
+            mlflow.log_param("training_pairs", conf.nnz)
+
+            for entry in history:
+                mlflow.log_metric("train_loss", entry["loss"], step=entry["iteration"])
+                mlflow.log_metric("iteration_seconds", entry["seconds"], step=entry["iteration"])
+            mlflow.log_metric("train_seconds", train_seconds)
+            mlflow.log_metrics(flatten_metrics(catalog_metrics))
+
+            # ---------------------------
+            # Save and log model artifact
+            # ---------------------------
+            model_path = save_scorer(scorer, MODEL_DIR, metadata={
+                "model_type": "implicit_als",
+                "hyperparameters": dict(params, event_weights=EVENT_WEIGHTS, random_state=SEED)
+            })
+
+            index = IVFIndex.build(scorer)
+            index.save(ann_index_path(model_path))
+            mlflow.log_param("ann_lists", index.n_lists)
+            mlflow.log_param("ann_nprobe", index.nprobe)
+
+            mlflow.log_artifacts(model_path, artifact_path="model/als_model")
+
+            metrics.rows_out = conf.nnz
+            metrics.add_files(input_files=[data_path], output_files=[model_path])
+
+            print("\nALS model training completed successfully.")
+            print(f"Run ID: {run.info.run_id}")
+            print(f"NDCG@10: {catalog_metrics[10]['ndcg']:.4f}, Recall@10: {catalog_metrics[10]['recall']:.4f}")
+            print("Model artifact and metrics logged in MLflow.")
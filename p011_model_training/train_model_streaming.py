@@ -0,0 +1,225 @@
+import os
+import copy
+import numpy as np
+import pandas as pd
+import mlflow
+import mlflow.sklearn
+from datetime import datetime
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import StandardScaler
+from p010_lineage.log_lineage import log_pipeline_run
+from p010_lineage.stage_metrics import StageMetrics
+from p009_feature_store.snapshot_io import get_latest_snapshot, iter_snapshot_batches, snapshot_row_count
+from p009_feature_store.snapshot_catalog import load_catalog, active_versions
+from p009_feature_store.compact_snapshots import bucket_path
+from p011_model_training.train_model import FEATURE_COLS
+
+# --------------------------------------------------
+# Out-of-core purchase-propensity training
+#
+# Same features and target as train_model.py, but the whole feature
+# history is streamed instead of the newest snapshot being loaded:
+#   - every bucket of the compacted store (each distinct feature row of
+#     every retained version, once) plus raw snapshots not compacted yet
+#   - read in CHUNK_ROWS record batches, only the needed columns
+#   - a first pass fits a StandardScaler (partial_fit) on the training
+#     rows: SGD step sizes assume features on one scale, and activity
+#     counts sit next to 0-1 norms
+#   - averaged SGDClassifier(loss="log_loss").partial_fit per standardized
+#     chunk (rows shuffled within the chunk, file order shuffled per epoch)
+#   - train/test split by a hash of the interaction key, so a row lands on
+#     the same side in every chunk, epoch and run without storing anything
+#   - a second streaming pass over the test rows counts the confusion
+#     matrix for accuracy / precision / recall
+# Memory is bounded by one chunk, not by the size of the history.
+#
+#   python -m p011_model_training.train_model_streaming
+# logs to the same MLflow experiment and artifact path as train_model.py.
+# The scaler is folded into the logged model's coefficients, so "model"
+# takes raw features like train_model.py's (the two-stage re-ranker reads
+# coef_ directly); the fitted scaler is logged next to it as "scaler".
+# --------------------------------------------------
+
+EXPERIMENT_NAME = "RecoMart_Recommender"
+CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "100000"))
+EPOCHS = int(os.getenv("STREAM_EPOCHS", "3"))
+SGD_ALPHA = float(os.getenv("STREAM_SGD_ALPHA", "0.0001"))
+TEST_SIZE = 0.2
+SEED = 42
+
+# Identifies an interaction across snapshot versions (timestamp excluded:
+# its stored unit differs between raw and compacted files)
+SPLIT_KEY = ["user_id", "item_id", "session_id", "event_type"]
+CLASSES = np.array([0, 1])
+HASH_BUCKETS = 10_000
+
+
+def training_partitions():
+    # Compacted buckets + raw snapshots whose rows are not in the compacted store yet
+    catalog = load_catalog()
+    files = []
+    store = catalog.get("compacted_store")
+    if store:
+        files += [
+            bucket_path(b, store["path"]) for b in range(store["num_buckets"])
+            if os.path.exists(bucket_path(b, store["path"]))
+        ]
+    for entry in active_versions(catalog):
+        if not entry.get("compacted") and entry.get("raw_path") and os.path.exists(entry["raw_path"]):
+            files.append(entry["raw_path"])
+
+    # No catalog yet: the newest snapshot on disk
+    return files or [get_latest_snapshot()]
+
+
+def test_mask(df, test_size=TEST_SIZE):
+    hashes = pd.util.hash_pandas_object(df[SPLIT_KEY].astype(str), index=False).to_numpy()
+    return (hashes % HASH_BUCKETS) < test_size * HASH_BUCKETS
+
+
+def iter_chunks(files, chunk_rows=CHUNK_ROWS, scaler=None):
+    # (features, target, is_test) per record batch; standardized when a scaler is given
+    columns = list(dict.fromkeys(FEATURE_COLS + ["event_type"] + SPLIT_KEY))
+    for path in files:
+        for batch in iter_snapshot_batches(path, chunk_size=chunk_rows, columns=columns):
+            df = batch.to_pandas()
+            x = df[FEATURE_COLS].astype("float64").fillna(0).to_numpy()
+            if scaler is not None:
+                x = scaler.transform(x)
+            y = (df["event_type"].astype(str) == "purchase").to_numpy().astype(int)
+            yield x, y, test_mask(df)
+
+
+def fit_scaler(files, chunk_rows=CHUNK_ROWS):
+    # First pass: feature means / variances over the training rows only
+    scaler = StandardScaler()
+    for x, y, test in iter_chunks(files, chunk_rows):
+        if not test.all():
+            scaler.partial_fit(x[~test])
+    if not hasattr(scaler, "mean_"):
+        raise Exception("No training rows found in the feature history")
+    return scaler
+
+
+def fold_scaler(model, scaler):
+    # Same decision function on raw features: w / scale, b - (w / scale) . mean
+    model = copy.deepcopy(model)
+    model.coef_ = model.coef_ / scaler.scale_
+    model.intercept_ = model.intercept_ - model.coef_ @ scaler.mean_
+    return model
+
+
+def train_streaming(files, scaler=None, epochs=EPOCHS, chunk_rows=CHUNK_ROWS, alpha=SGD_ALPHA, seed=SEED):
+    # Averaged SGD: the returned weights are the mean over all updates, not
+    # the noisy last iterate
+    model = SGDClassifier(loss="log_loss", alpha=alpha, average=True, random_state=seed)
+    rng = np.random.default_rng(seed)
+    stats = {"train_rows": 0, "chunks": 0}
+
+    for epoch in range(1, epochs + 1):
+        # Snapshots are sorted by user_id: shuffle what fits in memory
+        order = rng.permutation(len(files))
+        epoch_rows = 0
+        for i in order:
+            for x, y, test in iter_chunks([files[i]], chunk_rows, scaler):
+                train = np.flatnonzero(~test)
+                if len(train) == 0:
+                    continue
+                train = rng.permutation(train)
+                model.partial_fit(x[train], y[train], classes=CLASSES)
+                epoch_rows += len(train)
+                stats["chunks"] += 1
+        print(f"  epoch {epoch}/{epochs}: {epoch_rows} training rows")
+        stats["train_rows"] = epoch_rows
+
+    if stats["chunks"] == 0:
+        raise Exception("No training rows found in the feature history")
+    return model, stats
+
+
+def evaluate_streaming(model, files, chunk_rows=CHUNK_ROWS):
+    # Confusion counts over the held-out rows; same definitions as sklearn
+    # (precision / recall are 0 when undefined)
+    tp = fp = fn = tn = 0
+    for x, y, test in iter_chunks(files, chunk_rows):
+        if not test.any():
+            continue
+        pred = model.predict(x[test])
+        truth = y[test]
+        tp += int(((pred == 1) & (truth == 1)).sum())
+        fp += int(((pred == 1) & (truth == 0)).sum())
+        fn += int(((pred == 0) & (truth == 1)).sum())
+        tn += int(((pred == 0) & (truth == 0)).sum())
+
+    total = tp + fp + fn + tn
+    if total == 0:
+        raise Exception("No held-out rows found in the feature history")
+    return {
+        "accuracy": (tp + tn) / total,
+        "precision": tp / (tp + fp) if tp + fp else 0.0,
+        "recall": tp / (tp + fn) if tp + fn else 0.0,
+        "test_rows": total
+    }
+
+
+if __name__ == "__main__":
+    with StageMetrics("model_training_streaming") as metrics:
+        print("\n=== STREAMING MODEL TRAINING PIPELINE STARTED ===")
+
+        files = training_partitions()
+        print(f"Streaming {len(files)} feature partition(s) in chunks of {CHUNK_ROWS} rows:")
+        for path in files:
+            print(f"  {path}")
+        row_counts = [snapshot_row_count(path) for path in files]
+        metrics.rows_in = sum(row_counts) if None not in row_counts else None
+
+        mlflow.set_experiment(EXPERIMENT_NAME)
+        run_name = f"SGD_Streaming_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+        with mlflow.start_run(run_name=run_name):
+            scaler = fit_scaler(files)
+            scaled_model, stats = train_streaming(files, scaler)
+            model = fold_scaler(scaled_model, scaler)
+            results = evaluate_streaming(model, files)
+
+            print("\nModel Performance:")
+            print("Accuracy :", results["accuracy"])
+            print("Precision:", results["precision"])
+            print("Recall   :", results["recall"])
+
+            # Log parameters
+            mlflow.log_param("model_type", "SGDClassifier")
+            mlflow.log_param("loss", "log_loss")
+            mlflow.log_param("average", True)
+            mlflow.log_param("alpha", SGD_ALPHA)
+            mlflow.log_param("epochs", EPOCHS)
+            mlflow.log_param("chunk_rows", CHUNK_ROWS)
+            mlflow.log_param("scaling", "StandardScaler (folded into coef_)")
+            mlflow.log_param("split", f"hash({','.join(SPLIT_KEY)}) test_size={TEST_SIZE}")
+            mlflow.log_param("partitions", len(files))
+            mlflow.log_param("train_rows", stats["train_rows"])
+            mlflow.log_param("test_rows", results["test_rows"])
+
+            # Log metrics (same names as train_model.py)
+            mlflow.log_metric("accuracy", results["accuracy"])
+            mlflow.log_metric("precision", results["precision"])
+            mlflow.log_metric("recall", results["recall"])
+
+            # Log model (raw features in) and the scaler it was trained with
+            mlflow.sklearn.log_model(model, "model")
+            mlflow.sklearn.log_model(scaler, "scaler")
+
+            run_id = mlflow.active_run().info.run_id
+            print(f"\nMLflow Run ID: {run_id}")
+
+        metrics.rows_out = stats["train_rows"] + results["test_rows"]
+
+        # Lineage logging
+        log_pipeline_run(
+            stage="model_training_streaming",
+            input_files=files,
+            output_files=[f"MLflow model run_id={run_id}"],
+            metrics=metrics
+        )
+
+        print("\n=== STREAMING MODEL TRAINING PIPELINE COMPLETED ===")
@@ -3,8 +3,13 @@ import mlflow
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
-import pickle
 from collections import defaultdict
+from p010_lineage.stage_metrics import StageMetrics
+from p011_model_training.model_artifact import export_model, load_scorer, MODEL_DIR
+from p011_model_training.ann_index import IVFIndex, ann_index_path
+from p011_model_training.svd_search import search_hyperparameters
+from p011_model_training.svd_scoring import SVDScorer
+from p011_model_training.ranking_eval import evaluate_surprise_split, flatten_metrics, format_metrics
 
 from surprise import Dataset, Reader, SVD
 from surprise.model_selection import train_test_split
@@ -24,6 +29,12 @@ BASE_DATA_PATH = "data_lake/prepared/interactions"
 REPORTS_DIR = Path("reports")
 REPORTS_DIR.mkdir(exist_ok=True)
 
+SVD_PARAMS = {"n_factors": 100, "n_epochs": 20, "lr_all": 0.005, "reg_all": 0.02}
+# SVD_SEARCH=1: pick SVD_PARAMS with a successive-halving search (svd_search.py)
+SEARCH_ENABLED = os.getenv("SVD_SEARCH", "0") == "1"
+# Share of the training ratings the search ranks configs on
+SEARCH_VALIDATION_SIZE = 0.2
+
 # --------------------------------------------------
 # Utility: Get latest interaction file automatically
 # --------------------------------------------------
@@ -55,6 +66,17 @@ def get_latest_interaction_file(base_path=BASE_DATA_PATH):
     return latest_file
 
 
+# --------------------------------------------------
+# Validation split for the hyperparameter search
+# --------------------------------------------------
+
+def validation_split(trainset, reader, test_size=SEARCH_VALIDATION_SIZE, random_state=42):
+    # Carved out of the training ratings, so the test set never picks the model
+    ratings = pd.DataFrame(trainset.build_testset(), columns=["user_id", "item_id", "rating"])
+    data = Dataset.load_from_df(ratings, reader)
+    return train_test_split(data, test_size=test_size, random_state=random_state)
+
+
 # --------------------------------------------------
 # Evaluation: Precision@K and Recall@K
 # --------------------------------------------------
@@ -98,149 +120,176 @@ def precision_recall_at_k(predictions, k=5, threshold=3.5):
 # --------------------------------------------------
 
 if __name__ == "__main__":
-
-    # ---------------------------
-    # Load latest prepared data
-    # ---------------------------
-    print("Locating latest interaction data...")
-    DATA_PATH = get_latest_interaction_file()
-
-    print("Loading interaction data...")
-    df = pd.read_csv(DATA_PATH)
-
-    print("Raw data preview:")
-    print(df.head())
-
-    # ---------------------------
-    # Data cleaning
-    # ---------------------------
-    df = df[df["rating"].notna()]
-    df["user_id"] = df["user_id"].astype(str)
-    df["item_id"] = df["item_id"].astype(str)
-    df["rating"] = df["rating"].astype(float)
-
-    print(f"Total training rows after cleaning: {len(df)}")
-
-    if df.empty:
-        raise ValueError("No valid rating data found. Cannot train SVD model.")
-
-    # ---------------------------
-    # Surprise dataset preparation
-    # ---------------------------
-    reader = Reader(rating_scale=(df["rating"].min(), df["rating"].max()))
-    data = Dataset.load_from_df(df[["user_id", "item_id", "rating"]], reader)
-
-    trainset, testset = train_test_split(
-        data,
-        test_size=0.2,
-        random_state=42
-    )
-
-    # ---------------------------
-    # MLflow Setup
-    # ---------------------------
-    mlflow.set_experiment(EXPERIMENT_NAME)
-    run_name = f"SVD_Run_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-
-    with mlflow.start_run(run_name=run_name) as run:
-
+    with StageMetrics("train_svd_model") as metrics:
         # ---------------------------
-        # Model Training
+        # Load latest prepared data
         # ---------------------------
-        print("Training SVD model...")
+        print("Locating latest interaction data...")
+        DATA_PATH = get_latest_interaction_file()
 
-        model = SVD(
-            n_factors=100,
-            n_epochs=20,
-            lr_all=0.005,
-            reg_all=0.02,
-            random_state=42
-        )
+        print("Loading interaction data...")
+        df = pd.read_csv(DATA_PATH)
 
-        model.fit(trainset)
+        print("Raw data preview:")
+        print(df.head())
 
         # ---------------------------
-        # Evaluation
+        # Data cleaning
         # ---------------------------
-        print("Evaluating model...")
-        predictions = model.test(testset)
+        df = df[df["rating"].notna()]
+        df["user_id"] = df["user_id"].astype(str)
+        df["item_id"] = df["item_id"].astype(str)
+        df["rating"] = df["rating"].astype(float)
 
-        rmse = accuracy.rmse(predictions)
-        precision_at_5, recall_at_5 = precision_recall_at_k(
-            predictions, k=5, threshold=3.5
-        )
+        print(f"Total training rows after cleaning: {len(df)}")
+        metrics.rows_in = len(df)
 
-        print(f"Precision@5: {precision_at_5:.4f}")
-        print(f"Recall@5: {recall_at_5:.4f}")
+        if df.empty:
+            raise ValueError("No valid rating data found. Cannot train SVD model.")
 
         # ---------------------------
-        # Logging to MLflow
+        # Surprise dataset preparation
         # ---------------------------
-        mlflow.log_param("model_type", "SVD")
-        mlflow.log_param("n_factors", 100)
-        mlflow.log_param("n_epochs", 20)
-        mlflow.log_param("learning_rate", 0.005)
-        mlflow.log_param("regularization", 0.02)
-        mlflow.log_param("training_data_path", str(DATA_PATH))
-        mlflow.log_param("training_rows", len(df))
-
-        mlflow.log_metric("rmse", rmse)
-        mlflow.log_metric("precision_at_5", precision_at_5)
-        mlflow.log_metric("recall_at_5", recall_at_5)
+        reader = Reader(rating_scale=(df["rating"].min(), df["rating"].max()))
+        data = Dataset.load_from_df(df[["user_id", "item_id", "rating"]], reader)
 
-        # ---------------------------
-        # Save and log model artifact
-        # ---------------------------
-        model_path = "svd_model.pkl"
-        with open(model_path, "wb") as f:
-            pickle.dump(model, f)
-
-        mlflow.log_artifact(model_path, artifact_path="model")
-
-        # --------------------------------------------------
-        # Auto-generate PDF performance report
-        # --------------------------------------------------
-        report_path = REPORTS_DIR / f"model_report_{run_name}.pdf"
-
-        doc = SimpleDocTemplate(
-            str(report_path),
-            pagesize=A4,
-            rightMargin=50,
-            leftMargin=50,
-            topMargin=50,
-            bottomMargin=50
+        trainset, testset = train_test_split(
+            data,
+            test_size=0.2,
+            random_state=42
         )
 
-        styles = getSampleStyleSheet()
-        story = []
-
-        title = f"Model Training Report - {EXPERIMENT_NAME}"
-        story.append(Paragraph(f"<b>{title}</b>", styles["Title"]))
-        story.append(Spacer(1, 20))
-
-        content = [
-            f"Run Name: {run_name}",
-            f"Run ID: {run.info.run_id}",
-            f"Training Data Path: {DATA_PATH}",
-            "",
-            "Metrics:",
-            f"RMSE: {rmse}",
-            f"Precision@5: {precision_at_5}",
-            f"Recall@5: {recall_at_5}",
-            "",
-            f"Generated At: {datetime.now()}"
-        ]
-
-        for line in content:
-            story.append(Paragraph(line, styles["Normal"]))
-            story.append(Spacer(1, 12))
-
-        doc.build(story)
-
-        print("\nSVD model training completed successfully.")
-        print(f"RMSE: {rmse}")
-        print(f"Precision@5: {precision_at_5}")
-        print(f"Recall@5: {recall_at_5}")
-        print("Model artifact and metrics logged in MLflow.")
-        print(f"PDF report generated at: {report_path}")
-        print("Each MLflow run = one model version.")
+        # ---------------------------
+        # MLflow Setup
+        # ---------------------------
+        mlflow.set_experiment(EXPERIMENT_NAME)
+        run_name = f"SVD_Run_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+        with mlflow.start_run(run_name=run_name) as run:
+
+            # ---------------------------
+            # Hyperparameter search (optional)
+            # ---------------------------
+            params = dict(SVD_PARAMS)
+            if SEARCH_ENABLED:
+                # Configs are ranked on validation RMSE; testset is only used for the final metrics
+                search_trainset, search_valset = validation_split(trainset, reader)
+                params = search_hyperparameters(search_trainset, search_valset)
+                mlflow.log_param("search_validation_size", SEARCH_VALIDATION_SIZE)
+
+            # ---------------------------
+            # Model Training
+            # ---------------------------
+            print(f"Training SVD model with {params}...")
+
+            model = SVD(
+                n_factors=params["n_factors"],
+                n_epochs=params["n_epochs"],
+                lr_all=params["lr_all"],
+                reg_all=params["reg_all"],
+                random_state=42
+            )
+
+            model.fit(trainset)
+
+            # ---------------------------
+            # Evaluation
+            # ---------------------------
+            print("Evaluating model...")
+            predictions = model.test(testset)
+
+            rmse = accuracy.rmse(predictions)
+            precision_at_5, recall_at_5 = precision_recall_at_k(
+                predictions, k=5, threshold=3.5
+            )
+
+            print(f"Precision@5: {precision_at_5:.4f}")
+            print(f"Recall@5: {recall_at_5:.4f}")
+
+            # Full-catalog top-K with training items removed, as served
+            print("Evaluating full-catalog ranking...")
+            catalog_metrics = evaluate_surprise_split(SVDScorer.from_surprise(model), trainset, testset)
+            print(format_metrics(catalog_metrics))
+
+            # ---------------------------
+            # Logging to MLflow
+            # ---------------------------
+            mlflow.log_param("model_type", "SVD")
+            mlflow.log_param("n_factors", params["n_factors"])
+            mlflow.log_param("n_epochs", params["n_epochs"])
+            mlflow.log_param("learning_rate", params["lr_all"])
+            mlflow.log_param("regularization", params["reg_all"])
+            mlflow.log_param("training_data_path", str(DATA_PATH))
+            mlflow.log_param("training_rows", len(df))
+
+            mlflow.log_metric("rmse", rmse)
+            mlflow.log_metric("precision_at_5", precision_at_5)
+            mlflow.log_metric("recall_at_5", recall_at_5)
+            mlflow.log_metrics(flatten_metrics(catalog_metrics))
+
+            # ---------------------------
+            # Save and log model artifact
+            # ---------------------------
+            # NumPy arrays + manifest (model_artifact.py) instead of a pickle:
+            # consumers memory-map it without importing surprise
+            model_path = export_model(model, MODEL_DIR, hyperparameters=dict(params, random_state=42))
+
+            # Approximate top-K index over the item factors, versioned with the model
+            index = IVFIndex.build(load_scorer(model_path))
+            index_path = index.save(ann_index_path(model_path))
+            mlflow.log_param("ann_lists", index.n_lists)
+            mlflow.log_param("ann_nprobe", index.nprobe)
+
+            mlflow.log_artifacts(model_path, artifact_path="model/svd_model")
+
+            # --------------------------------------------------
+            # Auto-generate PDF performance report
+            # --------------------------------------------------
+            report_path = REPORTS_DIR / f"model_report_{run_name}.pdf"
+
+            doc = SimpleDocTemplate(
+                str(report_path),
+                pagesize=A4,
+                rightMargin=50,
+                leftMargin=50,
+                topMargin=50,
+                bottomMargin=50
+            )
+
+            styles = getSampleStyleSheet()
+            story = []
+
+            title = f"Model Training Report - {EXPERIMENT_NAME}"
+            story.append(Paragraph(f"<b>{title}</b>", styles["Title"]))
+            story.append(Spacer(1, 20))
+
+            content = [
+                f"Run Name: {run_name}",
+                f"Run ID: {run.info.run_id}",
+                f"Training Data Path: {DATA_PATH}",
+                "",
+                "Metrics:",
+                f"RMSE: {rmse}",
+                f"Precision@5: {precision_at_5}",
+                f"Recall@5: {recall_at_5}",
+                f"Full-catalog NDCG@10: {catalog_metrics[10]['ndcg']:.4f}",
+                f"Full-catalog Recall@10: {catalog_metrics[10]['recall']:.4f}",
+                f"Full-catalog Hit rate@10: {catalog_metrics[10]['hit_rate']:.4f}",
+                "",
+                f"Generated At: {datetime.now()}"
+            ]
+
+            for line in content:
+                story.append(Paragraph(line, styles["Normal"]))
+                story.append(Spacer(1, 12))
+
+            doc.build(story)
+            metrics.add_files(input_files=[DATA_PATH], output_files=[model_path, report_path])
+
+            print("\nSVD model training completed successfully.")
+            print(f"RMSE: {rmse}")
+            print(f"Precision@5: {precision_at_5}")
+            print(f"Recall@5: {recall_at_5}")
+            print("Model artifact and metrics logged in MLflow.")
+            print(f"PDF report generated at: {report_path}")
+            print("Each MLflow run = one model version.")
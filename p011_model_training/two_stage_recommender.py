@@ -0,0 +1,363 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from collections import Counter
+from p009_feature_store.mmap_snapshot import MmapFeatureSnapshot, get_latest_mmap_snapshot
+from p008_feature_engineering.session_cooccurrence import SimilarItems, get_latest_similar_items
+from p011_model_training.svd_scoring import select_top_k
+from p011_model_training.model_artifact import load_scorer, default_model_path
+from p011_model_training.batch_recommendations import get_latest_file, PREPARED_INTERACTIONS_PATH
+
+# --------------------------------------------------
+# Two-stage recommendations: candidate generation + re-ranking
+#
+# Stage 1 gathers a few hundred candidates from cheap sources, seeded by
+# the user's most recently interacted items, in priority order:
+#   cooccurrence  - session neighbours of the seeds (session_cooccurrence.py)
+#   category      - most interacted items of the seeds' top categories
+#                   (overall most interacted items for unknown users)
+# Items the user already interacted with are dropped, as in batch and
+# serving. TWO_STAGE_RESURFACE_VIEWED=1 keeps items the user only viewed
+# or clicked (never rated or purchased) and adds the recent ones as a
+# first "viewed" source.
+# Stage 2 re-ranks only the candidates:
+#   score = SVD estimate + LOGISTIC_WEIGHT * P(purchase)
+# with P(purchase) from the logistic model (train_model.py) on user and
+# item features from the memory-mapped feature snapshots.
+#
+# Every step works on lists of fixed length (recent items, top-M
+# neighbours, per-category top lists, candidates), so request latency does
+# not grow with the catalog; only the id -> row lookups touch it.
+# Each stage has a latency budget: when candidate generation runs over,
+# the remaining sources (once one has yielded candidates) are skipped; when the SVD pass
+# runs over, the logistic term is skipped. recommend() returns per-stage
+# timings.
+#
+#   python -m p011_model_training.two_stage_recommender [n_users]
+# compares two-stage latency per stage with scoring the full catalog.
+# --------------------------------------------------
+
+LOGISTIC_EXPERIMENT = "RecoMart_Recommender"
+CANDIDATE_BUDGET_MS = float(os.getenv("TWO_STAGE_CANDIDATE_BUDGET_MS", "10"))
+RERANK_BUDGET_MS = float(os.getenv("TWO_STAGE_RERANK_BUDGET_MS", "10"))
+LOGISTIC_WEIGHT = float(os.getenv("TWO_STAGE_LOGISTIC_WEIGHT", "1.0"))
+RESURFACE_VIEWED = os.getenv("TWO_STAGE_RESURFACE_VIEWED", "0") == "1"
+
+RECENT_ITEMS = 20
+# Interactions that make an item "consumed" rather than just viewed
+ENGAGED_EVENTS = ["rating", "purchase"]
+COOCCURRENCE_CANDIDATES = 200
+CATEGORY_CANDIDATES = 100
+USER_CATEGORIES = 3
+CATEGORY_PREFIX = "category_"
+BENCHMARK_USERS = 200
+BENCHMARK_K = 10
+
+
+# --------------------------------------------------
+# Candidate sources
+# --------------------------------------------------
+
+class RecentItems:
+
+    def __init__(self, user_ids, indptr, items, engaged, limit=RECENT_ITEMS):
+        # CSR layout: items[indptr[u]:indptr[u + 1]] is every item the user
+        # interacted with, newest first; engaged marks the rated / purchased ones
+        self.user_index = {raw: row for row, raw in enumerate(user_ids)}
+        self.indptr = np.asarray(indptr)
+        self.items = np.asarray(items)
+        self.engaged = np.asarray(engaged, dtype=bool)
+        self.limit = limit
+
+    @classmethod
+    def build(cls, df, limit=RECENT_ITEMS):
+        df = df.assign(engaged=df["event_type"].isin(ENGAGED_EVENTS).to_numpy())
+        df["engaged"] = df.groupby(["user_id", "item_id"])["engaged"].transform("max")
+        df = df.sort_values(["user_id", "timestamp"], ascending=[True, False], kind="stable")
+        df = df.drop_duplicates(subset=["user_id", "item_id"], keep="first")
+
+        user_ids, counts = np.unique(df["user_id"].to_numpy(), return_counts=True)
+        indptr = np.concatenate([[0], np.cumsum(counts)])
+        return cls(user_ids.tolist(), indptr, df["item_id"].to_numpy().astype(str),
+                   df["engaged"].to_numpy(), limit)
+
+    def history(self, user_id):
+        # (items, engaged flags), newest first
+        row = self.user_index.get(user_id)
+        if row is None:
+            return self.items[:0], self.engaged[:0]
+        span = slice(self.indptr[row], self.indptr[row + 1])
+        return self.items[span], self.engaged[span]
+
+
+class CategoryPopularity:
+
+    def __init__(self, item_category, top_items, overall):
+        self.item_category = item_category
+        # category -> item ids, most interacted first
+        self.top_items = top_items
+        self.overall = overall
+
+    @classmethod
+    def build(cls, df, item_snapshot, depth=CATEGORY_CANDIDATES):
+        # Category from the snapshot's one-hot columns, popularity = interaction count
+        columns = [c for c in item_snapshot.feature_names if c.startswith(CATEGORY_PREFIX)]
+        if columns:
+            one_hot = np.column_stack([np.asarray(item_snapshot.feature(c), dtype=np.float32) for c in columns])
+            names = np.array([c[len(CATEGORY_PREFIX):] for c in columns])
+            category = np.where(one_hot.max(axis=1) > 0, names[one_hot.argmax(axis=1)], "")
+        else:
+            category = np.full(len(item_snapshot.ids), "")
+        item_category = dict(zip(np.asarray(item_snapshot.ids).tolist(), category.tolist()))
+
+        counts = df["item_id"].value_counts()
+        ranked = pd.DataFrame({"item_id": counts.index.astype(str), "count": counts.to_numpy()})
+        ranked["category"] = ranked["item_id"].map(item_category).fillna("")
+
+        top_items = {
+            name: group["item_id"].to_numpy()[:depth]
+            for name, group in ranked.groupby("category", sort=False) if name
+        }
+        return cls(item_category, top_items, ranked["item_id"].to_numpy()[:depth])
+
+    def get(self, seed_items, n=CATEGORY_CANDIDATES, n_categories=USER_CATEGORIES):
+        # The n slots are split over the seeds' most frequent categories
+        counts = Counter(self.item_category.get(i, "") for i in seed_items)
+        counts.pop("", None)
+        categories = [name for name, _ in counts.most_common(n_categories)]
+        if len(categories) == 0:
+            return self.overall[:n]
+        per_category = -(-n // len(categories))
+        return np.concatenate([self.top_items.get(c, self.overall[:0])[:per_category] for c in categories])
+
+
+# --------------------------------------------------
+# Re-ranking models
+# --------------------------------------------------
+
+class LogisticReranker:
+
+    def __init__(self, model, feature_cols, user_snapshot, item_snapshot):
+        # Applied as sigmoid(x . w + b): no sklearn call on the request path
+        self.coef = np.asarray(model.coef_[0], dtype=np.float64)
+        self.intercept = float(model.intercept_[0])
+        self.feature_cols = list(feature_cols)
+        self.user_snapshot = user_snapshot
+        self.item_snapshot = item_snapshot
+        self.user_cols = [c for c in self.feature_cols if c in user_snapshot.feature_names]
+        self.item_cols = [c for c in self.feature_cols if c in item_snapshot.feature_names]
+
+    def predict(self, user_id, item_ids):
+        # Session / event features are unknown at request time and stay 0,
+        # the value train_model fills missing features with
+        x = np.zeros((len(item_ids), len(self.feature_cols)))
+        positions = {c: j for j, c in enumerate(self.feature_cols)}
+        if self.user_cols:
+            values, _ = self.user_snapshot.lookup([user_id], self.user_cols)
+            x[:, [positions[c] for c in self.user_cols]] = values[0]
+        if self.item_cols:
+            values, _ = self.item_snapshot.lookup(item_ids, self.item_cols)
+            x[:, [positions[c] for c in self.item_cols]] = values
+        x = np.nan_to_num(x)
+        return 1.0 / (1.0 + np.exp(-(x @ self.coef + self.intercept)))
+
+
+def load_logistic_model():
+    # Latest finished train_model.py run; None when there is none
+    import mlflow
+    import mlflow.sklearn
+    from p011_model_training.train_model import FEATURE_COLS
+
+    runs = mlflow.search_runs(
+        experiment_names=[LOGISTIC_EXPERIMENT],
+        filter_string="attributes.status = 'FINISHED'",
+        order_by=["attributes.start_time DESC"],
+        max_results=1
+    )
+    if runs.empty:
+        return None, FEATURE_COLS
+    run_id = runs.iloc[0]["run_id"]
+    return mlflow.sklearn.load_model(f"runs:/{run_id}/model"), FEATURE_COLS
+
+
+# --------------------------------------------------
+# Pipeline
+# --------------------------------------------------
+
+def _elapsed_ms(start):
+    return (time.perf_counter() - start) * 1000
+
+
+class TwoStageRecommender:
+
+    def __init__(self, scorer, recent, category_popularity, similar=None, reranker=None,
+                 candidate_budget_ms=CANDIDATE_BUDGET_MS, rerank_budget_ms=RERANK_BUDGET_MS,
+                 logistic_weight=LOGISTIC_WEIGHT, resurface_viewed=RESURFACE_VIEWED):
+        self.scorer = scorer
+        self.recent = recent
+        self.category_popularity = category_popularity
+        self.similar = similar
+        self.reranker = reranker
+        self.candidate_budget_ms = candidate_budget_ms
+        self.rerank_budget_ms = rerank_budget_ms
+        self.logistic_weight = logistic_weight
+        self.resurface_viewed = resurface_viewed
+
+    def candidates(self, user_id):
+        # (candidate item ids, source per candidate, timings); first source wins duplicates
+        start = time.perf_counter()
+        timings = {"sources": {}, "skipped": []}
+        found, labels = [], []
+
+        # Recent items only seed the other sources; already seen items are
+        # never candidates, except viewed-only ones when resurfacing
+        history, engaged = self.recent.history(user_id)
+        recent = history[:self.recent.limit]
+        exclude = history[engaged] if self.resurface_viewed else history
+
+        sources = [
+            ("cooccurrence", lambda: self.similar.candidates(recent, COOCCURRENCE_CANDIDATES)[0]
+             if self.similar is not None else recent[:0]),
+            ("category", lambda: self.category_popularity.get(recent))
+        ]
+        if self.resurface_viewed:
+            sources.insert(0, ("viewed", lambda: recent[~engaged[:self.recent.limit]]))
+
+        n_found = 0
+        for name, source in sources:
+            # Sources run until one yields something to rank, then within budget
+            if n_found and _elapsed_ms(start) > self.candidate_budget_ms:
+                timings["skipped"].append(name)
+                continue
+            source_start = time.perf_counter()
+            items = np.asarray(source()).astype(str)
+            items = items[~np.isin(items, exclude)]
+            n_found += len(items)
+            found.append(items)
+            labels.append(np.full(len(items), name))
+            timings["sources"][name] = _elapsed_ms(source_start)
+
+        items = np.concatenate(found) if found else np.array([], dtype=str)
+        labels = np.concatenate(labels) if labels else np.array([], dtype=str)
+        _, first = np.unique(items, return_index=True)
+        keep = np.sort(first)
+
+        timings["ms"] = _elapsed_ms(start)
+        timings["over_budget"] = timings["ms"] > self.candidate_budget_ms
+        return items[keep], labels[keep], timings
+
+    def rerank(self, user_id, items):
+        # (scores aligned with items, timings)
+        start = time.perf_counter()
+        timings = {"skipped": []}
+
+        user = self.scorer.user_index.get(user_id, -1)
+        scores = self.scorer.score_inner([user], self.scorer.inner_items(items))[0]
+        timings["svd_ms"] = _elapsed_ms(start)
+
+        if self.reranker is not None and self.logistic_weight:
+            if _elapsed_ms(start) > self.rerank_budget_ms:
+                timings["skipped"].append("logistic")
+            else:
+                logistic_start = time.perf_counter()
+                scores = scores + self.logistic_weight * self.reranker.predict(user_id, items)
+                timings["logistic_ms"] = _elapsed_ms(logistic_start)
+
+        timings["ms"] = _elapsed_ms(start)
+        timings["over_budget"] = timings["ms"] > self.rerank_budget_ms
+        return scores, timings
+
+    def recommend(self, user_id, n=10):
+        # (item ids, scores, sources, timings), best first
+        start = time.perf_counter()
+        items, sources, candidate_timings = self.candidates(user_id)
+        scores, rerank_timings = self.rerank(user_id, items)
+
+        top = select_top_k(scores[None, :], n)[0]
+        timings = {
+            "candidates": candidate_timings,
+            "rerank": rerank_timings,
+            "n_candidates": len(items),
+            "total_ms": _elapsed_ms(start)
+        }
+        return items[top], scores[top], sources[top], timings
+
+
+def load_recommender(model_path=None, interactions_path=None, use_logistic=True):
+    model_path = model_path or default_model_path()
+    interactions_path = interactions_path or get_latest_file(PREPARED_INTERACTIONS_PATH, ".csv")
+    scorer = load_scorer(model_path)
+
+    df = pd.read_csv(interactions_path, usecols=["user_id", "item_id", "event_type", "timestamp"])
+    df["user_id"] = df["user_id"].astype(str)
+    df["item_id"] = df["item_id"].astype(str)
+
+    user_snapshot = MmapFeatureSnapshot(get_latest_mmap_snapshot("user_id"))
+    item_snapshot = MmapFeatureSnapshot(get_latest_mmap_snapshot("item_id"))
+
+    similar_path = get_latest_similar_items()
+    similar = SimilarItems(similar_path) if similar_path else None
+    if similar is None:
+        print("WARNING: no similar-items index; co-occurrence candidates disabled")
+
+    reranker = None
+    if use_logistic:
+        try:
+            model, feature_cols = load_logistic_model()
+            if model is not None:
+                reranker = LogisticReranker(model, feature_cols, user_snapshot, item_snapshot)
+        except Exception as e:
+            print(f"WARNING: logistic model unavailable ({e}); re-ranking with SVD only")
+
+    print(f"Two-stage recommender: model {model_path}, interactions {interactions_path}, "
+          f"similar items {similar_path}, logistic {'on' if reranker else 'off'}")
+    return TwoStageRecommender(
+        scorer, RecentItems.build(df), CategoryPopularity.build(df, item_snapshot), similar, reranker
+    )
+
+
+# --------------------------------------------------
+# Latency comparison
+# --------------------------------------------------
+
+def _percentiles(values):
+    return np.percentile(values, 50), np.percentile(values, 95)
+
+
+if __name__ == "__main__":
+    n_users = int(sys.argv[1]) if len(sys.argv) > 1 else BENCHMARK_USERS
+
+    print("\n=== TWO-STAGE RECOMMENDER BENCHMARK ===")
+    recommender = load_recommender()
+    scorer = recommender.scorer
+    rng = np.random.default_rng(42)
+    users = rng.choice(scorer.user_ids, min(n_users, len(scorer.user_ids)), replace=False).tolist()
+
+    stages = {"candidates": [], "rerank": [], "total": [], "full catalog": []}
+    n_candidates, over_budget = [], 0
+    for user_id in users:
+        _, _, _, timings = recommender.recommend(user_id, BENCHMARK_K)
+        stages["candidates"].append(timings["candidates"]["ms"])
+        stages["rerank"].append(timings["rerank"]["ms"])
+        stages["total"].append(timings["total_ms"])
+        n_candidates.append(timings["n_candidates"])
+        over_budget += timings["candidates"]["over_budget"] or timings["rerank"]["over_budget"]
+
+        # Reference: SVD over every item
+        start = time.perf_counter()
+        select_top_k(scorer.score_inner([scorer.user_index[user_id]]), BENCHMARK_K)
+        stages["full catalog"].append(_elapsed_ms(start))
+
+    print(f"{len(users)} users, {len(scorer.item_ids)} items, "
+          f"{np.mean(n_candidates):.0f} candidates on average, {over_budget} over budget")
+    print(f"{'stage':<14} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, values in stages.items():
+        p50, p95 = _percentiles(values)
+        print(f"{name:<14} {p50:>8.3f} {p95:>8.3f}")
+
+    items, scores, sources, timings = recommender.recommend(users[0], BENCHMARK_K)
+    print(f"\nTop {BENCHMARK_K} for {users[0]}:")
+    for item, score, source in zip(items, scores, sources):
+        print(f"  {item}  {score:.4f}  ({source})")
@@ -3,6 +3,14 @@ import sys
 import subprocess
 import logging
 import os
+from p010_lineage.lineage_store import new_run_id
+from p009_feature_store.snapshot_io import get_latest_snapshot
+from p010_lineage.stage_cache import (
+    stage_fingerprint,
+    cached_outputs,
+    reuse_outputs,
+    record_stage_run
+)
 
 # --------------------------------------------------
 # Orchestration Logging Setup
@@ -27,20 +35,71 @@ logging.info("Orchestration logging initialized")
 
 
 
+# --------------------------------------------------
+# Stage cache inputs
+# --------------------------------------------------
+# The files each stage reads: (directory, extension) for stages that take
+# the newest file by mtime, or the stage's own resolver function (feature
+# snapshots come from the catalog). Stages listed here are skipped when
+# their inputs, code and config match a previous successful run; the rest
+# (data generation, ingestion) always run.
+# Set PIPELINE_FORCE=1 to run every stage regardless.
+
+STAGE_INPUTS = {
+    "p004_validation.profile_and_validate_interactions": [("data_lake/raw/interactions/csv", ".csv")],
+    "p004_validation.profile_and_validate_products": [("data_lake/raw/products/api", ".json")],
+    "p005_data_quality_reports.generate_dq_pdf": [
+        ("p005_data_quality_reports/interactions", ".json"),
+        ("p005_data_quality_reports/products", ".json")
+    ],
+    "p006_preparation.prepare_interactions": [("data_lake/raw/interactions/csv", ".csv")],
+    "p006_preparation.prepare_products": [("data_lake/raw/products/api", ".json")],
+    "p008_feature_engineering.build_features": [
+        ("data_lake/prepared/interactions", ".csv"),
+        ("data_lake/prepared/products", ".json")
+    ],
+    "p008_feature_engineering.session_cooccurrence": [("data_lake/prepared/interactions", ".csv")],
+    "p008_feature_engineering.load_features_to_db": [get_latest_snapshot],
+    "p011_model_training.train_model": [get_latest_snapshot],
+    "p011_model_training.train_svd_model": [("data_lake/prepared/interactions", ".csv")],
+    "p011_model_training.train_als_model": [("data_lake/prepared/interactions", ".csv")],
+    "p009_feature_store.compact_snapshots": [get_latest_snapshot]
+}
+
+
 # --------------------------------------------------
 # Utility to run python -m modules
 # --------------------------------------------------
 
 def run_module(module_name):
+    inputs = STAGE_INPUTS.get(module_name)
+    fingerprint = stage_fingerprint(module_name, inputs) if inputs is not None else None
+
+    if fingerprint is not None and os.getenv("PIPELINE_FORCE") != "1":
+        outputs = cached_outputs(fingerprint)
+        if outputs is not None:
+            reuse_outputs(outputs)
+            record_stage_run(module_name, fingerprint, os.getenv("PIPELINE_RUN_ID"), "skipped")
+            msg = f"Skipping module {module_name}: inputs, code and config unchanged ({fingerprint[:12]})"
+            print(f"\n{msg}")
+            logging.info(msg)
+            return
+
     msg = f"Running module: {module_name}"
     print(f"\n{msg}")
     logging.info(msg)
 
+    # The stage records this fingerprint on its lineage entry
+    env = dict(os.environ)
+    if fingerprint is not None:
+        env["STAGE_FINGERPRINT"] = fingerprint
+
     result = subprocess.run(
         [sys.executable, "-m", module_name],
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        text=True
+        text=True,
+        env=env
     )
 
     # Log only, don't print twice
@@ -52,6 +111,9 @@ def run_module(module_name):
     if result.returncode != 0:
         raise RuntimeError(f"Module {module_name} failed")
 
+    if fingerprint is not None:
+        record_stage_run(module_name, fingerprint, os.getenv("PIPELINE_RUN_ID"), "success")
+
     success_msg = f"Module {module_name} completed successfully"
     print(success_msg)
     logging.info(success_msg)
@@ -108,11 +170,21 @@ def build_features():
     run_module("p008_feature_engineering.build_features")
 
 
+@task
+def build_similar_items():
+    run_module("p008_feature_engineering.session_cooccurrence")
+
+
 @task
 def load_features_to_db():
     run_module("p008_feature_engineering.load_features_to_db")
 
 
+@task
+def compact_feature_store():
+    run_module("p009_feature_store.compact_snapshots")
+
+
 @task
 def train_logistic_model():
     run_module("p011_model_training.train_model")
@@ -123,6 +195,16 @@ def train_svd_model():
     run_module("p011_model_training.train_svd_model")
 
 
+@task
+def train_als_model():
+    run_module("p011_model_training.train_als_model")
+
+
+@task
+def batch_recommendations():
+    run_module("p011_model_training.batch_recommendations")
+
+
 # --------------------------------------------------
 # Prefect Flow
 # --------------------------------------------------
@@ -130,6 +212,11 @@ def train_svd_model():
 @flow(name="RecoMart_End_to_End_Pipeline")
 def full_pipeline():
 
+    # Every stage's lineage entry is tagged with this flow run's id
+    run_id = new_run_id()
+    os.environ["PIPELINE_RUN_ID"] = run_id
+    logging.info(f"Pipeline run id: {run_id}")
+
     # 1. Synthetic Data Generation
     gen = generate_interactions()
 
@@ -151,12 +238,22 @@ def full_pipeline():
     # 6. Feature Engineering
     feats = build_features(wait_for=[prep_int, prep_prod])
 
+    # 6b. Session co-occurrence similar items (incremental)
+    similar = build_similar_items(wait_for=[prep_int])
+
     # 7. Load Feature Store to DB
     load_db = load_features_to_db(wait_for=[feats])
 
     # 8. Model Training
     train_logi = train_logistic_model(wait_for=[load_db])
     train_svd = train_svd_model(wait_for=[load_db])
+    train_als = train_als_model(wait_for=[load_db])
+
+    # 8b. Offline top-K recommendations for every user
+    batch_recs = batch_recommendations(wait_for=[train_svd])
+
+    # 9. Feature Store Compaction + Retention (after consumers read the raw snapshot)
+    compact = compact_feature_store(wait_for=[train_logi, train_svd])
 
     return {
         "generate": gen,
@@ -168,9 +265,13 @@ def full_pipeline():
         "prepare_interactions": prep_int,
         "prepare_products": prep_prod,
         "build_features": feats,
+        "similar_items": similar,
         "load_features_to_db": load_db,
         "train_logistic": train_logi,
-        "train_svd": train_svd
+        "train_svd": train_svd,
+        "train_als": train_als,
+        "batch_recommendations": batch_recs,
+        "compact_feature_store": compact
     }
 
 
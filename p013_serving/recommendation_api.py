@@ -0,0 +1,435 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+import pandas as pd
+import mlflow
+from datetime import datetime
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query
+from p011_model_training.svd_scoring import select_top_k
+from p011_model_training.model_artifact import load_scorer, default_model_path, model_sha256
+from p011_model_training.batch_recommendations import RECOMMENDATIONS_PATH, load_seen
+from p011_model_training.ann_index import IVFIndex, ann_index_path
+from p008_feature_engineering.session_cooccurrence import SimilarItems, get_latest_similar_items
+
+# --------------------------------------------------
+# Recommendation serving API
+#
+#   uvicorn p013_serving.recommendation_api:app --port 8001
+#
+# GET /recommendations/{user_id}?n=10 is answered from, in order:
+#   cache    - precomputed top-K lists from batch_recommendations for
+#              exactly the loaded model (matched by model hash)
+#   scored   - on-the-fly scoring, seen items excluded: through the IVF
+#              index logged with the model when there is one, otherwise
+#              every item is scored; results are kept in a bounded LRU
+#   popular  - users the model has never seen get the items most users
+#              interacted with (score = number of users)
+#
+# GET /items/{item_id}/similar?n=10 returns the item's session
+# co-occurrence neighbours ("customers also viewed", session_cooccurrence.py).
+#
+# The newest finished MLflow run of the SVD experiment is polled in the
+# background. A new run is downloaded and fully loaded off the request
+# path, then swapped in with a single reference assignment, so requests
+# always see one complete model + cache pair. Model arrays are
+# memory-mapped (model_artifact.py), so uvicorn workers share their pages.
+# --------------------------------------------------
+
+EXPERIMENT_NAME = os.getenv("SERVING_EXPERIMENT", "RecoMart_Recommender_SVD")
+# model/als_model with SERVING_EXPERIMENT=RecoMart_Recommender_ALS serves train_als_model.py runs
+MODEL_ARTIFACT = os.getenv("SERVING_MODEL_ARTIFACT", "model/svd_model")
+# Runs logged before the NumPy artifact format
+LEGACY_MODEL_ARTIFACT = "model/svd_model.pkl"
+LEGACY_INDEX_ARTIFACT = "model/svd_model.ivf.npz"
+DOWNLOAD_DIR = "p013_serving/models"
+POLL_SECONDS = int(os.getenv("SERVING_POLL_SECONDS", "60"))
+LRU_SIZE = int(os.getenv("SERVING_LRU_SIZE", "10000"))
+
+DEFAULT_N = 10
+MAX_N = 100
+
+LATENCY_BUCKETS_MS = [0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000]
+
+
+# --------------------------------------------------
+# Latency histograms
+# --------------------------------------------------
+
+class LatencyHistogram:
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = list(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, label, ms):
+        with self.lock:
+            s = self.series.get(label)
+            if s is None:
+                # Last slot counts everything above the largest bucket
+                s = {"counts": [0] * (len(self.buckets) + 1), "count": 0, "sum": 0.0, "max": 0.0}
+                self.series[label] = s
+            slot = len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if ms <= bound:
+                    slot = i
+                    break
+            s["counts"][slot] += 1
+            s["count"] += 1
+            s["sum"] += ms
+            s["max"] = max(s["max"], ms)
+
+    def _quantile(self, s, q):
+        # Upper bound of the bucket holding the q-th observation
+        target = q * s["count"]
+        running = 0
+        for i, c in enumerate(s["counts"]):
+            running += c
+            if running >= target:
+                return self.buckets[i] if i < len(self.buckets) else s["max"]
+        return s["max"]
+
+    def snapshot(self):
+        with self.lock:
+            result = {}
+            for label, s in self.series.items():
+                cumulative = np.cumsum(s["counts"]).tolist()
+                result[label] = {
+                    "buckets_ms": {
+                        **{str(b): cumulative[i] for i, b in enumerate(self.buckets)},
+                        "+Inf": cumulative[-1]
+                    },
+                    "count": s["count"],
+                    "mean_ms": s["sum"] / s["count"] if s["count"] else None,
+                    "p50_ms": self._quantile(s, 0.50),
+                    "p95_ms": self._quantile(s, 0.95),
+                    "p99_ms": self._quantile(s, 0.99),
+                    "max_ms": s["max"]
+                }
+            return result
+
+
+LATENCY = LatencyHistogram()
+
+
+# --------------------------------------------------
+# Model + cache bundle (immutable once built, except the LRU)
+# --------------------------------------------------
+
+class ModelBundle:
+
+    def __init__(self, scorer, run_id, model_sha256, recs_dir=None, index=None):
+        self.scorer = scorer
+        self.index = index
+        self.run_id = run_id
+        self.model_sha256 = model_sha256
+        self.recs_dir = recs_dir
+        self.loaded_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        n_users = len(scorer.user_ids)
+        n_items = len(scorer.item_ids)
+        scorer.user_index  # build the raw -> inner lookup before serving
+
+        self.cache_k = 0
+        self.cache_offsets = np.zeros(n_users + 1, dtype=np.int64)
+        self.cache_items = np.empty(0, dtype=np.int32)
+        self.cache_scores = np.empty(0, dtype=np.float32)
+        self.seen = None
+        if recs_dir is not None:
+            self._load_cache(recs_dir)
+
+        # Popularity = users that interacted with the item; without batch
+        # output the item bias (what the model predicts for anyone) is used
+        if self.seen is not None:
+            popularity = np.bincount(self.seen[1], minlength=n_items).astype(np.float64)
+        else:
+            popularity = scorer.score_inner([-1])[0]
+        self.popular_items = select_top_k(popularity[None, :], MAX_N)[0]
+        self.popular_scores = popularity[self.popular_items]
+
+        self.lru = OrderedDict()
+        self.lru_lock = threading.Lock()
+
+    def _load_cache(self, recs_dir):
+        with open(os.path.join(recs_dir, "_manifest.json"), "r") as f:
+            self.cache_k = json.load(f)["k"]
+        self.seen = tuple(np.asarray(a) for a in load_seen(recs_dir))
+
+        df = pd.read_parquet(recs_dir, columns=["user_id", "rank", "item_id", "score"])
+        users = self._inner_codes(df["user_id"], self.scorer.inner_users)
+        items = self._inner_codes(df["item_id"], self.scorer.inner_items)
+        keep = (users >= 0) & (items >= 0)
+        users, items = users[keep], items[keep]
+        ranks = df["rank"].to_numpy()[keep]
+        scores = df["score"].to_numpy(dtype=np.float32)[keep]
+
+        order = np.lexsort((ranks, users))
+        counts = np.bincount(users, minlength=len(self.scorer.user_ids))
+        np.cumsum(counts, out=self.cache_offsets[1:])
+        self.cache_items = items[order].astype(np.int32)
+        self.cache_scores = scores[order]
+
+    @staticmethod
+    def _inner_codes(column, lookup):
+        # Map the (few) distinct ids once, then broadcast through the codes
+        column = column.astype("category")
+        return lookup(column.cat.categories.astype(str))[column.cat.codes.to_numpy()]
+
+    def _score(self, u):
+        seen = np.empty(0, dtype=np.int64)
+        if self.seen is not None:
+            indptr, indices = self.seen
+            seen = indices[indptr[u]:indptr[u + 1]]
+
+        if self.index is not None:
+            # Ask for enough extra items to survive removing the seen ones
+            idx, top = self.index.search(self.scorer, [u], MAX_N + len(seen))[0]
+            keep = ~np.isin(idx, seen)
+            return idx[keep][:MAX_N], top[keep][:MAX_N]
+
+        scores = self.scorer.score_inner([u])
+        scores[0, seen] = -np.inf
+        idx = select_top_k(scores, MAX_N)[0]
+        top = scores[0, idx]
+        valid = np.isfinite(top)
+        return idx[valid], top[valid]
+
+    def recommend(self, user_id, n):
+        u = self.scorer.user_index.get(user_id)
+        if u is None:
+            return "popular", self.popular_items[:n], self.popular_scores[:n]
+
+        start, stop = self.cache_offsets[u], self.cache_offsets[u + 1]
+        # A list shorter than K already holds every recommendable item
+        if stop > start and (stop - start >= n or stop - start < self.cache_k):
+            return "cache", self.cache_items[start:start + n], self.cache_scores[start:start + n]
+
+        with self.lru_lock:
+            hit = self.lru.get(u)
+            if hit is not None:
+                self.lru.move_to_end(u)
+        if hit is None:
+            hit = self._score(u)
+            with self.lru_lock:
+                self.lru[u] = hit
+                while len(self.lru) > LRU_SIZE:
+                    self.lru.popitem(last=False)
+        return "scored", hit[0][:n], hit[1][:n]
+
+    def info(self):
+        return {
+            "run_id": self.run_id,
+            "model_sha256": self.model_sha256,
+            "recommendations_dir": self.recs_dir,
+            "cached_users": int(np.count_nonzero(np.diff(self.cache_offsets))),
+            "cache_k": self.cache_k,
+            "ann_index": None if self.index is None else {"lists": self.index.n_lists, "nprobe": self.index.nprobe},
+            "users": len(self.scorer.user_ids),
+            "items": len(self.scorer.item_ids),
+            "loaded_at": self.loaded_at
+        }
+
+
+# --------------------------------------------------
+# Model discovery and hot swap
+# --------------------------------------------------
+
+_state = {"bundle": None, "similar": None}
+_reload_lock = threading.Lock()
+
+
+def latest_mlflow_run():
+    runs = mlflow.search_runs(
+        experiment_names=[EXPERIMENT_NAME],
+        # Model runs log model_type; search trials (svd_search.py) are nested
+        # runs in the same experiment without it, and without a model
+        filter_string="attributes.status = 'FINISHED' and params.model_type != ''",
+        order_by=["attributes.start_time DESC"],
+        max_results=1
+    )
+    return None if runs.empty else runs.iloc[0]["run_id"]
+
+
+def find_recommendations(model_sha256, base_path=RECOMMENDATIONS_PATH):
+    # Newest complete batch output generated from exactly this model
+    if not os.path.isdir(base_path):
+        return None
+    for name in sorted(os.listdir(base_path), reverse=True):
+        manifest = os.path.join(base_path, name, "_manifest.json")
+        if name.endswith(".tmp") or not os.path.isfile(manifest):
+            continue
+        with open(manifest, "r") as f:
+            if json.load(f).get("model_sha256") == model_sha256:
+                return os.path.join(base_path, name)
+    return None
+
+
+def download_model(run_id):
+    # Local path of the run's model; its ANN index, if any, ends up at ann_index_path()
+    dst_path = os.path.join(DOWNLOAD_DIR, run_id)
+    try:
+        return mlflow.artifacts.download_artifacts(
+            run_id=run_id, artifact_path=MODEL_ARTIFACT, dst_path=dst_path
+        )
+    except Exception:
+        model_path = mlflow.artifacts.download_artifacts(
+            run_id=run_id, artifact_path=LEGACY_MODEL_ARTIFACT, dst_path=dst_path
+        )
+        try:
+            mlflow.artifacts.download_artifacts(
+                run_id=run_id, artifact_path=LEGACY_INDEX_ARTIFACT, dst_path=dst_path
+            )
+        except Exception:
+            print(f"No ANN index logged with run {run_id}")
+        return model_path
+
+
+def load_index(index_path, scorer):
+    if not os.path.isfile(index_path):
+        return None
+    index = IVFIndex.load(index_path)
+    if not index.matches(scorer):
+        print(f"WARNING: ANN index {index_path} does not match the model; scoring all items")
+        return None
+    return index
+
+
+def reload_model(force=False):
+    with _reload_lock:
+        current = _state["bundle"]
+
+        try:
+            run_id = latest_mlflow_run()
+        except Exception as e:
+            print(f"WARNING: MLflow lookup failed: {e}")
+            run_id = None
+
+        if run_id is not None and (force or current is None or current.run_id != run_id):
+            model_path = download_model(run_id)
+        elif current is None:
+            # No MLflow run yet: serve the locally trained model
+            model_path = default_model_path()
+            if not os.path.exists(model_path):
+                raise Exception(f"No MLflow run in {EXPERIMENT_NAME} and no local model at {model_path}")
+        else:
+            model_path = None
+            # Same model: only pick up a newer batch run for it
+            recs_dir = find_recommendations(current.model_sha256)
+            if recs_dir == current.recs_dir and not force:
+                return current, False
+            scorer, sha, run_id, index = current.scorer, current.model_sha256, current.run_id, current.index
+
+        if model_path is not None:
+            scorer = load_scorer(model_path)
+            sha = model_sha256(model_path)
+            index = load_index(ann_index_path(model_path), scorer)
+
+        bundle = ModelBundle(scorer, run_id, sha, find_recommendations(sha), index)
+        _state["bundle"] = bundle
+        print(f"Serving model run {run_id} (sha256 {sha[:12]}), "
+              f"top-N cache: {bundle.recs_dir or 'none'}")
+        return bundle, True
+
+
+def reload_similar_items():
+    # Newest session co-occurrence index (session_cooccurrence.py), if any
+    path = get_latest_similar_items()
+    current = _state["similar"]
+    if path is not None and (current is None or current.path != path):
+        _state["similar"] = SimilarItems(path)
+        print(f"Serving similar items from {path}")
+    return _state["similar"]
+
+
+def _poll_models(stop):
+    while not stop.wait(POLL_SECONDS):
+        try:
+            reload_model()
+        except Exception as e:
+            # Keep serving the current model
+            print(f"WARNING: model reload failed: {e}")
+        try:
+            reload_similar_items()
+        except Exception as e:
+            print(f"WARNING: similar-items reload failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    reload_model()
+    reload_similar_items()
+    stop = threading.Event()
+    poller = threading.Thread(target=_poll_models, args=(stop,), daemon=True)
+    poller.start()
+    yield
+    stop.set()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+# --------------------------------------------------
+# Endpoints
+# --------------------------------------------------
+
+@app.get("/recommendations/{user_id}")
+def get_recommendations(user_id: str, n: int = Query(DEFAULT_N, ge=1, le=MAX_N)):
+    start = time.perf_counter()
+    # One read of the reference: a concurrent swap cannot mix two models
+    bundle = _state["bundle"]
+    source, items, scores = bundle.recommend(user_id, n)
+
+    response = {
+        "user_id": user_id,
+        "source": source,
+        "model_run_id": bundle.run_id,
+        "recommendations": [
+            {"rank": rank, "item_id": item, "score": round(float(score), 4)}
+            for rank, (item, score) in enumerate(
+                zip(bundle.scorer.item_ids[items].tolist(), scores.tolist()), 1
+            )
+        ]
+    }
+    LATENCY.observe(source, (time.perf_counter() - start) * 1000)
+    return response
+
+
+@app.get("/items/{item_id}/similar")
+def get_similar_items(item_id: str, n: int = Query(DEFAULT_N, ge=1, le=MAX_N)):
+    # "Customers also viewed": precomputed neighbour list, no scoring
+    start = time.perf_counter()
+    similar = _state["similar"]
+    if similar is None:
+        raise HTTPException(status_code=503, detail="No similar-items index available")
+    items, scores = similar.similar(item_id, n)
+
+    response = {
+        "item_id": item_id,
+        "index_version": similar.manifest["version"],
+        "similar_items": [
+            {"rank": rank, "item_id": item, "score": round(float(score), 4)}
+            for rank, (item, score) in enumerate(zip(items.tolist(), scores.tolist()), 1)
+        ]
+    }
+    LATENCY.observe("similar", (time.perf_counter() - start) * 1000)
+    return response
+
+
+@app.get("/metrics/latency")
+def get_latency():
+    return LATENCY.snapshot()
+
+
+@app.get("/model")
+def get_model():
+    return _state["bundle"].info()
+
+
+@app.post("/model/reload")
+def post_reload():
+    bundle, swapped = reload_model(force=True)
+    return {"swapped": swapped, **bundle.info()}
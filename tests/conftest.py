@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Stages run from the repo root (python -m pXXX.module); tests import them the same way
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,114 @@
+import os
+import numpy as np
+import pandas as pd
+from p009_feature_store.snapshot_io import write_parquet_snapshot
+from p009_feature_store.snapshot_catalog import save_catalog, load_catalog
+from p009_feature_store.compact_snapshots import compact, read_features_as_of
+
+# --------------------------------------------------
+# Compaction round-trip: every version reads back as it was written
+# --------------------------------------------------
+
+V1, V2 = "20260101_000000", "20260102_000000"
+FEATURES = ["user_id", "item_id", "session_id", "event_type", "score", "category_a"]
+
+
+def make_snapshot(n_rows=300, n_users=60, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "user_id": [f"U{i % n_users:04d}" for i in range(n_rows)],
+        "item_id": [f"P{i:04d}" for i in range(n_rows)],
+        "session_id": [f"S{i}" for i in range(n_rows)],
+        "event_type": "view",
+        "timestamp": pd.Timestamp("2026-01-01") + pd.to_timedelta(np.arange(n_rows), "s"),
+        "score": rng.random(n_rows).astype("float32"),
+        "category_a": rng.random(n_rows) > 0.5
+    })
+
+
+def write_version(base_path, df, version):
+    path = os.path.join(base_path, f"features_{version}.parquet")
+    write_parquet_snapshot(df, path)
+    return path
+
+
+def compact_and_drop_raw(base_path, store_path, catalog_path, df, version, num_buckets):
+    # Raw file removed so reads must come from the compacted store
+    path = write_version(base_path, df, version)
+    compact(base_path, store_path, catalog_path, num_buckets=num_buckets)
+    os.remove(path)
+
+
+def normalized(df, columns):
+    df = df[columns].copy()
+    for col in columns:
+        if df[col].dtype.name == "category":
+            df[col] = df[col].astype(str)
+    return df.sort_values(["user_id", "item_id"]).reset_index(drop=True)
+
+
+def read_version(store_path, catalog_path, version, columns):
+    df = read_features_as_of(version, columns=columns, store_path=store_path, catalog_path=catalog_path)
+    return normalized(df, columns)
+
+
+def test_round_trip_with_non_default_buckets_and_new_column(tmp_path):
+    base_path, store_path = str(tmp_path / "data"), str(tmp_path / "store")
+    catalog_path = str(tmp_path / "catalog.json")
+    os.makedirs(base_path)
+
+    v1 = make_snapshot()
+    compact_and_drop_raw(base_path, store_path, catalog_path, v1, V1, num_buckets=4)
+
+    # v2 changes one user's rows only and adds a one-hot column for that user
+    changed = v1["user_id"] == "U0000"
+    v2 = v1.copy()
+    v2.loc[changed, "score"] = 5.0
+    v2["category_b"] = changed.to_numpy()
+    compact_and_drop_raw(base_path, store_path, catalog_path, v2, V2, num_buckets=4)
+
+    assert sorted(os.listdir(store_path)) == [f"bucket={b:02d}" for b in range(4)]
+    pd.testing.assert_frame_equal(
+        read_version(store_path, catalog_path, V1, FEATURES), normalized(v1, FEATURES)
+    )
+    columns = FEATURES + ["category_b"]
+    pd.testing.assert_frame_equal(
+        read_version(store_path, catalog_path, V2, columns), normalized(v2, columns)
+    )
+
+
+def test_new_column_reaches_buckets_without_changes(tmp_path):
+    # A single user: every other bucket is empty and unchanged by v2
+    base_path, store_path = str(tmp_path / "data"), str(tmp_path / "store")
+    catalog_path = str(tmp_path / "catalog.json")
+    os.makedirs(base_path)
+
+    v1 = make_snapshot(n_rows=20, n_users=1)
+    compact_and_drop_raw(base_path, store_path, catalog_path, v1, V1, num_buckets=8)
+    v2 = v1.assign(category_b=True)
+    compact_and_drop_raw(base_path, store_path, catalog_path, v2, V2, num_buckets=8)
+
+    df = read_version(store_path, catalog_path, V2, ["user_id", "item_id", "category_b"])
+    assert len(df) == 20
+    assert df["category_b"].all()
+
+
+def test_user_filtered_read_matches_snapshot(tmp_path):
+    base_path, store_path = str(tmp_path / "data"), str(tmp_path / "store")
+    catalog_path = str(tmp_path / "catalog.json")
+    os.makedirs(base_path)
+
+    v1 = make_snapshot()
+    compact_and_drop_raw(base_path, store_path, catalog_path, v1, V1, num_buckets=3)
+
+    users = ["U0001", "U0042"]
+    df = read_features_as_of(V1, columns=FEATURES, user_ids=users,
+                             store_path=store_path, catalog_path=catalog_path)
+    expected = v1[v1["user_id"].isin(users)]
+    pd.testing.assert_frame_equal(normalized(df, FEATURES), normalized(expected, FEATURES))
+
+
+def test_save_catalog_bare_filename(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    save_catalog({"snapshots": [], "compacted_store": None}, "catalog.json")
+    assert load_catalog("catalog.json")["snapshots"] == []
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+from p009_feature_store.mmap_snapshot import write_mmap_snapshot, MmapFeatureSnapshot
+
+# --------------------------------------------------
+# Memory-mapped snapshot lookups
+# --------------------------------------------------
+
+
+def make_snapshot(tmp_path, ids):
+    df = pd.DataFrame({"user_id": ids, "activity": np.arange(len(ids), dtype=np.float32)})
+    path = write_mmap_snapshot(df, "user_id", ["activity"], "20260101_000000", str(tmp_path))
+    return MmapFeatureSnapshot(path)
+
+
+def test_row_index_known_and_unknown_ids(tmp_path):
+    snapshot = make_snapshot(tmp_path, ["U0003", "U0001", "U0002"])
+    rows = snapshot.row_index(["U0001", "U0003", "U0000", "U9999", "A", "Z"])
+    assert rows.tolist() == [0, 2, -1, -1, -1, -1]
+
+
+def test_row_index_longer_ids_do_not_match_prefix(tmp_path):
+    # Stored ids are <U5: "U00012" must not be truncated into "U0001"
+    snapshot = make_snapshot(tmp_path, ["U0001", "U0002"])
+    assert snapshot.ids.dtype == np.dtype("<U5")
+    assert snapshot.row_index(["U00012", "U0002X", "U0001"]).tolist() == [-1, -1, 0]
+
+    values, found = snapshot.lookup(["U00012", "U0002"])
+    assert found.tolist() == [False, True]
+    assert np.isnan(values[0, 0]) and values[1, 0] == 1.0
+
+
+def test_row_index_non_string_ids(tmp_path):
+    # Ids are stored sorted as strings: "1", "10", "2"
+    snapshot = make_snapshot(tmp_path, ["1", "2", "10"])
+    assert snapshot.row_index([10, 2, 3]).tolist() == [1, 2, -1]
+
+
+def test_row_index_empty_snapshot(tmp_path):
+    snapshot = make_snapshot(tmp_path, [])
+    assert snapshot.row_index(["U0001", "U0002"]).tolist() == [-1, -1]
+    values, found = snapshot.lookup(["U0001"])
+    assert not found.any() and np.isnan(values).all()
@@ -0,0 +1,73 @@
+import itertools
+import numpy as np
+import pandas as pd
+from collections import Counter
+from p008_feature_engineering.session_cooccurrence import SessionCooccurrence, SimilarItems
+
+# --------------------------------------------------
+# Session co-occurrence index
+# --------------------------------------------------
+
+
+def make_events(n_events=3000, n_sessions=400, n_items=150, seed=0):
+    rng = np.random.default_rng(seed)
+    # Skewed item popularity so neighbour lists have real structure
+    items = rng.zipf(1.5, n_events) % n_items
+    return pd.DataFrame({
+        "session_id": [f"S{s}" for s in rng.integers(0, n_sessions, n_events)],
+        "item_id": [f"P{i:04d}" for i in items]
+    })
+
+
+def test_counts_match_brute_force():
+    df = make_events(n_events=500, n_sessions=80, n_items=40)
+    index = SessionCooccurrence.build(df)
+    inner = {item: i for i, item in enumerate(index.item_ids)}
+
+    pairs, singles = Counter(), Counter()
+    for items in df.groupby("session_id")["item_id"].apply(lambda s: sorted(set(s))):
+        singles.update(items)
+        for a, b in itertools.combinations(items, 2):
+            pairs[(a, b)] += 1
+
+    cooc = index.cooc.toarray()
+    expected = np.zeros_like(cooc)
+    for item, count in singles.items():
+        expected[inner[item], inner[item]] = count
+    for (a, b), count in pairs.items():
+        expected[inner[a], inner[b]] = expected[inner[b], inner[a]] = count
+    np.testing.assert_array_equal(cooc, expected)
+
+
+def test_incremental_updates_equal_full_build():
+    df = make_events()
+    full = SessionCooccurrence.build(df)
+
+    # Chunks share sessions, and the last one repeats events already applied
+    n = len(df)
+    chunks = [df.iloc[:n // 3], df.iloc[n // 3:2 * n // 3], df.iloc[2 * n // 3:], df.iloc[n // 3:n // 2]]
+    incremental = SessionCooccurrence.build(chunks[0])
+    for chunk in chunks[1:]:
+        incremental.update(chunk)
+
+    np.testing.assert_array_equal(incremental.item_ids, full.item_ids)
+    np.testing.assert_array_equal(incremental.session_ids, full.session_ids)
+    assert abs(incremental.cooc - full.cooc).sum() == 0
+    np.testing.assert_array_equal(incremental.neighbours, full.neighbours)
+    np.testing.assert_allclose(incremental.scores, full.scores, rtol=0, atol=1e-6)
+
+
+def test_save_load_round_trip(tmp_path):
+    index = SessionCooccurrence.build(make_events())
+    path = index.save(str(tmp_path))
+
+    loaded = SessionCooccurrence.load(path)
+    assert abs(loaded.cooc - index.cooc).sum() == 0
+    np.testing.assert_array_equal(loaded.neighbours, index.neighbours)
+
+    item = index.item_ids[0]
+    neighbours, scores = SimilarItems(path).similar(item, 5)
+    expected = index.neighbours[0][:5]
+    expected = index.item_ids[expected[expected >= 0]]
+    np.testing.assert_array_equal(neighbours, expected)
+    assert item not in set(neighbours)
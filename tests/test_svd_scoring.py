@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from surprise import Dataset, Reader, SVD
+from p011_model_training.svd_scoring import SVDScorer, select_top_k
+from p011_model_training.model_artifact import export_model, load_scorer
+
+# --------------------------------------------------
+# Vectorized scoring agrees with surprise's model.predict
+# --------------------------------------------------
+
+
+def make_ratings(n_ratings=2000, n_users=60, n_items=80, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "user_id": [f"U{u}" for u in rng.integers(0, n_users, n_ratings)],
+        "item_id": [f"P{i}" for i in rng.integers(0, n_items, n_ratings)],
+        "rating": rng.integers(1, 6, n_ratings).astype(float)
+    })
+    return df.drop_duplicates(subset=["user_id", "item_id"])
+
+
+def fit_svd(biased=True):
+    df = make_ratings()
+    data = Dataset.load_from_df(df, Reader(rating_scale=(1, 5)))
+    model = SVD(n_factors=8, n_epochs=10, biased=biased, random_state=42)
+    model.fit(data.build_full_trainset())
+    return model
+
+
+def predicted(model, users, items):
+    return np.array([[model.predict(u, i).est for i in items] for u in users])
+
+
+@pytest.mark.parametrize("biased", [True, False])
+def test_scores_match_predict(biased):
+    model = fit_svd(biased)
+    scorer = SVDScorer.from_surprise(model)
+
+    # Known ids plus users / items the model has never seen
+    users = list(scorer.user_ids[:10]) + ["U_new"]
+    items = list(scorer.item_ids[:15]) + ["P_new"]
+    np.testing.assert_allclose(scorer.score(users, items), predicted(model, users, items), atol=1e-9)
+
+
+def test_full_catalog_scores_match_predict():
+    model = fit_svd()
+    scorer = SVDScorer.from_surprise(model)
+    users = list(scorer.user_ids[:5])
+    np.testing.assert_allclose(
+        scorer.score(users), predicted(model, users, scorer.item_ids), atol=1e-9
+    )
+
+
+def test_top_k_matches_sorted_predictions():
+    model = fit_svd()
+    scorer = SVDScorer.from_surprise(model)
+    user = scorer.user_ids[0]
+
+    items, scores = scorer.top_k([user], k=10)[0]
+    expected = predicted(model, [user], scorer.item_ids)[0]
+    order = np.argsort(-expected, kind="stable")[:10]
+    np.testing.assert_array_equal(items, scorer.item_ids[order])
+    np.testing.assert_allclose(scores, expected[order], atol=1e-9)
+
+
+def test_exported_artifact_scores_like_the_model(tmp_path):
+    model = fit_svd()
+    scorer = load_scorer(export_model(model, str(tmp_path / "svd_model")))
+    users = list(scorer.user_ids[:5]) + ["U_new"]
+    np.testing.assert_allclose(
+        scorer.score(users), SVDScorer.from_surprise(model).score(users), atol=1e-12
+    )
+
+
+def test_select_top_k_keeps_first_of_ties():
+    scores = np.array([[1.0, 3.0, 3.0, 2.0, 3.0]])
+    assert select_top_k(scores, 2)[0].tolist() == [1, 2]
+    assert select_top_k(scores, 0).shape == (1, 0)
+    assert sorted(select_top_k(scores, 10)[0].tolist()) == [0, 1, 2, 3, 4]